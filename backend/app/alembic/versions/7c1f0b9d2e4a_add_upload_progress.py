@@ -0,0 +1,31 @@
+"""add upload progress
+
+Revision ID: 7c1f0b9d2e4a
+Revises: e3a006cc9152
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c1f0b9d2e4a"
+down_revision = "e3a006cc9152"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "upload",
+        sa.Column(
+            "processed_chunks", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+    op.add_column("upload", sa.Column("total_chunks", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("upload", "total_chunks")
+    op.drop_column("upload", "processed_chunks")
@@ -0,0 +1,24 @@
+"""add team history config
+
+Revision ID: a6e4c83f1d52
+Revises: d91a3f6b0e25
+Create Date: 2026-10-18 14:02:37.518420
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a6e4c83f1d52"
+down_revision = "d91a3f6b0e25"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("team", sa.Column("history_config", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("team", "history_config")
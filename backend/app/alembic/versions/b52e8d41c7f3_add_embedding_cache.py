@@ -0,0 +1,38 @@
+"""add embedding cache
+
+Revision ID: b52e8d41c7f3
+Revises: 7c1f0b9d2e4a
+Create Date: 2026-10-18 10:03:27.540918
+
+"""
+
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "b52e8d41c7f3"
+down_revision = "7c1f0b9d2e4a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "embeddingcache",
+        sa.Column(
+            "model", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False
+        ),
+        sa.Column(
+            "content_hash", sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False
+        ),
+        sa.Column(
+            "embedding", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("model", "content_hash"),
+    )
+
+
+def downgrade():
+    op.drop_table("embeddingcache")
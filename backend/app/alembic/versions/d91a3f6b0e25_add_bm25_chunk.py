@@ -0,0 +1,46 @@
+"""add bm25 chunk
+
+Revision ID: d91a3f6b0e25
+Revises: b52e8d41c7f3
+Create Date: 2026-10-18 11:21:09.774310
+
+"""
+
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "d91a3f6b0e25"
+down_revision = "b52e8d41c7f3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "bm25chunk",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("upload_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "chunk_id", sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False
+        ),
+        sa.Column("length", sa.Integer(), nullable=False),
+        sa.Column(
+            "term_freqs", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_bm25chunk_upload_id"), "bm25chunk", ["upload_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_bm25chunk_chunk_id"), "bm25chunk", ["chunk_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_bm25chunk_chunk_id"), table_name="bm25chunk")
+    op.drop_index(op.f("ix_bm25chunk_upload_id"), table_name="bm25chunk")
+    op.drop_table("bm25chunk")
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import func, select
 
 from app.api.deps import CurrentUser, SessionDep
+from app.core.graph.graph_cache import compiled_graph_cache
 from app.models import Graph, GraphCreate, GraphOut, GraphsOut, GraphUpdate, Team
 
 router = APIRouter()
@@ -119,6 +120,7 @@ def create_graph(
     session.add(graph)
     session.commit()
     session.refresh(graph)
+    compiled_graph_cache.invalidate_team(team_id)
     return graph
 
 
@@ -147,6 +149,7 @@ def update_graph(
     graph.sqlmodel_update(graph_in)
     session.commit()
     session.refresh(graph)
+    compiled_graph_cache.invalidate_team(team_id)
     return graph
 
 
@@ -171,3 +174,4 @@ def delete_graph(
         raise HTTPException(status_code=404, detail="Graph not found")
     session.delete(graph)
     session.commit()
+    compiled_graph_cache.invalidate_team(team_id)
@@ -5,6 +5,7 @@ from sqlmodel import col, func, select
 
 from app.api.deps import CurrentUser, SessionDep
 from app.core.config import settings
+from app.core.graph.graph_cache import compiled_graph_cache
 from app.models import (
     Member,
     MemberCreate,
@@ -151,6 +152,7 @@ def create_member(
     session.add(member)
     session.commit()
     session.refresh(member)
+    compiled_graph_cache.invalidate_team(team_id)
     return member
 
 
@@ -208,6 +210,7 @@ def update_member(
     session.add(member)
     session.commit()
     session.refresh(member)
+    compiled_graph_cache.invalidate_team(team_id)
     return member
 
 
@@ -242,4 +245,5 @@ def delete_member(
 
     session.delete(member)
     session.commit()
+    compiled_graph_cache.invalidate_team(team_id)
     return Message(message="Member deleted successfully")
@@ -4,7 +4,10 @@ from fastapi import APIRouter, HTTPException
 from sqlmodel import select
 
 from app.api.deps import SessionDep
+from app.core.graph.graph_cache import compiled_graph_cache
 from app.core.model_providers.model_provider_manager import model_provider_manager
+from app.core.rag.registry import vector_store_registry
+from app.core.workflow.utils.model_registry import model_registry
 from app.curd.modelprovider import (
     create_model_provider,
     delete_model_provider,
@@ -29,7 +32,9 @@ router = APIRouter()
 # Routes for ModelProvider
 @router.post("/", response_model=ModelProvider)
 def create_provider(model_provider: ModelProviderCreate, session: SessionDep):
-    return create_model_provider(session, model_provider)
+    provider = create_model_provider(session, model_provider)
+    model_registry.invalidate()
+    return provider
 
 
 @router.get("/{model_provider_id}", response_model=ModelProviderOut)
@@ -91,6 +96,10 @@ def update_provider(
             status_code=404,
             detail="The provider with this ID does not exist in the system",
         )
+    vector_store_registry.invalidate(provider.provider_name)
+    # 已编译的图持有旧凭据创建的模型客户端
+    model_registry.invalidate()
+    compiled_graph_cache.clear()
     return ModelProviderOut(
         id=provider.id,
         provider_name=provider.provider_name,
@@ -106,6 +115,9 @@ def delete_provider(model_provider_id: int, session: SessionDep):
     model_provider = delete_model_provider(session, model_provider_id)
     if model_provider is None:
         raise HTTPException(status_code=404, detail="ModelProvider not found")
+    vector_store_registry.invalidate(model_provider.provider_name)
+    model_registry.invalidate()
+    compiled_graph_cache.clear()
     return model_provider
 
 
@@ -136,5 +148,6 @@ async def sync_provider(
 
     # 同步模型到数据库
     synced_models = sync_provider_models(session, provider.id, config_models)
+    model_registry.invalidate()
 
     return [model.ai_model_name for model in synced_models]
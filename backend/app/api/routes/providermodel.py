@@ -3,6 +3,8 @@ from typing import Any
 from fastapi import APIRouter, HTTPException
 
 from app.api.deps import SessionDep
+from app.core.graph.graph_cache import compiled_graph_cache
+from app.core.workflow.utils.model_registry import model_registry
 from app.curd.models import (
     _create_model,
     _delete_model,
@@ -34,7 +36,9 @@ def create_models(model: ModelCreate, session: SessionDep):
     # 确保dimension在meta_中
     if model.meta_ is None:
         model.meta_ = {}
-    return _create_model(session, model)
+    model = _create_model(session, model)
+    model_registry.invalidate()
+    return model
 
 
 @router.get("/{provider_id}", response_model=ModelsOut)
@@ -52,6 +56,8 @@ def delete_model(model_id: int, session: SessionDep):
     model = _delete_model(session, model_id)
     if model is None:
         raise HTTPException(status_code=404, detail="Model not found")
+    model_registry.invalidate()
+    compiled_graph_cache.clear()
     return model
 
 
@@ -60,6 +66,8 @@ def update_model(model_id: int, model_update: ModelUpdate, session: SessionDep):
     model = _update_model(session, model_id, model_update)
     if model is None:
         raise HTTPException(status_code=404, detail="Model not found")
+    model_registry.invalidate()
+    compiled_graph_cache.clear()
     return model
 
 
@@ -6,8 +6,10 @@ from sqlmodel import col, func, or_, select
 from loguru import logger
 
 from app.api.deps import CurrentUser, SessionDep
+from app.core.graph.graph_cache import compiled_graph_cache
 from app.core.tools.api_tool import ToolDefinition
 from app.core.tools.tool_invoker import ToolInvokeResponse, invoke_tool
+from app.core.workflow.node.mcp.session_pool import get_mcp_session_pool
 from app.models import (
     Message,
     Skill,
@@ -17,7 +19,6 @@ from app.models import (
     SkillUpdate,
     ToolDefinitionValidate,
 )
-from langchain_mcp_adapters.client import MultiServerMCPClient
 
 router = APIRouter()
 
@@ -142,6 +143,8 @@ def update_skill(
     session.add(skill)
     session.commit()
     session.refresh(skill)
+    # Skills are shared between teams
+    compiled_graph_cache.clear()
     return skill
 
 
@@ -159,6 +162,7 @@ def delete_skill(session: SessionDep, current_user: CurrentUser, id: int) -> Any
         raise HTTPException(status_code=400, detail="Cannot delete managed skills")
     session.delete(skill)
     session.commit()
+    compiled_graph_cache.clear()
     return Message(message="Skill deleted successfully")
 
 
@@ -214,6 +218,7 @@ def update_skill_credentials(
     session.add(skill)
     session.commit()
     session.refresh(skill)
+    compiled_graph_cache.clear()
 
     return skill
 
@@ -226,8 +231,7 @@ async def get_mcp_tools(mcp_config: dict[str, Any]) -> Any:
         # 添加日志打印
         logger.info(f"Received mcp_config: {mcp_config}")
         
-        async with MultiServerMCPClient(mcp_config) as client:
-            tools = client.get_tools()
+        async with get_mcp_session_pool().tools(mcp_config) as tools:
             # 只返回工具的基本信息
             tools_info = [{
                 "name": tool.name,
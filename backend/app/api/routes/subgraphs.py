@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import func, select
 
 from app.api.deps import CurrentUser, SessionDep
+from app.core.workflow.subgraph_cache import subgraph_cache
 from app.models import (
     Message,
     Subgraph,
@@ -167,6 +168,8 @@ def create_subgraph(
             session.add(existing)
             session.commit()
             session.refresh(existing)
+            # 覆盖已有子图时, 丢弃按 id 缓存的旧配置和已编译的图
+            subgraph_cache.invalidate(existing.id)
             return existing
         else:
             raise HTTPException(
@@ -206,6 +209,7 @@ def update_subgraph(
     session.add(subgraph)
     session.commit()
     session.refresh(subgraph)
+    subgraph_cache.invalidate(id)
     return subgraph
 
 
@@ -226,4 +230,5 @@ def delete_subgraph(
 
     session.delete(subgraph)
     session.commit()
+    subgraph_cache.invalidate(id)
     return Message(message="Subgraph deleted successfully")
@@ -1,16 +1,23 @@
 from datetime import datetime
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
 from sqlmodel import col, func, select
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import CurrentTeam, CurrentUser, SessionDep
+from app.core.config import settings
 from app.core.graph.build import generator
+from app.core.graph.graph_cache import compiled_graph_cache
+from app.core.graph.stream_runs import stream_runs
 from app.models import (
+    ChatMessage,
+    Interrupt,
     Member,
     Message,
+    StreamOptions,
     Team,
     TeamChat,
     TeamChatPublic,
@@ -20,6 +27,7 @@ from app.models import (
     TeamUpdate,
     Thread,
 )
+from app.tasks.stream_tasks import run_team_stream
 
 router = APIRouter()
 
@@ -44,6 +52,50 @@ async def validate_name_on_update(
         raise HTTPException(status_code=400, detail="Team name already exists")
 
 
+async def start_or_resume_stream(
+    request: Request,
+    team: Team,
+    members: list[Member],
+    thread_id: str,
+    messages: list[ChatMessage],
+    interrupt: Interrupt | None,
+    stream_options: StreamOptions | None,
+) -> StreamingResponse:
+    """
+    Start a new stream of the team, or reattach to an earlier run of the
+    thread when the client reconnects with `Last-Event-ID`.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        frames = await stream_runs.resume(request, thread_id, last_event_id)
+        if frames is None:
+            raise HTTPException(
+                status_code=410, detail="Stream has expired, resend the message"
+            )
+        return StreamingResponse(frames, media_type="text/event-stream")
+    if settings.STREAM_EXECUTION == "queue":
+        run_id = await stream_runs.create(thread_id)
+        await run_in_threadpool(
+            run_team_stream.delay,
+            run_id,
+            team.id,
+            thread_id,
+            [message.model_dump(mode="json") for message in messages],
+            interrupt.model_dump(mode="json") if interrupt else None,
+            stream_options.model_dump(mode="json") if stream_options else None,
+        )
+    else:
+        run_id = await stream_runs.start(
+            thread_id,
+            generator(team, members, messages, thread_id, interrupt, stream_options),
+        )
+    return StreamingResponse(
+        stream_runs.subscribe(request, run_id),
+        media_type="text/event-stream",
+        headers={"X-Stream-Id": run_id},
+    )
+
+
 @router.get("/", response_model=TeamsOut)
 def read_teams(
     session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
@@ -197,6 +249,7 @@ def update_team(
     session.add(team)
     session.commit()
     session.refresh(team)
+    compiled_graph_cache.invalidate_team(id)
     return team
 
 
@@ -212,6 +265,7 @@ def delete_team(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     session.delete(team)
     session.commit()
+    compiled_graph_cache.invalidate_team(id)
     return Message(message="Team deleted successfully")
 
 
@@ -222,6 +276,7 @@ async def stream(
     id: int,
     thread_id: str,
     team_chat: TeamChat,
+    request: Request,
 ) -> StreamingResponse:
     """
     Stream a response to a user's input.
@@ -250,9 +305,14 @@ async def stream(
     graphs = team.graphs
     for graph in graphs:
         graph.config = graph.config
-    return StreamingResponse(
-        generator(team, members, team_chat.messages, thread_id, team_chat.interrupt),
-        media_type="text/event-stream",
+    return await start_or_resume_stream(
+        request,
+        team,
+        members,
+        thread_id,
+        team_chat.messages,
+        team_chat.interrupt,
+        team_chat.stream,
     )
 
 
@@ -263,6 +323,7 @@ async def public_stream(
     team_chat: TeamChatPublic,
     thread_id: str,
     team: CurrentTeam,
+    request: Request,
 ) -> StreamingResponse:
     """
     Stream a response from a team using a given message or an interrupt decision. Requires an API key for authentication.
@@ -278,10 +339,16 @@ async def public_stream(
         - `interrupt` (object, optional): Approve/reject tool or reply to an ask-human tool.
             - `decision` (str): Can be `'approved'`, `'rejected'`, or `'replied'`.
             - `tool_message` (str or null, optional): If `decision` is `'rejected'` or `'replied'`, provide a message explaining the reason for rejection or the reply.
+        - `stream` (object, optional): Merge consecutive tokens into fewer SSE frames.
+            - `coalesce_ms` (int): Send buffered tokens at least every this many milliseconds. `0` disables.
+            - `coalesce_bytes` (int): Send buffered tokens once this many bytes are buffered. `0` disables.
     Authorization:
     - API key must be provided in the request header as `x-api-key`.
     Responses:
-    - `200 OK`: Returns a streaming response in `text/event-stream` format containing the team's response.
+    - `200 OK`: Returns a streaming response in `text/event-stream` format containing the team's response. Every event has an `id` of the form `<stream_id>:<seq>`, and the stream id is also returned in the `X-Stream-Id` header.
+    - Reconnecting:
+        - Repeat the request with a `Last-Event-ID` header holding the last event id received. The request body is ignored, and the client is reattached to the running stream or replayed the rest of a finished one, without executing the team again.
+        - A run with no connected client is cancelled after a grace period. `410 Gone` is returned once its replay buffer has expired.
     """
     # Check if thread belongs to the team
     thread = session.get(Thread, thread_id)
@@ -308,7 +375,12 @@ async def public_stream(
         member.skills = member.skills
         member.uploads = member.uploads
     messages = [team_chat.message] if team_chat.message else []
-    return StreamingResponse(
-        generator(team, members, messages, thread_id, team_chat.interrupt),
-        media_type="text/event-stream",
+    return await start_or_resume_stream(
+        request,
+        team,
+        members,
+        thread_id,
+        messages,
+        team_chat.interrupt,
+        team_chat.stream,
     )
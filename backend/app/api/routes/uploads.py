@@ -9,12 +9,14 @@ from typing import IO, Annotated, Any
 import aiofiles
 from celery.result import AsyncResult
 from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import ColumnElement
 from sqlmodel import and_, func, select
 from starlette import status
 
 from app.api.deps import CurrentUser, SessionDep
 from app.core.config import settings
+from app.core.rag.search import SEARCH_TYPES, search_upload_chunks
 from app.models import (
     Message,
     Upload,
@@ -357,7 +359,11 @@ async def search_upload(
     session: SessionDep,
 ):
     """
-    Initiate an asynchronous search within a specific upload.
+    Search within a specific upload.
+
+    The search runs in-process on the warm vector store and the results are
+    returned directly. Pass `"background": true` to queue it on celery instead,
+    e.g. for batch evaluation, and poll `GET /{upload_id}/search/{task_id}`.
     """
     upload = session.get(Upload, upload_id)
     if not upload:
@@ -366,10 +372,10 @@ async def search_upload(
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     search_type = search_params.get("search_type", "vector")
-    if search_type not in ["vector", "fulltext", "hybrid"]:
+    if search_type not in SEARCH_TYPES:
         raise HTTPException(status_code=400, detail="Invalid search type")
 
-    task = perform_search.delay(
+    args = (
         current_user.id,
         upload_id,
         search_params["query"],
@@ -377,8 +383,12 @@ async def search_upload(
         search_params.get("top_k", 5),
         search_params.get("score_threshold", 0.5),
     )
+    if search_params.get("background"):
+        task = perform_search.delay(*args)
+        return {"task_id": task.id}
 
-    return {"task_id": task.id}
+    results = await run_in_threadpool(search_upload_chunks, *args)
+    return {"status": "completed", "results": results}
 
 
 @router.get("/{upload_id}/search/{task_id}")
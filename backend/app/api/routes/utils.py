@@ -1,7 +1,12 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.graph.checkpoint.pool import checkpoint_pool
+from app.core.graph.stream_runs import stream_runs
+from app.core.workflow.utils.offload import node_offloader
 from app.models import Message
 from app.utils import generate_test_email, send_email
 
@@ -24,3 +29,37 @@ def test_email(email_to: EmailStr) -> Message:
         html_content=email_data.html_content,
     )
     return Message(message="Test email sent")
+
+
+@router.get(
+    "/metrics/checkpoint-pool/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_checkpoint_pool_metrics() -> dict[str, Any]:
+    """
+    Checkpointer connection pool saturation and wait time.
+    """
+    return checkpoint_pool.get_stats()
+
+
+@router.get(
+    "/metrics/offload/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_offload_metrics() -> dict[str, Any]:
+    """
+    Thread pool queue depth of blocking workflow nodes, per node type.
+    """
+    return node_offloader.get_stats()
+
+
+@router.get(
+    "/metrics/streams/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_stream_metrics() -> dict[str, Any]:
+    """
+    Active chat streams and how finished ones ended, including runs cancelled
+    because the client disconnected.
+    """
+    return stream_runs.get_stats()
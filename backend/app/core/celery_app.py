@@ -23,7 +23,7 @@ celery_app = Celery(
     # broker="redis://localhost:6379/0",
     backend=settings.CELERY_RESULT_BACKEND,
     # backend="redis://localhost:6379/0",
-    include=["app.tasks.tasks"],
+    include=["app.tasks.tasks", "app.tasks.stream_tasks"],
 )
 
 #celery_app.config_from_object(celery_config)
@@ -31,7 +31,11 @@ celery_app.conf.update(
     result_expires=3600,
 )
 
-celery_app.conf.task_routes = {"app.worker.celery_worker.*": "main-queue"}
+celery_app.conf.task_routes = {
+    "app.worker.celery_worker.*": "main-queue",
+    # 图执行任务进入单独的队列, 由专门的 runner 消费 (celery worker -Q graph-runners)
+    "app.tasks.stream_tasks.*": {"queue": settings.STREAM_RUNNER_QUEUE},
+}
 celery_app.conf.update(task_track_started=True)
 
 # 配置 Celery 日志
@@ -74,6 +74,11 @@ class Settings(BaseSettings):
         "prepare_threshold": 0,
         "row_factory": dict_row,
     }
+    # Connection pool shared by every checkpointer in a process
+    CHECKPOINT_POOL_MIN_SIZE: int = 2
+    CHECKPOINT_POOL_MAX_SIZE: int = 20
+    # Seconds to wait for a free connection before failing the request
+    CHECKPOINT_POOL_TIMEOUT: float = 30.0
 
     @computed_field  # type: ignore[misc]
     @property
@@ -149,6 +154,10 @@ class Settings(BaseSettings):
 
 
     QDRANT_COLLECTION: str | None = "kb_uploads"
+    # 向量库后端: ignite (MongoDB 协议) 或 qdrant
+    VECTOR_STORE_BACKEND: Literal["ignite", "qdrant"] = "ignite"
+    # Seconds before cached vector stores re-check embedding provider credentials
+    VECTOR_STORE_CREDENTIALS_TTL: int = 60
 
     # Embeddings配置
     EMBEDDING_PROVIDER: str = "siliconflow"
@@ -164,6 +173,21 @@ class Settings(BaseSettings):
     )
     ZHIPUAI_API_KEY: str | None = None
     SILICONFLOW_API_KEY: str | None = None
+    # 文档入库: 每批 embedding 的 chunk 数, 并发批次数, 单批重试次数
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 3
+    EMBEDDING_REQUEST_TIMEOUT: float = 60.0
+    # 按 (模型, 文本 hash) 复用已计算的 embedding
+    EMBEDDING_CACHE_ENABLED: bool = True
+    # Seconds before a cached BM25 index re-checks whether its upload changed
+    BM25_INDEX_TTL: int = 5
+    # 混合检索: 融合方式 (rrf / weighted), 各路权重
+    HYBRID_FUSION: Literal["rrf", "weighted"] = "rrf"
+    HYBRID_VECTOR_WEIGHT: float = 0.5
+    HYBRID_FULLTEXT_WEIGHT: float = 0.5
+    HYBRID_RRF_K: int = 60
+    HYBRID_SEARCH_WORKERS: int = 8
     OLLAMA_BASE_URL: str | None = None
 
     # Celery
@@ -172,6 +196,68 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 50_000_000
 
     RECURSION_LIMIT: int = 25
+    # 模型凭据缓存的有效期 (秒), 本进程内修改 provider/model 时立即失效
+    MODEL_REGISTRY_TTL: int = 60
+    # 池化的 chat model 客户端数量上限
+    CHAT_MODEL_POOL_SIZE: int = 128
+    # 提示词中对话历史的默认窗口, 团队和节点可以单独配置
+    # all (默认, 保留完整历史) | last_n | token_budget | summary
+    HISTORY_STRATEGY: str = "all"
+    HISTORY_LAST_N: int = 20
+    HISTORY_MAX_TOKENS: int = 8000
+    HISTORY_TOKENIZER: str = "cl100k_base"
+    # 工作流节点回传完整的 history/node_outputs 时报错 (默认仅记录一次警告)
+    WORKFLOW_STRICT_STATE_DELTAS: bool = False
+    # SSE 合并连续 token 的默认窗口, 0 表示逐 token 发送; 可按请求覆盖
+    STREAM_COALESCE_MS: int = 0
+    STREAM_COALESCE_BYTES: int = 0
+    # 客户端断开检测间隔 (秒), 以及取消后等待检查点写完的最长时间
+    STREAM_DISCONNECT_POLL_INTERVAL: float = 1.0
+    STREAM_CANCEL_TIMEOUT: float = 10.0
+    # 断线后等待客户端带 Last-Event-ID 重连的时间 (秒), 超时未重连则取消执行
+    STREAM_RESUME_GRACE: float = 30.0
+    # 每个 run 保留的最近帧数, 以及结束后可回放的时间 (秒)
+    STREAM_REPLAY_BUFFER_SIZE: int = 2048
+    STREAM_REPLAY_TTL: float = 300.0
+    # 设置后回放缓冲放在 Redis (或兼容服务) 中, 多个 worker 进程之间可续传
+    STREAM_REPLAY_REDIS_URL: str | None = None
+    # inline: 在 API 进程内执行图; queue: 交给 Celery 图执行 worker (runner),
+    # 事件经回放缓冲和 pub/sub 回传, 需要 Redis
+    STREAM_EXECUTION: Literal["inline", "queue"] = "inline"
+    STREAM_RUNNER_QUEUE: str = "graph-runners"
+
+    # 阻塞型节点 (crewai/plugin/retrieval/code) 的线程池及各类型并发上限
+    OFFLOAD_MAX_WORKERS: int = 32
+    OFFLOAD_DEFAULT_LIMIT: int = 8
+    OFFLOAD_NODE_LIMITS: dict[str, int] = {
+        "crewai": 2,
+        "code": 4,
+        "plugin": 8,
+        "retrieval": 8,
+    }
+
+    # MCP 连接池
+    MCP_CONNECT_RETRIES: int = 3
+    MCP_HEALTH_CHECK_INTERVAL: int = 30
+    MCP_HEALTH_CHECK_TIMEOUT: float = 5.0
+    MCP_IDLE_TIMEOUT: int = 300
+    # 代码节点沙箱: 预热 worker 数量, 上限, 单次执行的 CPU 秒数及内存上限
+    CODE_SANDBOX_MIN_SIZE: int = 2
+    CODE_SANDBOX_MAX_SIZE: int = 8
+    CODE_SANDBOX_CPU_LIMIT: int = 30
+    CODE_SANDBOX_MAX_MEMORY: str = "1g"
+    CODE_SANDBOX_CONTAINER_CPUS: float = 1.0
+    CODE_SANDBOX_ACQUIRE_TIMEOUT: float = 30.0
+    CODE_SANDBOX_INSTALL_TIMEOUT: float = 300.0
+    CODE_SANDBOX_SITE_DIR: str = "/tmp/flock-code-sandbox/site-packages"
+    # 每个 worker 执行多少次后回收, 避免脚本残留的状态越积越多
+    CODE_SANDBOX_MAX_RUNS: int = 100
+    # Max number of compiled team graphs kept in memory per process
+    GRAPH_CACHE_SIZE: int = 128
+    # 已编译图的最长缓存时间 (秒), 其他进程修改技能, 子图或凭据后最迟在此之后重新编译
+    GRAPH_CACHE_TTL: int = 300
+    # 子图配置的重新检查间隔 (秒), 本进程内修改子图时立即失效
+    SUBGRAPH_CACHE_TTL: int = 60
     TAVILY_API_KEY: str | None = None
 
     OPENAI_API_KEY: str | None = None
@@ -10,14 +10,13 @@ from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool
 from langgraph.checkpoint.base import BaseCheckpointSaver
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.graph import END, StateGraph
 from langgraph.graph.graph import CompiledGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.types import Command
-from psycopg import AsyncConnection
 
 from app.core.config import settings
+from app.core.graph.checkpoint.pool import checkpoint_pool
 from app.core.graph.members import (
     GraphLeader,
     GraphMember,
@@ -28,10 +27,32 @@ from app.core.graph.members import (
     SummariserNode,
     WorkerNode,
 )
-from app.core.graph.messages import ChatResponse, event_to_response
+from app.core.graph.graph_cache import (
+    CompiledTeamGraph,
+    bind_checkpointer,
+    compiled_graph_cache,
+    team_graph_cache_key,
+)
+from app.core.graph.messages import (
+    ChatResponse,
+    event_to_response,
+    node_labels,
+    stream_event_filter,
+)
+from app.core.graph.sse import SSEEncoder, encode_response
+from app.core.history import HistoryConfig
 from app.core.state import GraphSkill, GraphUpload
 from app.core.workflow.build_workflow import initialize_graph
-from app.models import ChatMessage, Interrupt, InterruptDecision, Member, Team
+from app.core.workflow.subgraph_cache import subgraph_cache
+from app.core.workflow.utils.model_registry import model_registry
+from app.models import (
+    ChatMessage,
+    Interrupt,
+    InterruptDecision,
+    Member,
+    StreamOptions,
+    Team,
+)
 
 
 def convert_hierarchical_team_to_dict(
@@ -54,6 +75,7 @@ def convert_hierarchical_team_to_dict(
         This function assumes that each team has a single root leader.
     """
     teams: dict[str, GraphTeam] = {}
+    history = HistoryConfig.from_dict(team.history_config)
 
     in_counts: defaultdict[int, int] = defaultdict(int)
     out_counts: defaultdict[int, list[int]] = defaultdict(list[int])
@@ -88,6 +110,7 @@ def convert_hierarchical_team_to_dict(
                 members={},
                 provider=member.provider,
                 temperature=member.temperature,
+                history=history,
             )
         # If member is not root team leader, add as a member
         if member.type != "root" and member.source:
@@ -445,7 +468,7 @@ def create_hierarchical_graph(
 
 
 def create_sequential_graph(
-    team: Mapping[str, GraphMember], checkpointer: BaseCheckpointSaver
+    team: Mapping[str, GraphMember], checkpointer: BaseCheckpointSaver | None = None
 ) -> CompiledGraph:
     """
     Creates a sequential graph from a list of team members.
@@ -529,7 +552,7 @@ def create_sequential_graph(
 
 
 def create_chatbot_ragbot_graph(
-    team: Mapping[str, GraphMember], checkpointer: BaseCheckpointSaver
+    team: Mapping[str, GraphMember], checkpointer: BaseCheckpointSaver | None = None
 ) -> CompiledGraph:
     """
     Creates a simple chatbot graph for a single team member.
@@ -611,14 +634,80 @@ def convert_messages_and_tasks_to_dict(data: Any) -> Any:
         return data
 
 
+def team_model_names(team: Team, members: list[Member]) -> set[str]:
+    """Collect the names of every model the team's graph is built with."""
+    if team.workflow == "workflow":
+        names = set()
+        for node in team.graphs[0].config.get("nodes", []):
+            data = node.get("data", {})
+            model = data.get("model") or (data.get("llm_config") or {}).get("model")
+            if model:
+                names.add(model)
+        return names
+    return {member.model for member in members if member.model}
+
+
+def compile_team_graph(team: Team, members: list[Member]) -> CompiledTeamGraph:
+    """
+    Compile the graph of a team without a checkpointer.
+
+    The result only depends on the team's members (or graph config for workflow
+    teams) so it is safe to share between threads and cache.
+
+    Args:
+        team (Team): The team whose graph should be compiled.
+        members (list[Member]): The members of the team, with skills and uploads.
+
+    Returns:
+        CompiledTeamGraph: The compiled graph, the team passed as initial state
+            and the name of the first member for sequential-like workflows.
+    """
+    # 一次性解析所有模型的凭据, 节点构造时直接命中缓存
+    model_registry.resolve(team_model_names(team, members))
+    if team.workflow == "hierarchical":
+        teams = convert_hierarchical_team_to_dict(team, members)
+        team_leader = list(teams.keys())[0]
+        root = create_hierarchical_graph(teams, leader_name=team_leader)
+        return CompiledTeamGraph(graph=root, team=teams[team_leader])
+    elif team.workflow in ["sequential", "ragbot", "chatbot"]:
+        if team.workflow == "sequential":
+            member_dict = convert_sequential_team_to_dict(members)
+            root = create_sequential_graph(member_dict)
+        else:
+            member_dict = convert_chatbot_chatrag_team_to_dict(
+                members, workflow_type=team.workflow
+            )
+            root = create_chatbot_ragbot_graph(member_dict)
+        first_member = list(member_dict.values())[0]
+        graph_team = GraphTeam(
+            name=first_member.name,
+            role=first_member.role,
+            backstory=first_member.backstory,
+            members=member_dict,  # type: ignore[arg-type]
+            provider=first_member.provider,
+            model=first_member.model,
+            temperature=first_member.temperature,
+            history=HistoryConfig.from_dict(team.history_config),
+        )
+        return CompiledTeamGraph(graph=root, team=graph_team, entry=first_member.name)
+    elif team.workflow in ["workflow"]:
+        graph_config = team.graphs[0].config
+        root = initialize_graph(graph_config, save_graph_img=False)
+        return CompiledTeamGraph(graph=root)
+    else:
+        raise ValueError("Unsupported graph type ")
+
+
 async def generator(
     team: Team,
     members: list[Member],
     messages: list[ChatMessage],
     thread_id: str,
     interrupt: Interrupt | None = None,
+    stream_options: StreamOptions | None = None,
 ) -> AsyncGenerator[Any, Any]:
     """Create the graph and stream responses as JSON."""
+    encoder = SSEEncoder(stream_options)
 
     formatted_messages = [
         (
@@ -640,104 +729,39 @@ async def generator(
     ]
 
     try:
-        async with await AsyncConnection.connect(
-            settings.PG_DATABASE_URI,
-            **settings.SQLALCHEMY_CONNECTION_KWARGS,
-        ) as conn:
-            checkpointer = AsyncPostgresSaver(conn=conn)
+        async with checkpoint_pool.checkpointer() as checkpointer:
+            # 在事件循环外完成模型凭据的数据库查询
+            credentials = await model_registry.aresolve(
+                team_model_names(team, members)
+            )
+            compiled = compiled_graph_cache.get_or_build(
+                team_graph_cache_key(team, members, credentials),
+                partial(compile_team_graph, team, members),
+            )
+            root = bind_checkpointer(compiled.graph, checkpointer)
             if team.workflow == "hierarchical":
-                teams = convert_hierarchical_team_to_dict(team, members)
-                team_leader = list(teams.keys())[0]
-                root = create_hierarchical_graph(
-                    teams, leader_name=team_leader, checkpointer=checkpointer
-                )
                 state: dict[str, Any] | None = {
                     "history": formatted_messages,
                     "messages": [],
-                    "team": teams[team_leader],
+                    "team": compiled.team,
                     "main_task": formatted_messages,
                     "all_messages": formatted_messages,
                 }
-            elif team.workflow == "sequential":
-
-                member_dict = convert_sequential_team_to_dict(members)
-                root = create_sequential_graph(member_dict, checkpointer)
-                first_member = list(member_dict.values())[0]
+            elif team.workflow in ["sequential", "ragbot", "chatbot"]:
                 state = {
                     "history": formatted_messages,
-                    "team": GraphTeam(
-                        name=first_member.name,
-                        role=first_member.role,
-                        backstory=first_member.backstory,
-                        members=member_dict,  # type: ignore[arg-type]
-                        provider=first_member.provider,
-                        model=first_member.model,
-                        temperature=first_member.temperature,
-                    ),
+                    "team": compiled.team,
                     "messages": [],
-                    "next": first_member.name,
+                    "next": compiled.entry,
                     "all_messages": formatted_messages,
                 }
-
-            elif team.workflow in ["ragbot"]:
-                member_dict = convert_chatbot_chatrag_team_to_dict(
-                    members, workflow_type=team.workflow
-                )
-                root = create_chatbot_ragbot_graph(member_dict, checkpointer)
-                first_member = list(member_dict.values())[0]
-                state = {
-                    "history": formatted_messages,
-                    "team": GraphTeam(
-                        name=first_member.name,
-                        role=first_member.role,
-                        backstory=first_member.backstory,
-                        members=member_dict,  # type: ignore[arg-type]
-                        provider=first_member.provider,
-                        model=first_member.model,
-                        temperature=first_member.temperature,
-                    ),
-                    "messages": [],
-                    "next": first_member.name,
-                    "all_messages": formatted_messages,
-                }
-            elif team.workflow in ["chatbot"]:
-                member_dict = convert_chatbot_chatrag_team_to_dict(
-                    members, workflow_type=team.workflow
-                )
-
-                root = create_chatbot_ragbot_graph(member_dict, checkpointer)
-
-                first_member = list(member_dict.values())[0]
-                state = {
-                    "history": formatted_messages,
-                    "team": GraphTeam(
-                        name=first_member.name,
-                        role=first_member.role,
-                        backstory=first_member.backstory,
-                        members=member_dict,  # type: ignore[arg-type]
-                        provider=first_member.provider,
-                        model=first_member.model,
-                        temperature=first_member.temperature,
-                    ),
-                    "messages": [],
-                    "next": first_member.name,
-                    "all_messages": formatted_messages,
-                }
-            elif team.workflow in ["workflow"]:
-
+            else:
                 graph_config = team.graphs[0].config
-
-                root = initialize_graph(
-                    graph_config, checkpointer, save_graph_img=False
-                )
-
                 state = {
                     "history": formatted_messages,
                     "messages": [],
                     "all_messages": formatted_messages,
                 }
-            else:
-                raise ValueError("Unsupported graph type ")
 
             config: RunnableConfig = {
                 "configurable": {"thread_id": thread_id},
@@ -853,17 +877,27 @@ async def generator(
                     raise ValueError(
                         f"Unsupported interrupt type: {interrupt.interaction_type}"
                     )
-            async for event in root.astream_events(state, version="v2", config=config):
-                # 如果是workflow类型且有graph_config，则传入nodes参数
-                nodes = (
-                    graph_config["nodes"]
-                    if team.workflow == "workflow" and "nodes" in graph_config
-                    else None
-                )
-                response = event_to_response(event, nodes=nodes)
-                if response:
-                    formatted_output = f"data: {response.model_dump_json()}\n\n"
-                    yield formatted_output
+            # workflow类型的节点标签, 每个请求只计算一次
+            # 子图内节点的事件同样经过回调上报, 其节点也要计入
+            workflow_nodes = (
+                await subgraph_cache.anodes(graph_config)
+                if team.workflow == "workflow"
+                else []
+            )
+            labels = node_labels(workflow_nodes) if workflow_nodes else None
+            # 只订阅会转换成响应的事件
+            event_filter = stream_event_filter(
+                [node["id"] for node in workflow_nodes]
+                if team.workflow == "workflow"
+                else [member.name for member in members]
+            )
+            async for event in root.astream_events(
+                state, version="v2", config=config, **event_filter
+            ):
+                for frame in encoder.push(event_to_response(event, labels=labels)):
+                    yield frame
+            for frame in encoder.flush():
+                yield frame
             snapshot = await root.aget_state(config)
 
             if snapshot.next:
@@ -922,12 +956,11 @@ async def generator(
                             id=str(uuid4()),
                         )
 
-                formatted_output = f"data: {response.model_dump_json()}\n\n"
-                yield formatted_output
+                yield encode_response(response)
     except Exception as e:
         response = ChatResponse(
             type="error", content=str(e), id=str(uuid4()), name="error"
         )
-        yield f"data: {response.model_dump_json()}\n\n"
+        yield encode_response(response)
         await asyncio.sleep(0.1)  # Add a small delay to ensure the message is sent
         raise e
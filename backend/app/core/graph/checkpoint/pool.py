@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg_pool import AsyncConnectionPool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointPool:
+    """Process-wide Postgres connection pool backing the LangGraph checkpointer.
+
+    The pool is opened in the FastAPI lifespan; other processes (celery workers,
+    scripts) open it lazily on first use.
+    """
+
+    def __init__(self) -> None:
+        self._pool: AsyncConnectionPool | None = None
+        self._lock: asyncio.Lock | None = None
+
+    async def open(self) -> AsyncConnectionPool:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._pool is None:
+                pool = AsyncConnectionPool(
+                    conninfo=settings.PG_DATABASE_URI,
+                    min_size=settings.CHECKPOINT_POOL_MIN_SIZE,
+                    max_size=settings.CHECKPOINT_POOL_MAX_SIZE,
+                    timeout=settings.CHECKPOINT_POOL_TIMEOUT,
+                    kwargs=settings.SQLALCHEMY_CONNECTION_KWARGS,
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                self._pool = pool
+                logger.info(
+                    f"Checkpoint pool opened (min={pool.min_size}, max={pool.max_size})"
+                )
+        return self._pool
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+            logger.info("Checkpoint pool closed")
+
+    @asynccontextmanager
+    async def checkpointer(self) -> AsyncIterator[AsyncPostgresSaver]:
+        """
+        Yield a checkpointer backed by the shared pool.
+
+        Every query borrows a connection from the pool for its own duration only.
+        The saver itself is cheap, but serialises its queries behind an instance
+        lock, so each run gets its own instead of all runs contending on one.
+        """
+        pool = self._pool or await self.open()
+        yield AsyncPostgresSaver(conn=pool)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Pool size, saturation and wait time counters since the pool opened."""
+        if self._pool is None:
+            return {"open": False}
+        stats = self._pool.get_stats()
+        pool_size = stats.get("pool_size", 0)
+        in_use = pool_size - stats.get("pool_available", 0)
+        queued = stats.get("requests_queued", 0)
+        wait_ms = stats.get("requests_wait_ms", 0)
+        return {
+            "open": True,
+            "min_size": self._pool.min_size,
+            "max_size": self._pool.max_size,
+            "pool_size": pool_size,
+            "in_use": in_use,
+            "saturation": in_use / self._pool.max_size,
+            "requests_waiting": stats.get("requests_waiting", 0),
+            "requests_num": stats.get("requests_num", 0),
+            "requests_queued": queued,
+            "requests_timeouts": stats.get("requests_errors", 0),
+            "requests_wait_ms": wait_ms,
+            "avg_wait_ms": wait_ms / queued if queued else 0.0,
+            "connections_num": stats.get("connections_num", 0),
+            "connections_errors": stats.get("connections_errors", 0),
+        }
+
+
+checkpoint_pool = CheckpointPool()
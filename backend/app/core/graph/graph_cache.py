@@ -0,0 +1,185 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.graph import CompiledGraph
+
+from app.core.config import settings
+from app.core.state import GraphTeam
+from app.models import Member, Team
+
+logger = logging.getLogger(__name__)
+
+GraphCacheKey = tuple[int, str, str]
+
+
+@dataclass(frozen=True)
+class CompiledTeamGraph:
+    """A compiled team graph together with the team it was compiled for.
+
+    The graph is compiled without a checkpointer so it can be shared between
+    concurrent streams; bind one per invocation with `bind_checkpointer`.
+    """
+
+    graph: CompiledGraph
+    team: GraphTeam | None = None
+    entry: str | None = None
+
+
+def _member_fingerprint(member: Member) -> dict[str, Any]:
+    """Collect every member field that affects the compiled graph."""
+    return {
+        "id": member.id,
+        "name": member.name,
+        "type": member.type,
+        "source": member.source,
+        "role": member.role,
+        "backstory": member.backstory,
+        "provider": member.provider,
+        "model": member.model,
+        "temperature": member.temperature,
+        "interrupt": member.interrupt,
+        "skills": [
+            {
+                "id": skill.id,
+                "name": skill.name,
+                "managed": skill.managed,
+                "tool_definition": skill.tool_definition,
+                "credentials": skill.credentials,
+            }
+            for skill in member.skills
+        ],
+        "uploads": [
+            {
+                "id": upload.id,
+                "name": upload.name,
+                "description": upload.description,
+                "owner_id": upload.owner_id,
+            }
+            for upload in member.uploads
+        ],
+    }
+
+
+def bind_checkpointer(
+    graph: CompiledGraph, checkpointer: BaseCheckpointSaver | None
+) -> CompiledGraph:
+    """Return a shallow copy of a shared compiled graph using `checkpointer`.
+
+    Nested subgraphs are compiled without a checkpointer and inherit this one.
+    """
+    bound = copy.copy(graph)
+    bound.checkpointer = checkpointer
+    return bound
+
+
+def team_graph_cache_key(
+    team: Team,
+    members: list[Member],
+    credentials: dict[str, dict[str, str]] | None = None,
+) -> GraphCacheKey:
+    """
+    Build the cache key for a team's compiled graph.
+
+    Workflow teams are keyed by their graph config, every other workflow type by
+    the history config and the members together with their skills and uploads.
+    Both also include `credentials`, the model registry entries the graph is
+    built with, so a rotated API key or base URL compiles a new graph in every
+    process once its registry reloads.
+    """
+    assert team.id is not None, "team.id is unexpectedly None"
+    payload: Any
+    if team.workflow == "workflow":
+        payload = team.graphs[0].config if team.graphs else None
+    else:
+        payload = {
+            "history": team.history_config,
+            "members": [_member_fingerprint(member) for member in members],
+        }
+    payload = {"graph": payload, "credentials": credentials}
+    digest = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return (team.id, team.workflow, digest)
+
+
+class CompiledGraphCache:
+    """
+    Process-wide LRU cache of compiled team graphs.
+
+    Entries expire `ttl` seconds after they were compiled, so changes made
+    through another process (skills, subgraphs, credentials not in the key)
+    are picked up here too; routes of this process invalidate right away.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[GraphCacheKey, CompiledTeamGraph] = OrderedDict()
+        self._built_at: dict[GraphCacheKey, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: GraphCacheKey) -> CompiledTeamGraph | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - self._built_at[key] >= self.ttl:
+                del self._entries[key]
+                del self._built_at[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: GraphCacheKey, entry: CompiledTeamGraph) -> None:
+        with self._lock:
+            # A team only ever needs its latest version, drop the stale ones.
+            for stale_key in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale_key]
+                del self._built_at[stale_key]
+            self._entries[key] = entry
+            self._built_at[key] = time.monotonic()
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                del self._built_at[evicted]
+
+    def get_or_build(
+        self, key: GraphCacheKey, build: Callable[[], CompiledTeamGraph]
+    ) -> CompiledTeamGraph:
+        entry = self.get(key)
+        if entry is None:
+            logger.debug(f"Compiling graph for team {key[0]} ({key[1]})")
+            entry = build()
+            self.set(key, entry)
+        return entry
+
+    def invalidate_team(self, team_id: int | None) -> None:
+        """Drop every compiled graph of a team."""
+        if team_id is None:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == team_id]:
+                del self._entries[key]
+                del self._built_at[key]
+
+    def clear(self) -> None:
+        """Drop every compiled graph, e.g. when a shared skill or subgraph changes."""
+        with self._lock:
+            self._entries.clear()
+            self._built_at.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+compiled_graph_cache = CompiledGraphCache(
+    maxsize=settings.GRAPH_CACHE_SIZE, ttl=settings.GRAPH_CACHE_TTL
+)
@@ -14,6 +14,7 @@ from langchain_openai import ChatOpenAI
 from langgraph.graph import add_messages
 from typing_extensions import NotRequired, TypedDict
 
+from app.core.history import aformat_history
 from app.core.model_providers.model_provider_manager import model_provider_manager
 from app.core.state import (
     GraphLeader,
@@ -83,6 +84,12 @@ class BaseNode:
         ai_message.name = name
         return ai_message
 
+    async def aformat_history(self, state: GraphTeamState) -> str:
+        """Render the team's history within the team's history window"""
+        return await aformat_history(
+            state["history"], state["team"].history, self.final_answer_model
+        )
+
     def get_team_members_name(
         self, team_members: Mapping[str, GraphMember | GraphLeader]
     ) -> str:
@@ -152,7 +159,7 @@ class WorkerNode(BaseNode):
             team_name=state["team"].name,
             team_members_name=team_members_name,
             persona=member.persona,
-            history_string=format_messages(state["history"]),
+            history_string=await self.aformat_history(state),
             task_string=format_messages(state["task"]),
         )
         # If member has no tools, then use a regular model instead of an agent
@@ -220,7 +227,8 @@ class SequentialWorkerNode(WorkerNode):
         member = team.members[name]
         assert isinstance(member, GraphMember), "member is unexpectedly not a Member"
         prompt = self.worker_prompt.partial(
-            persona=member.persona, history_string=format_messages(state["history"])
+            persona=member.persona,
+            history_string=await self.aformat_history(state),
         )
         # If member has no tools, then use a regular model instead of an agent
         if len(member.tools) >= 1:
@@ -345,7 +353,7 @@ class LeaderNode(BaseNode):
                 team_members_info=team_members_info,
                 persona=team.persona,
                 team_task=state["main_task"][0].content,
-                history_string=format_messages(state["history"]),
+                history_string=await self.aformat_history(state),
                 options=str(options),
             )
             | bind_tool
@@ -404,7 +412,7 @@ class SummariserNode(BaseNode):
                 team_name=team.name,
                 team_members_name=team_members_name,
                 team_task=team_task,
-                history_string=format_messages(state["history"]),
+                history_string=await self.aformat_history(state),
             )
             | self.final_answer_model
             | RunnableLambda(self.tag_with_name).bind(name=f"{team.name}_answer")  # type: ignore[arg-type]
@@ -444,7 +452,8 @@ class ChatBotNode(BaseNode):
         assert isinstance(member, GraphMember), "member is unexpectedly not a Member"
 
         prompt = self.worker_prompt.partial(
-            persona=member.persona, history_string=format_messages(state["history"])
+            persona=member.persona,
+            history_string=await self.aformat_history(state),
         )
         # If member has no tools, then use a regular model instead of an agent
         if len(member.tools) >= 1:
@@ -504,7 +513,8 @@ class RAGBotNode(BaseNode):
         assert isinstance(member, GraphMember), "member is unexpectedly not a Member"
 
         prompt = self.worker_prompt.partial(
-            persona=member.persona, history_string=format_messages(state["history"])
+            persona=member.persona,
+            history_string=await self.aformat_history(state),
         )
         # If member has no tools, then use a regular model instead of an agent
         if len(member.tools) >= 1:
@@ -1,4 +1,5 @@
 import json
+from collections.abc import Iterable, Mapping
 from typing import Any, Dict
 
 from langchain_core.documents import Document
@@ -25,6 +26,28 @@ def get_node_label(node_id: str, nodes: list[Dict[str, Any]] | None = None) -> s
     return node_id
 
 
+# event_to_response 只使用这些事件: 模型和工具的事件, 以及以下前缀节点的 chain 事件
+STREAMED_EVENT_TYPES = ["chat_model", "tool"]
+STREAMED_NODE_PREFIXES = ("answer", "retrieval", "crewai", "classifier", "code")
+
+
+def stream_event_filter(node_names: Iterable[str]) -> dict[str, list[str]]:
+    """astream_events filters limited to the events event_to_response converts"""
+    return {
+        "include_types": STREAMED_EVENT_TYPES,
+        "include_names": [
+            name for name in node_names if name.startswith(STREAMED_NODE_PREFIXES)
+        ],
+    }
+
+
+def node_labels(nodes: list[Dict[str, Any]] | None) -> dict[str, str]:
+    """Map node ids to labels once per stream instead of scanning per event"""
+    if not nodes:
+        return {}
+    return {node["id"]: node["data"].get("label", node["id"]) for node in nodes}
+
+
 class ChatResponse(BaseModel):
     type: str  # ai | human | tool
     id: str
@@ -50,16 +73,20 @@ def get_message_type(message: Any) -> str | None:
 
 
 def event_to_response(
-    event: StreamEvent, nodes: list[Dict[str, Any]] | None = None
+    event: StreamEvent,
+    nodes: list[Dict[str, Any]] | None = None,
+    labels: Mapping[str, str] | None = None,
 ) -> ChatResponse | None:
     """Convert event to ChatResponse"""
+    if labels is None and nodes:
+        labels = node_labels(nodes)
 
     kind = event["event"]
     id = event["run_id"]
 
     if kind == "on_chat_model_stream":
         node_id = event["metadata"]["langgraph_node"]
-        name = get_node_label(node_id, nodes) if nodes else node_id
+        name = labels.get(node_id, node_id) if labels else node_id
         message_chunk: AIMessageChunk = event["data"]["chunk"]
         type = get_message_type(message_chunk)
         content: str = ""
@@ -80,7 +107,7 @@ def event_to_response(
     elif kind == "on_chat_model_end":
         message: AIMessage = event["data"]["output"]
         node_id = event["metadata"]["langgraph_node"]
-        name = get_node_label(node_id, nodes) if nodes else node_id
+        name = labels.get(node_id, node_id) if labels else node_id
         tool_calls = message.tool_calls
         if tool_calls:
             return ChatResponse(
@@ -115,7 +142,7 @@ def event_to_response(
     elif kind == "on_chain_end":
         output = event["data"]["output"]
         node_id = event.get("name", "")
-        name = get_node_label(node_id, nodes) if nodes else node_id
+        name = labels.get(node_id, node_id) if labels else node_id
 
         # 只处理 AnswerNode 的输出
         if node_id and node_id.startswith("answer"):
@@ -139,7 +166,7 @@ def event_to_response(
     elif kind == "on_chain_stream":
         output = event["data"]["chunk"]
         node_id = event.get("name", "")
-        name = get_node_label(node_id, nodes) if nodes else node_id
+        name = labels.get(node_id, node_id) if labels else node_id
 
         if node_id and node_id.startswith("retrieval"):
             if isinstance(output, dict):
@@ -0,0 +1,97 @@
+import time
+from typing import Any
+
+import orjson
+
+from app.core.graph.messages import ChatResponse
+from app.models import StreamOptions
+
+
+def encode_response(response: ChatResponse) -> bytes:
+    """Serialize a response as one SSE frame.
+
+    Same JSON as `model_dump_json()`: ChatResponse only holds plain values,
+    so its field dict is handed to orjson without a pydantic dump.
+    """
+    return b"data: " + orjson.dumps(response.__dict__) + b"\n\n"
+
+
+class SSEEncoder:
+    """
+    Encodes the responses of one chat stream into SSE frames.
+
+    With coalescing enabled, consecutive content chunks of the same run are
+    buffered and sent as a single frame once `coalesce_ms` have passed since
+    the first buffered chunk, `coalesce_bytes` of content are buffered, or a
+    response that cannot be merged arrives. Call `tick()` for every stream
+    event, including those without a response, so time-based flushes are not
+    delayed by silent events, and `flush()` at the end of the stream.
+    """
+
+    def __init__(self, options: StreamOptions | None = None) -> None:
+        options = options or StreamOptions()
+        self.coalesce_seconds = options.coalesce_ms / 1000
+        self.coalesce_bytes = options.coalesce_bytes
+        self.enabled = self.coalesce_seconds > 0 or self.coalesce_bytes > 0
+        self._pending: ChatResponse | None = None
+        self._parts: list[str] = []
+        self._size = 0
+        self._started_at = 0.0
+
+    @staticmethod
+    def _mergeable(response: ChatResponse) -> bool:
+        return (
+            response.type == "ai"
+            and bool(response.content)
+            and not response.tool_calls
+            and response.tool_output is None
+            and response.documents is None
+            and response.imgdata is None
+            and response.next is None
+        )
+
+    def _same_run(self, response: ChatResponse) -> bool:
+        pending = self._pending
+        return (
+            pending is not None
+            and pending.id == response.id
+            and pending.name == response.name
+        )
+
+    def _due(self) -> bool:
+        if self.coalesce_bytes and self._size >= self.coalesce_bytes:
+            return True
+        return (
+            self.coalesce_seconds > 0
+            and time.monotonic() - self._started_at >= self.coalesce_seconds
+        )
+
+    def flush(self) -> list[bytes]:
+        if self._pending is None:
+            return []
+        fields: dict[str, Any] = dict(self._pending.__dict__)
+        fields["content"] = "".join(self._parts)
+        self._pending, self._parts, self._size = None, [], 0
+        return [b"data: " + orjson.dumps(fields) + b"\n\n"]
+
+    def tick(self) -> list[bytes]:
+        if self._pending is not None and self._due():
+            return self.flush()
+        return []
+
+    def push(self, response: ChatResponse | None) -> list[bytes]:
+        """Add the response of a stream event, returning frames ready to send."""
+        if response is None:
+            return self.tick()
+        if not self.enabled:
+            return [encode_response(response)]
+        if not self._mergeable(response):
+            return self.flush() + [encode_response(response)]
+
+        frames = [] if self._same_run(response) else self.flush()
+        if self._pending is None:
+            self._pending = response
+            self._started_at = time.monotonic()
+        self._parts.append(response.content)  # type: ignore[arg-type]
+        self._size += len(response.content.encode("utf-8"))  # type: ignore[union-attr]
+        return frames + self.tick()
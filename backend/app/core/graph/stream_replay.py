@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryReplayBuffer:
+    """
+    Per-run replay buffers held in this process.
+
+    Each run keeps its last `size` frames. Finished runs stay readable for
+    `ttl` seconds so a client that lost the end of a stream can replay it.
+    Only reconnects served by the same worker process can be resumed.
+    """
+
+    def __init__(self, size: int, ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self._runs: dict[str, dict[str, Any]] = {}
+        # 已结束的 run, 按过期时间先后排列
+        self._finished: OrderedDict[str, float] = OrderedDict()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        while self._finished:
+            run_id, expires_at = next(iter(self._finished.items()))
+            if expires_at > now:
+                break
+            self._finished.popitem(last=False)
+            self._runs.pop(run_id, None)
+
+    async def create(self, run_id: str, thread_id: str) -> None:
+        self._purge()
+        self._runs[run_id] = {
+            "thread_id": thread_id,
+            "frames": deque(maxlen=self.size),
+            "done": False,
+        }
+
+    async def append(self, run_id: str, seq: int, frame: bytes) -> None:
+        self._runs[run_id]["frames"].append((seq, frame))
+
+    async def finish(self, run_id: str) -> None:
+        run = self._runs.get(run_id)
+        if run is not None:
+            run["done"] = True
+            self._finished[run_id] = time.monotonic() + self.ttl
+
+    async def info(self, run_id: str) -> tuple[str, bool] | None:
+        """The run's thread id and whether it has finished, None if unknown."""
+        self._purge()
+        run = self._runs.get(run_id)
+        if run is None:
+            return None
+        return run["thread_id"], run["done"]
+
+    async def read(self, run_id: str, after: int) -> list[tuple[int, bytes]]:
+        run = self._runs.get(run_id)
+        if run is None:
+            return []
+        return [(seq, frame) for seq, frame in run["frames"] if seq > after]
+
+    async def refresh(self, run_id: str) -> None:
+        pass
+
+    async def touch(self, run_id: str, lease: float) -> None:
+        pass
+
+    def waiter(self, run_id: str) -> asyncio.Event:
+        # 本进程的 run 由 StreamRun 直接通知, 不会经过这里
+        return asyncio.Event()
+
+    def release(self, run_id: str, event: asyncio.Event) -> None:
+        pass
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"backend": "memory", "runs": len(self._runs)}
+
+
+class RedisReplayBuffer:
+    """
+    Per-run replay buffers in Redis, or any server speaking the same
+    commands, shared by every worker process.
+
+    Frames are kept in a sorted set scored by sequence number and trimmed to
+    the last `size`. Keys expire `ttl` seconds after the last write.
+
+    Every write is also published on the run's channel. Each process keeps
+    one pattern subscription to these channels and wakes its local
+    subscribers of runs executing elsewhere, such as on a graph runner.
+    """
+
+    EVENTS_PATTERN = "flock:stream:*:events"
+
+    def __init__(self, url: str, size: int, ttl: float) -> None:
+        import redis.asyncio as redis
+
+        self.client = redis.Redis.from_url(url)
+        self.size = size
+        self.ttl = int(ttl)
+        self._waiters: dict[str, set[asyncio.Event]] = {}
+        self._listener: asyncio.Task | None = None
+
+    @staticmethod
+    def _keys(run_id: str) -> tuple[str, str]:
+        return f"flock:stream:{run_id}", f"flock:stream:{run_id}:frames"
+
+    @staticmethod
+    def _channel(run_id: str) -> str:
+        return f"flock:stream:{run_id}:events"
+
+    async def create(self, run_id: str, thread_id: str) -> None:
+        meta, _ = self._keys(run_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(meta, mapping={"thread_id": thread_id, "done": 0})
+            pipe.expire(meta, self.ttl)
+            await pipe.execute()
+
+    async def append(self, run_id: str, seq: int, frame: bytes) -> None:
+        meta, frames = self._keys(run_id)
+        # 以序号为前缀保证成员唯一
+        member = b"%d:" % seq + frame
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(frames, {member: seq})
+            pipe.zremrangebyrank(frames, 0, -self.size - 1)
+            pipe.expire(frames, self.ttl)
+            pipe.expire(meta, self.ttl)
+            pipe.publish(self._channel(run_id), seq)
+            await pipe.execute()
+
+    async def finish(self, run_id: str) -> None:
+        meta, frames = self._keys(run_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(meta, "done", 1)
+            pipe.expire(meta, self.ttl)
+            pipe.expire(frames, self.ttl)
+            pipe.publish(self._channel(run_id), "done")
+            await pipe.execute()
+
+    async def info(self, run_id: str) -> tuple[str, bool] | None:
+        meta, _ = self._keys(run_id)
+        values = await self.client.hgetall(meta)
+        if not values:
+            return None
+        return values[b"thread_id"].decode(), values.get(b"done") == b"1"
+
+    async def read(self, run_id: str, after: int) -> list[tuple[int, bytes]]:
+        _, frames = self._keys(run_id)
+        members = await self.client.zrangebyscore(frames, f"({after}", "+inf")
+        result = []
+        for member in members:
+            seq, _, frame = member.partition(b":")
+            result.append((int(seq), frame))
+        return result
+
+    async def refresh(self, run_id: str) -> None:
+        """Keep a live run's keys from expiring while it produces no frames."""
+        meta, frames = self._keys(run_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.expire(meta, self.ttl)
+            pipe.expire(frames, self.ttl)
+            await pipe.execute()
+
+    async def touch(self, run_id: str, lease: float) -> None:
+        """Record that a client is following the run for the next `lease` seconds.
+
+        Also keeps the run's keys alive, so a run waiting in the queue or in a
+        long silent step is not mistaken for an expired one.
+        """
+        meta, frames = self._keys(run_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(f"flock:stream:{run_id}:attached", 1, px=int(lease * 1000))
+            pipe.expire(meta, self.ttl)
+            pipe.expire(frames, self.ttl)
+            await pipe.execute()
+
+    async def attached(self, run_id: str) -> bool:
+        return bool(await self.client.exists(f"flock:stream:{run_id}:attached"))
+
+    async def _listen(self) -> None:
+        pubsub = self.client.pubsub()
+        try:
+            await pubsub.psubscribe(self.EVENTS_PATTERN)
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                run_id = message["channel"].decode().split(":")[2]
+                for event in self._waiters.get(run_id, ()):
+                    event.set()
+        except Exception as e:
+            logger.warning(f"Stream event relay stopped: {e}")
+        finally:
+            await pubsub.aclose()
+
+    def waiter(self, run_id: str) -> asyncio.Event:
+        """An event set on every later write to the run, until released."""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        event = asyncio.Event()
+        self._waiters.setdefault(run_id, set()).add(event)
+        return event
+
+    def release(self, run_id: str, event: asyncio.Event) -> None:
+        waiters = self._waiters.get(run_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del self._waiters[run_id]
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"backend": "redis", "relayed_runs": len(self._waiters)}
+
+
+def create_replay_buffer() -> MemoryReplayBuffer | RedisReplayBuffer:
+    size = settings.STREAM_REPLAY_BUFFER_SIZE
+    ttl = settings.STREAM_REPLAY_TTL
+    url = settings.STREAM_REPLAY_REDIS_URL
+    if settings.STREAM_EXECUTION == "queue":
+        # 队列模式下 API 与 runner 必须共享回放缓冲
+        url = url or settings.CELERY_BROKER_URL
+        if not url or not url.startswith(("redis://", "rediss://", "unix://")):
+            raise ValueError(
+                "STREAM_EXECUTION=queue requires STREAM_REPLAY_REDIS_URL "
+                "or a Redis CELERY_BROKER_URL"
+            )
+    if url:
+        logger.info("Stream replay buffers are kept in Redis")
+        return RedisReplayBuffer(url, size, ttl)
+    return MemoryReplayBuffer(size, ttl)
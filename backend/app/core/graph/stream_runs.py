@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import suppress
+from typing import Any
+from uuid import uuid4
+
+import anyio
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.graph.stream_replay import create_replay_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamRun:
+    """A chat stream executing in this process."""
+
+    def __init__(self, run_id: str, thread_id: str) -> None:
+        self.id = run_id
+        self.thread_id = thread_id
+        self.seq = 0
+        self.done = False
+        self.subscribers = 0
+        self.producer: asyncio.Task | None = None
+        self.orphan_timer: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class StreamRuns:
+    """
+    Runs chat streams detached from the request that started them.
+
+    Every frame a run produces gets a sequence number and is kept in a
+    bounded replay buffer, and is sent to clients with an SSE `id` of
+    `<run_id>:<seq>`. A client that reconnects with `Last-Event-ID` is
+    reattached to the live run, or replayed the tail of a finished one,
+    without executing any node again.
+
+    With STREAM_EXECUTION=queue the run executes on a graph runner instead
+    (see `execute`), and subscribers follow it through the shared replay
+    buffer, woken by its pub/sub relay.
+
+    Each subscriber polls `request.is_disconnected()` every
+    STREAM_DISCONNECT_POLL_INTERVAL seconds, so a disconnect is noticed even
+    while a node produces no output. A run left without subscribers is
+    cancelled after STREAM_RESUME_GRACE seconds, and awaited for up to
+    STREAM_CANCEL_TIMEOUT seconds so LangGraph can finish writing the
+    checkpoint of the last completed step.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = create_replay_buffer()
+        self._runs: dict[str, StreamRun] = {}
+        self.active = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.resumed = 0
+        # 订阅其他进程中的 run 时, 客户端在线的租约时长 (秒)
+        self.lease = settings.STREAM_DISCONNECT_POLL_INTERVAL * 3
+
+    async def create(self, thread_id: str) -> str:
+        """Register a new run of the thread and return its id."""
+        run_id = uuid4().hex
+        await self.buffer.create(run_id, thread_id)
+        return run_id
+
+    def _launch(
+        self, run_id: str, thread_id: str, body: AsyncIterator[bytes]
+    ) -> StreamRun:
+        run = StreamRun(run_id, thread_id)
+        self._runs[run_id] = run
+        self.active += 1
+        run.producer = asyncio.create_task(
+            self._produce(run, body), name=f"stream-{thread_id}"
+        )
+        return run
+
+    async def start(self, thread_id: str, body: AsyncIterator[bytes]) -> str:
+        """Start running `body` in the background and return the run id."""
+        run_id = await self.create(thread_id)
+        self._launch(run_id, thread_id, body)
+        return run_id
+
+    async def execute(
+        self, run_id: str, thread_id: str, body: AsyncIterator[bytes]
+    ) -> None:
+        """Run `body` for a run created by an API process, on a graph runner.
+
+        Subscribers hold a lease while connected; the run is cancelled once
+        nobody has held it for STREAM_RESUME_GRACE seconds.
+        """
+        run = self._launch(run_id, thread_id, body)
+        lease = asyncio.create_task(self._watch_lease(run))
+        try:
+            with suppress(asyncio.CancelledError):
+                await run.producer  # type: ignore[misc]
+        finally:
+            lease.cancel()
+
+    async def _watch_lease(self, run: StreamRun) -> None:
+        # 启动时客户端可能还未连上, 至少等一个租约周期
+        grace = max(settings.STREAM_RESUME_GRACE, self.lease)
+        last_seen = time.monotonic()
+        while not run.done:
+            await asyncio.sleep(settings.STREAM_DISCONNECT_POLL_INTERVAL)
+            try:
+                # 长时间无输出的步骤也要让回放缓冲保持有效, 以便续传
+                await self.buffer.refresh(run.id)
+                if await self.buffer.attached(run.id):
+                    last_seen = time.monotonic()
+                    continue
+            except Exception as e:
+                logger.warning(f"Failed to check clients of stream {run.id}: {e}")
+                continue
+            if time.monotonic() - last_seen >= grace and run.producer is not None:
+                logger.info(f"No client is following stream {run.id}, cancelling it")
+                run.producer.cancel()
+                return
+
+    async def _produce(self, run: StreamRun, body: AsyncIterator[bytes]) -> None:
+        outcome = "cancelled"
+        try:
+            async for frame in body:
+                run.seq += 1
+                await self.buffer.append(run.id, run.seq, frame)
+                run.notify()
+            outcome = "completed"
+        except Exception as e:
+            logger.error(f"Stream {run.id} of thread {run.thread_id} failed: {e}")
+            outcome = "failed"
+        finally:
+            run.done = True
+            try:
+                await self.buffer.finish(run.id)
+            except Exception as e:
+                logger.warning(f"Failed to mark stream {run.id} finished: {e}")
+            self._runs.pop(run.id, None)
+            run.notify()
+            self.active -= 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    async def resume(
+        self, request: Request, thread_id: str, last_event_id: str
+    ) -> AsyncIterator[bytes] | None:
+        """Reattach to the run named by `last_event_id`.
+
+        Returns None if the id is malformed, belongs to another thread, or its
+        replay buffer has expired.
+        """
+        run_id, _, seq = last_event_id.partition(":")
+        if not seq.isdigit():
+            return None
+        info = await self.buffer.info(run_id)
+        if info is None or info[0] != thread_id:
+            return None
+        self.resumed += 1
+        logger.info(f"Resuming stream {run_id} of thread {thread_id} after {seq}")
+        return self.subscribe(request, run_id, int(seq))
+
+    async def _watch(self, request: Request) -> None:
+        while not await request.is_disconnected():
+            await asyncio.sleep(settings.STREAM_DISCONNECT_POLL_INTERVAL)
+
+    async def _finished(self, run_id: str, run: StreamRun | None) -> bool:
+        if run is not None:
+            return run.done
+        info = await self.buffer.info(run_id)
+        return info is None or info[1]
+
+    async def subscribe(
+        self, request: Request, run_id: str, after: int = 0
+    ) -> AsyncIterator[bytes]:
+        """Send the frames of a run after sequence number `after`, then follow it."""
+        run = self._runs.get(run_id)
+        relayed = self.buffer.waiter(run_id) if run is None else None
+        if run is not None:
+            self._attach(run)
+        interval = settings.STREAM_DISCONNECT_POLL_INTERVAL
+        watcher = asyncio.create_task(self._watch(request))
+        last = after
+        touched = 0.0
+        try:
+            while not watcher.done():
+                if relayed is None:
+                    changed = run._changed  # type: ignore[union-attr]
+                else:
+                    changed = relayed
+                    changed.clear()
+                    if time.monotonic() - touched >= interval:
+                        await self.buffer.touch(run_id, self.lease)
+                        touched = time.monotonic()
+                # 先取结束标记再读缓冲, 避免漏掉结束前追加的最后几帧
+                finished = await self._finished(run_id, run)
+                frames = await self.buffer.read(run_id, last)
+                if frames and frames[0][0] > last + 1:
+                    logger.warning(
+                        f"Stream {run_id} skipped frames {last + 1}-{frames[0][0] - 1}"
+                        " that left the replay buffer"
+                    )
+                for seq, frame in frames:
+                    yield b"id: %s:%d\n" % (run_id.encode(), seq) + frame
+                    last = seq
+                if frames:
+                    continue
+                if finished:
+                    return
+                waiter = asyncio.ensure_future(changed.wait())
+                try:
+                    # 其他进程的 run 靠 pub/sub 唤醒, 同时按间隔兜底轮询
+                    await asyncio.wait(
+                        {waiter, watcher},
+                        timeout=None if relayed is None else interval,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    waiter.cancel()
+            logger.info(f"Client disconnected from stream {run_id}")
+        finally:
+            watcher.cancel()
+            if relayed is not None:
+                self.buffer.release(run_id, relayed)
+            if run is not None:
+                await self._detach(run)
+
+    def _attach(self, run: StreamRun) -> None:
+        run.subscribers += 1
+        if run.orphan_timer is not None:
+            run.orphan_timer.cancel()
+            run.orphan_timer = None
+
+    async def _detach(self, run: StreamRun) -> None:
+        run.subscribers -= 1
+        if run.subscribers > 0 or run.done or run.producer is None:
+            return
+        if settings.STREAM_RESUME_GRACE > 0:
+            run.orphan_timer = asyncio.create_task(self._cancel_orphan(run))
+            return
+        run.producer.cancel()
+        # Starlette 取消时作用域会反复取消, 需屏蔽才能等待检查点写完
+        with anyio.CancelScope(shield=True):
+            with anyio.move_on_after(settings.STREAM_CANCEL_TIMEOUT):
+                with suppress(asyncio.CancelledError):
+                    await run.producer
+
+    async def _cancel_orphan(self, run: StreamRun) -> None:
+        await asyncio.sleep(settings.STREAM_RESUME_GRACE)
+        if run.subscribers > 0 or run.producer is None or run.producer.done():
+            return
+        logger.info(f"No client reattached to stream {run.id}, cancelling it")
+        run.producer.cancel()
+        with anyio.move_on_after(settings.STREAM_CANCEL_TIMEOUT):
+            with suppress(asyncio.CancelledError):
+                await run.producer
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "active": self.active,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "replay": self.buffer.get_stats(),
+        }
+
+
+stream_runs = StreamRuns()
@@ -0,0 +1,204 @@
+import functools
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Literal
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HistoryStrategy = Literal["all", "last_n", "token_budget", "summary"]
+
+
+class HistoryConfig(BaseModel):
+    """
+    How much of the conversation history is rendered into a prompt.
+
+    - all: every message (the previous behaviour)
+    - last_n: the last `last_n` messages
+    - token_budget: the newest messages that fit in `max_tokens`
+    - summary: like token_budget, with the older messages folded into a
+      rolling summary written by the node's own model
+    """
+
+    strategy: HistoryStrategy = Field(default_factory=lambda: settings.HISTORY_STRATEGY)
+    last_n: int = Field(default_factory=lambda: settings.HISTORY_LAST_N, ge=1)
+    max_tokens: int = Field(default_factory=lambda: settings.HISTORY_MAX_TOKENS, ge=1)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any] | None) -> "HistoryConfig":
+        """Build a config from a team or node setting, missing keys use the defaults."""
+        if not data:
+            return cls()
+        aliases = {"lastN": "last_n", "maxTokens": "max_tokens"}
+        return cls(**{aliases.get(key, key): value for key, value in data.items()})
+
+
+def message_name(message: AnyMessage) -> str:
+    if message.name:
+        return message.name
+    if isinstance(message, AIMessage):
+        return "AI"
+    if isinstance(message, ToolMessage):
+        return "Tool"
+    return "User"
+
+
+def message_text(message: AnyMessage) -> str:
+    # 处理消息内容为列表的情况（包含图片的消息）
+    if not isinstance(message.content, list):
+        return message.content
+    text_contents = []
+    for item in message.content:
+        if isinstance(item, dict):
+            if item.get("type") == "text":
+                text_contents.append(item.get("text", ""))
+            elif item.get("type") == "image_url":
+                text_contents.append("[图片]")
+    return " ".join(text_contents)
+
+
+def format_message(message: AnyMessage) -> str:
+    return f"{message_name(message)}: {message_text(message)}\n\n"
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding() -> Any:
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(settings.HISTORY_TOKENIZER)
+    except Exception as e:
+        logger.warning(
+            f"Tokenizer {settings.HISTORY_TOKENIZER} unavailable ({e}), "
+            "estimating history tokens from length"
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        # 按 UTF-8 字节数粗略估计, 中英文都大致接近实际 token 数
+        return max(1, len(text.encode("utf-8")) // 3)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_history(
+    messages: Sequence[AnyMessage], config: HistoryConfig
+) -> tuple[list[AnyMessage], list[AnyMessage]]:
+    """Split `messages` into the older part left out of the prompt and the kept part."""
+    if config.strategy == "all":
+        return [], list(messages)
+    if config.strategy == "last_n":
+        cut = max(len(messages) - config.last_n, 0)
+        return list(messages[:cut]), list(messages[cut:])
+
+    # 从最新的消息往前累加, 只对预算内的消息计数
+    budget = config.max_tokens
+    cut = len(messages)
+    while cut > 0:
+        budget -= count_tokens(format_message(messages[cut - 1]))
+        if budget < 0:
+            break
+        cut -= 1
+    # 至少保留最新一条消息
+    cut = min(cut, len(messages) - 1) if messages else 0
+    return list(messages[:cut]), list(messages[cut:])
+
+
+SUMMARY_PROMPT = (
+    "Progressively summarize the conversation below, adding onto the previous summary. "
+    "Keep names, facts, decisions and open questions, and leave out small talk. "
+    "Reply with the new summary only.\n\n"
+    "Previous summary:\n{summary}\n\n"
+    "New lines of conversation:\n{lines}"
+)
+
+
+class RollingSummaries:
+    """
+    Process-wide LRU of conversation summaries, keyed by the id of the last
+    message they cover.
+
+    When the summarized prefix of a thread grows, only the newly dropped
+    messages are folded into the latest cached summary, so each turn costs one
+    short summarization call instead of re-reading the whole thread.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._summaries: OrderedDict[str, str] = OrderedDict()
+
+    def _get(self, message_id: str | None) -> str | None:
+        if message_id is None:
+            return None
+        with self._lock:
+            summary = self._summaries.get(message_id)
+            if summary is not None:
+                self._summaries.move_to_end(message_id)
+            return summary
+
+    def _set(self, message_id: str | None, summary: str) -> None:
+        if message_id is None:
+            return
+        with self._lock:
+            self._summaries[message_id] = summary
+            while len(self._summaries) > self.maxsize:
+                self._summaries.popitem(last=False)
+
+    async def asummarize(self, older: Sequence[AnyMessage], model: Runnable) -> str:
+        start, summary = 0, ""
+        for i in range(len(older) - 1, -1, -1):
+            cached = self._get(older[i].id)
+            if cached is not None:
+                start, summary = i + 1, cached
+                break
+        if start == len(older):
+            return summary
+
+        lines = "".join(format_message(message) for message in older[start:])
+        # 摘要调用不挂父级回调, 避免摘要内容出现在对话的流式输出里
+        result = await model.ainvoke(
+            [
+                HumanMessage(
+                    content=SUMMARY_PROMPT.format(summary=summary or "(none)", lines=lines)
+                )
+            ],
+            config={"callbacks": [], "tags": ["history_summary"]},
+        )
+        summary = message_text(result) if isinstance(result, AIMessage) else str(result)
+        self._set(older[-1].id, summary)
+        return summary
+
+
+rolling_summaries = RollingSummaries()
+
+
+async def aformat_history(
+    messages: Sequence[AnyMessage],
+    config: HistoryConfig | None = None,
+    model: Runnable | None = None,
+) -> str:
+    """Render the history for a prompt according to `config`.
+
+    With the summary strategy `model` writes the summary of the older
+    messages; without a model they are dropped as with token_budget.
+    """
+    config = config or HistoryConfig()
+    older, kept = split_history(messages, config)
+    parts = [format_message(message) for message in kept]
+    if older and config.strategy == "summary" and model is not None:
+        try:
+            summary = await rolling_summaries.asummarize(older, model)
+            parts.insert(0, f"Summary of the earlier conversation: {summary}\n\n")
+        except Exception as e:
+            logger.warning(f"Failed to summarize conversation history: {e}")
+    return "".join(parts)
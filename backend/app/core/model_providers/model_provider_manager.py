@@ -1,8 +1,15 @@
 import importlib
+import logging
 import os
-from collections.abc import Callable
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
 from typing import Any
 
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
 
 class ModelProviderManager:
     def __init__(self):
@@ -10,6 +17,9 @@ class ModelProviderManager:
         self.models: dict[str, list[str]] = {}
         self.init_functions: dict[str, Callable] = {}
         self.init_crewai_functions: dict[str, Callable] = {}
+        # (provider, base_url, api_key, model, kwargs) -> 共享 HTTP 连接池的客户端
+        self._clients: OrderedDict[Hashable, Any] = OrderedDict()
+        self._clients_lock = threading.Lock()
         self.load_providers()
 
     def load_providers(self):
@@ -57,14 +67,41 @@ class ModelProviderManager:
         base_url: str,
         **kwargs,
     ):
-        init_function = self.init_functions.get(provider_name)
-        if init_function:
+        """
+        Get a chat model from the client pool.
 
-            return init_function(model, temperature, api_key, base_url, **kwargs)
-        else:
+        One client is built per (provider, base_url, api_key, model, kwargs) and
+        kept alive, so its HTTP connection pool is reused by every node and
+        request. A different temperature yields a shallow copy that shares the
+        pooled client's HTTP clients.
+        """
+        init_function = self.init_functions.get(provider_name)
+        if not init_function:
             raise ValueError(
                 f"No initialization function found for provider: {provider_name}"
             )
+        try:
+            key = (provider_name, base_url, api_key, model, frozenset(kwargs.items()))
+            hash(key)
+        except TypeError:
+            # 参数不可哈希时不做池化
+            return init_function(model, temperature, api_key, base_url, **kwargs)
+
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+        if client is None:
+            client = init_function(model, temperature, api_key, base_url, **kwargs)
+            with self._clients_lock:
+                client = self._clients.setdefault(key, client)
+                while len(self._clients) > settings.CHAT_MODEL_POOL_SIZE:
+                    self._clients.popitem(last=False)
+            logger.debug(f"Pooled chat model client {provider_name}/{model}")
+
+        if getattr(client, "temperature", temperature) == temperature:
+            return client
+        return client.model_copy(update={"temperature": temperature})
 
     def init_crewai_model(
         self,
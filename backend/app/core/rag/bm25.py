@@ -0,0 +1,301 @@
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+
+from sqlalchemy import delete, func
+from sqlmodel import col, select
+
+from app.core.config import settings
+from app.core.workflow.utils.db_utils import db_operation
+from app.models import Bm25Chunk, Upload
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# 写入同一 upload 的 bm25chunk 行时持有的 advisory lock 命名空间
+BM25_LOCK_NAMESPACE = 0x6B25
+
+# 中文按字的二元组切分, 其余按单词切分
+_TOKEN_RE = re.compile(r"[\u4e00-\u9fff]+|[^\W\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> Iterator[str]:
+    for token in _TOKEN_RE.findall(text.lower()):
+        if "\u4e00" <= token[0] <= "\u9fff" and len(token) > 1:
+            for i in range(len(token) - 1):
+                yield token[i : i + 2]
+        else:
+            yield token
+
+
+class Bm25Index:
+    """In-memory inverted index of one knowledge base (upload)."""
+
+    def __init__(self, version: tuple[int, int]) -> None:
+        self.version = version
+        self.postings: dict[str, dict[str, int]] = {}
+        self.doc_terms: dict[str, dict[str, int]] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self.total_length = 0
+        self.checked_at = time.monotonic()
+
+    def add(self, chunk_id: str, length: int, term_freqs: dict[str, int]) -> None:
+        self.remove(chunk_id)
+        self.doc_terms[chunk_id] = term_freqs
+        self.doc_lengths[chunk_id] = length
+        self.total_length += length
+        for term, tf in term_freqs.items():
+            self.postings.setdefault(term, {})[chunk_id] = tf
+
+    def remove(self, chunk_id: str) -> None:
+        term_freqs = self.doc_terms.pop(chunk_id, None)
+        if term_freqs is None:
+            return
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+        for term in term_freqs:
+            postings = self.postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self.postings[term]
+
+
+def search_indexes(
+    indexes: list[Bm25Index], query: str, top_k: int
+) -> list[tuple[str, float]]:
+    """BM25 over the union of several knowledge bases, using their combined corpus stats."""
+    doc_count = sum(len(index.doc_lengths) for index in indexes)
+    if doc_count == 0:
+        return []
+    avg_length = sum(index.total_length for index in indexes) / doc_count
+
+    # tf 归一化: tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+    norm_base = BM25_K1 * (1 - BM25_B)
+    norm_length = BM25_K1 * BM25_B / avg_length
+    scores: dict[str, float] = {}
+    for term, query_count in Counter(tokenize(query)).items():
+        term_postings = [index.postings.get(term) for index in indexes]
+        df = sum(len(postings) for postings in term_postings if postings)
+        if df == 0:
+            continue
+        weight = (
+            query_count * (BM25_K1 + 1) * math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        )
+        for index, postings in zip(indexes, term_postings):
+            if not postings:
+                continue
+            doc_lengths = index.doc_lengths
+            for chunk_id, tf in postings.items():
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight * tf / (
+                    tf + norm_base + norm_length * doc_lengths[chunk_id]
+                )
+    return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+class Bm25IndexManager:
+    """
+    Per-knowledge-base BM25 indexes persisted in the bm25chunk table.
+
+    Writers (the upload tasks) update the table incrementally per written batch.
+    Each process keeps the indexes it has queried in memory and re-checks their
+    version every BM25_INDEX_TTL seconds, reloading an upload only after it
+    changed. Uploads indexed before the table existed are backfilled from the
+    vector store on their first search.
+    """
+
+    def __init__(self) -> None:
+        # 同时保护索引表和索引内容: 增量更新与查询打分不能交错
+        self._lock = threading.Lock()
+        self._indexes: dict[int, Bm25Index] = {}
+        self._backfilled: set[int] = set()
+
+    @staticmethod
+    def _version(upload_id: int) -> tuple[int, int]:
+        def _get(session):
+            count, max_id = session.exec(
+                select(func.count(), func.max(Bm25Chunk.id)).where(
+                    Bm25Chunk.upload_id == upload_id
+                )
+            ).one()
+            return (count, max_id or 0)
+
+        return db_operation(_get)
+
+    @staticmethod
+    def _load(upload_id: int) -> Bm25Index:
+        def _get(session):
+            rows = session.exec(
+                select(Bm25Chunk).where(Bm25Chunk.upload_id == upload_id)
+            ).all()
+            index = Bm25Index(
+                (len(rows), max((row.id for row in rows), default=0))
+            )
+            for row in rows:
+                index.add(row.chunk_id, row.length, row.term_freqs)
+            return index
+
+        index = db_operation(_get)
+        logger.debug(
+            f"Loaded BM25 index of upload {upload_id}: {len(index.doc_lengths)} chunks"
+        )
+        return index
+
+    def _get_index(self, upload_id: int) -> Bm25Index:
+        with self._lock:
+            index = self._indexes.get(upload_id)
+        if index is not None:
+            if time.monotonic() - index.checked_at < settings.BM25_INDEX_TTL:
+                return index
+            if self._version(upload_id) == index.version:
+                index.checked_at = time.monotonic()
+                return index
+        index = self._load(upload_id)
+        with self._lock:
+            self._indexes[upload_id] = index
+        return index
+
+    def _refresh_loaded(self, upload_id: int, apply) -> None:
+        # 本进程已加载的索引就地增量更新, 不必整体重新加载
+        with self._lock:
+            index = self._indexes.get(upload_id)
+            if index is None:
+                return
+            apply(index)
+        version = self._version(upload_id)
+        with self._lock:
+            index.version = version
+            index.checked_at = time.monotonic()
+
+    def add(self, upload_id: int, chunks: list[tuple[str, str]]) -> None:
+        """Index `(chunk_id, text)` pairs of an upload."""
+        entries = []
+        for chunk_id, text in chunks:
+            terms = list(tokenize(text))
+            entries.append((chunk_id, len(terms), dict(Counter(terms))))
+
+        def _add(session):
+            # 回填与上传任务可能同时写入同一批 chunk, 已有的行不重复插入
+            session.execute(
+                select(func.pg_advisory_xact_lock(BM25_LOCK_NAMESPACE, upload_id))
+            )
+            existing = set(
+                session.exec(
+                    select(Bm25Chunk.chunk_id).where(
+                        Bm25Chunk.upload_id == upload_id,
+                        col(Bm25Chunk.chunk_id).in_(
+                            [chunk_id for chunk_id, _, _ in entries]
+                        ),
+                    )
+                ).all()
+            )
+            session.add_all(
+                Bm25Chunk(
+                    upload_id=upload_id,
+                    chunk_id=chunk_id,
+                    length=length,
+                    term_freqs=term_freqs,
+                )
+                for chunk_id, length, term_freqs in entries
+                if chunk_id not in existing
+            )
+
+        db_operation(_add)
+
+        def _apply(index: Bm25Index) -> None:
+            for chunk_id, length, term_freqs in entries:
+                index.add(chunk_id, length, term_freqs)
+
+        self._refresh_loaded(upload_id, _apply)
+
+    def delete(self, upload_id: int, chunk_ids: list[str]) -> None:
+        def _delete(session):
+            session.execute(
+                delete(Bm25Chunk).where(
+                    Bm25Chunk.upload_id == upload_id,
+                    col(Bm25Chunk.chunk_id).in_(chunk_ids),
+                )
+            )
+
+        db_operation(_delete)
+
+        def _apply(index: Bm25Index) -> None:
+            for chunk_id in chunk_ids:
+                index.remove(chunk_id)
+
+        self._refresh_loaded(upload_id, _apply)
+
+    def delete_upload(self, upload_id: int) -> None:
+        def _delete(session):
+            session.execute(delete(Bm25Chunk).where(Bm25Chunk.upload_id == upload_id))
+
+        db_operation(_delete)
+        with self._lock:
+            self._indexes.pop(upload_id, None)
+
+    def _backfill(
+        self, upload_id: int, chunks: Iterable[tuple[str, str]]
+    ) -> None:
+        # 只在本进程检查一次; 并发回填由 add() 去重
+        with self._lock:
+            if upload_id in self._backfilled:
+                return
+            self._backfilled.add(upload_id)
+        iterator = iter(chunks)
+        count = 0
+        try:
+            while batch := list(islice(iterator, settings.EMBEDDING_BATCH_SIZE)):
+                self.add(upload_id, batch)
+                count += len(batch)
+        except Exception:
+            with self._lock:
+                self._backfilled.discard(upload_id)
+            raise
+        if count:
+            logger.info(f"Backfilled BM25 index of upload {upload_id}: {count} chunks")
+
+    @staticmethod
+    def _owned(owner_id: int, upload_ids: list[int]) -> list[int]:
+        def _get(session):
+            return session.exec(
+                select(Upload.id).where(
+                    Upload.owner_id == owner_id, col(Upload.id).in_(upload_ids)
+                )
+            ).all()
+
+        return list(db_operation(_get))
+
+    def search(
+        self,
+        upload_ids: list[int],
+        query: str,
+        top_k: int,
+        owner_id: int | None = None,
+        stored_chunks: Callable[[int], Iterable[tuple[str, str]]] | None = None,
+    ) -> list[tuple[str, float]]:
+        """Return the top `(chunk_id, score)` pairs, best first.
+
+        With `owner_id`, only that user's uploads are scored, so chunks the
+        caller filters out afterwards cannot take the top_k slots.
+        `stored_chunks(upload_id)` yields the `(chunk_id, text)` pairs kept in
+        the vector store, used to backfill uploads that have no BM25 rows yet.
+        """
+        if owner_id is not None:
+            upload_ids = self._owned(owner_id, upload_ids)
+        indexes = []
+        for upload_id in upload_ids:
+            index = self._get_index(upload_id)
+            if not index.doc_lengths and stored_chunks is not None:
+                # 回填的行同时增量写入已加载的 index
+                self._backfill(upload_id, stored_chunks(upload_id))
+            indexes.append(index)
+        with self._lock:
+            return search_indexes(indexes, query, top_k)
+
+
+bm25_index_manager = Bm25IndexManager()
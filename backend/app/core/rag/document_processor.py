@@ -1,64 +1,161 @@
+import hashlib
 import logging
+from collections.abc import Iterator
 
 from langchain_community.document_loaders import (
     PyMuPDFLoader,
-    TextLoader,
-    UnstructuredExcelLoader,
     UnstructuredHTMLLoader,
     UnstructuredMarkdownLoader,
     UnstructuredPowerPointLoader,
     UnstructuredWordDocumentLoader,
     WebBaseLoader,
 )
+from langchain_core.document_loaders import BaseLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 logger = logging.getLogger(__name__)
 
+# 流式读取文本和 Excel 时, 每个 Document 最多累积的字符数
+DOCUMENT_BLOCK_CHARS = 200_000
 
-def load_and_split_document(
+
+def chunk_hash(text: str, chunk_size: int, chunk_overlap: int) -> str:
+    """Hash identifying a chunk's text under the chunking parameters that produced it."""
+    return hashlib.sha256(
+        f"{chunk_size}:{chunk_overlap}:{text}".encode("utf-8")
+    ).hexdigest()
+
+
+class ExcelRowsLoader(BaseLoader):
+    """
+    Streams an .xlsx workbook with openpyxl in read-only mode, yielding each
+    sheet as Documents of at most DOCUMENT_BLOCK_CHARS characters of
+    tab-separated rows, so a large workbook is never held in memory whole.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+
+    def lazy_load(self) -> Iterator[Document]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                metadata = {"source": self.file_path, "page_name": sheet.title}
+                lines: list[str] = []
+                size = 0
+                for row in sheet.iter_rows(values_only=True):
+                    line = "\t".join("" if cell is None else str(cell) for cell in row)
+                    if not line.strip():
+                        continue
+                    lines.append(line)
+                    size += len(line) + 1
+                    if size >= DOCUMENT_BLOCK_CHARS:
+                        yield Document(page_content="\n".join(lines), metadata=metadata)
+                        lines, size = [], 0
+                if lines:
+                    yield Document(page_content="\n".join(lines), metadata=metadata)
+        finally:
+            workbook.close()
+
+
+class TextBlocksLoader(BaseLoader):
+    """
+    Reads a text file line by line, yielding Documents of at most
+    DOCUMENT_BLOCK_CHARS characters, so a large file is never held in
+    memory whole.
+    """
+
+    def __init__(self, file_path: str, encoding: str | None = None) -> None:
+        self.file_path = file_path
+        self.encoding = encoding
+
+    def lazy_load(self) -> Iterator[Document]:
+        metadata = {"source": self.file_path}
+        with open(self.file_path, encoding=self.encoding) as f:
+            lines: list[str] = []
+            size = 0
+            for line in f:
+                lines.append(line)
+                size += len(line)
+                if size >= DOCUMENT_BLOCK_CHARS:
+                    yield Document(page_content="".join(lines), metadata=metadata)
+                    lines, size = [], 0
+            if lines:
+                yield Document(page_content="".join(lines), metadata=metadata)
+
+
+def _get_loader(file_path: str) -> BaseLoader:
+    if file_path.startswith("http://") or file_path.startswith("https://"):
+        return WebBaseLoader(web_path=file_path)
+
+    # 根据文件类型选择合适的加载器
+    if file_path.endswith(".pdf"):
+        return PyMuPDFLoader(file_path)
+    elif file_path.endswith(".docx"):
+        return UnstructuredWordDocumentLoader(file_path)
+    elif file_path.endswith(".pptx"):
+        return UnstructuredPowerPointLoader(file_path)
+    elif file_path.endswith(".xlsx"):
+        return ExcelRowsLoader(file_path)
+    elif file_path.endswith(".txt"):
+        return TextBlocksLoader(file_path)
+    elif file_path.endswith(".html"):
+        return UnstructuredHTMLLoader(file_path)
+    elif file_path.endswith(".md"):
+        return UnstructuredMarkdownLoader(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_path}")
+
+
+def iter_split_document(
     file_path: str,
     user_id: int,
     upload_id: int,
     chunk_size: int = 500,
     chunk_overlap: int = 50,
-) -> list[Document]:
-    logger.debug(f"Loading document from: {file_path}")
+) -> Iterator[Document]:
+    """
+    Lazily load a document and yield its chunks one loaded Document at a time.
 
-    if file_path.startswith("http://") or file_path.startswith("https://"):
-        loader = WebBaseLoader(web_path=file_path)
-    else:
-        # 根据文件类型选择合适的加载器
-        if file_path.endswith(".pdf"):
-            loader = PyMuPDFLoader(file_path)
-
-        elif file_path.endswith(".docx"):
-            loader = UnstructuredWordDocumentLoader(file_path)
-        elif file_path.endswith(".pptx"):
-            loader = UnstructuredPowerPointLoader(file_path)
-        elif file_path.endswith(".xlsx"):
-            loader = UnstructuredExcelLoader(file_path)
-        elif file_path.endswith(".txt"):
-            loader = TextLoader(file_path)
-        elif file_path.endswith(".html"):
-            loader = UnstructuredHTMLLoader(file_path)
-        elif file_path.endswith(".md"):
-            loader = UnstructuredMarkdownLoader(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_path}")
-
-    documents = loader.load()
-    logger.debug(f"Loaded {len(documents)} documents")
-
-    # 更新文档元数据
-    for doc in documents:
-        doc.metadata.update({"user_id": user_id, "upload_id": upload_id})
+    PDF pages and blocks of text lines or Excel rows are streamed, so only
+    the part being split is held in memory. The unstructured loaders (docx, pptx,
+    html, md) still parse the whole file into a single Document first.
+    Consumers control how many chunks are buffered by how fast they pull from
+    the iterator.
+    """
+    logger.debug(f"Loading document from: {file_path}")
+    loader = _get_loader(file_path)
 
     # 文本分割
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
     )
-    split_docs = text_splitter.split_documents(documents)
-    logger.debug(f"Split into {len(split_docs)} chunks")
-    return split_docs
+    page_count = 0
+    chunk_count = 0
+    for page in loader.lazy_load():
+        page_count += 1
+        # 更新文档元数据
+        page.metadata.update({"user_id": user_id, "upload_id": upload_id})
+        for chunk in text_splitter.split_documents([page]):
+            chunk_count += 1
+            chunk.metadata["content_hash"] = chunk_hash(
+                chunk.page_content, chunk_size, chunk_overlap
+            )
+            yield chunk
+    logger.debug(f"Split {page_count} documents into {chunk_count} chunks")
+
+
+def load_and_split_document(
+    file_path: str,
+    user_id: int,
+    upload_id: int,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+) -> list[Document]:
+    return list(
+        iter_split_document(file_path, user_id, upload_id, chunk_size, chunk_overlap)
+    )
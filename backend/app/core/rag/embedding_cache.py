@@ -0,0 +1,80 @@
+import hashlib
+import logging
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col, select
+
+from app.core.config import settings
+from app.core.workflow.utils.db_utils import db_operation
+from app.models import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_namespace(embedding_model: Embeddings) -> str | None:
+    """Identify the model behind an embeddings client, None if it should not be cached."""
+    model_name = getattr(embedding_model, "model", None) or getattr(
+        embedding_model, "model_name", None
+    )
+    if not model_name:
+        # RawTextEmbeddings 等不调用模型, 无需缓存
+        return None
+    return f"{type(embedding_model).__name__}:{model_name}"
+
+
+def get_cached_embeddings(model: str, hashes: list[str]) -> dict[str, list[float]]:
+    def _get(session):
+        rows = session.exec(
+            select(EmbeddingCache).where(
+                EmbeddingCache.model == model,
+                col(EmbeddingCache.content_hash).in_(hashes),
+            )
+        ).all()
+        return {row.content_hash: row.embedding for row in rows}
+
+    return db_operation(_get)
+
+
+def set_cached_embeddings(model: str, embeddings: dict[str, list[float]]) -> None:
+    def _set(session):
+        session.execute(
+            insert(EmbeddingCache)
+            .values(
+                [
+                    {"model": model, "content_hash": h, "embedding": embedding}
+                    for h, embedding in embeddings.items()
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+
+    db_operation(_set)
+
+
+def embed_with_cache(embedding_model: Embeddings, texts: list[str]) -> list[list[float]]:
+    """
+    Embed texts, reusing embeddings of identical texts computed before by the same
+    model for any upload. Only texts never seen by the model hit the provider.
+    """
+    model = embedding_namespace(embedding_model)
+    if model is None or not settings.EMBEDDING_CACHE_ENABLED:
+        return embedding_model.embed_documents(texts)
+
+    hashes = [text_hash(text) for text in texts]
+    embeddings = get_cached_embeddings(model, list(set(hashes)))
+    missing = {h: text for h, text in zip(hashes, texts) if h not in embeddings}
+    if missing:
+        computed = dict(
+            zip(missing, embedding_model.embed_documents(list(missing.values())))
+        )
+        set_cached_embeddings(model, computed)
+        embeddings.update(computed)
+    logger.debug(
+        f"Embedding cache: {sum(h not in missing for h in hashes)}/{len(texts)} hits for {model}"
+    )
+    return [embeddings[h] for h in hashes]
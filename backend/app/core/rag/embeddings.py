@@ -1,12 +1,12 @@
 import json
 import logging
-from typing import List
+from typing import Any, List
 
 import requests
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 from sqlmodel import select
 
 from app.core.config import settings
@@ -81,6 +81,7 @@ class ZhipuAIEmbeddings(BaseModel, Embeddings):
     api_key: str
     model: str = "embedding-3"
     dimension: int | None = None
+    _client: Any = PrivateAttr(default=None)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -89,11 +90,18 @@ class ZhipuAIEmbeddings(BaseModel, Embeddings):
     class Config:
         extra = "forbid"
 
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        from zhipuai import ZhipuAI
+    def _get_client(self):
+        # 复用同一个客户端及其连接池
+        if self._client is None:
+            from zhipuai import ZhipuAI
+
+            self._client = ZhipuAI(
+                api_key=self.api_key, timeout=settings.EMBEDDING_REQUEST_TIMEOUT
+            )
+        return self._client
 
-        client = ZhipuAI(api_key=self.api_key)
-        response = client.embeddings.create(model=self.model, input=texts)
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        response = self._get_client().embeddings.create(model=self.model, input=texts)
         embeddings = [item.embedding for item in response.data]
         if embeddings:
             self.dimension = len(embeddings[0])
@@ -107,6 +115,8 @@ class SiliconFlowEmbeddings(BaseModel, Embeddings):
     api_key: str
     model: str = "BAAI/bge-large-zh-v1.5"
     dimension: int | None = None
+    # 复用 HTTP 连接, 避免每个批次重新握手
+    _session: requests.Session = PrivateAttr(default_factory=requests.Session)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -123,7 +133,13 @@ class SiliconFlowEmbeddings(BaseModel, Embeddings):
             "Authorization": f"Bearer {self.api_key}",
         }
         payload = {"model": self.model, "input": texts, "encoding_format": "float"}
-        response = requests.post(url, json=payload, headers=headers)
+        response = self._session.post(
+            url,
+            json=payload,
+            headers=headers,
+            timeout=settings.EMBEDDING_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
         response_json = response.json()
         logger.debug(
             f"SiliconFlow API response: {json.dumps(response_json, indent=2)[:20]}"
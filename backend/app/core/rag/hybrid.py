@@ -0,0 +1,126 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Literal
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+FusionMethod = Literal["rrf", "weighted"]
+
+# 向量检索和全文检索两路并发执行
+_search_executor = ThreadPoolExecutor(
+    max_workers=settings.HYBRID_SEARCH_WORKERS, thread_name_prefix="hybrid-search"
+)
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(
+    result_lists: list[list[Document]], weights: list[float], k: int
+) -> dict[str, tuple[Document, float]]:
+    fused: dict[str, tuple[Document, float]] = {}
+    for docs, weight in zip(result_lists, weights):
+        for rank, doc in enumerate(docs, start=1):
+            key = _doc_key(doc)
+            first, score = fused.get(key, (doc, 0.0))
+            fused[key] = (first, score + weight / (k + rank))
+    return fused
+
+
+def weighted_score_fusion(
+    result_lists: list[list[Document]], weights: list[float]
+) -> dict[str, tuple[Document, float]]:
+    # 各路分数量纲不同 (余弦 vs BM25), 先各自归一化到 [0, 1]
+    fused: dict[str, tuple[Document, float]] = {}
+    for docs, weight in zip(result_lists, weights):
+        if not docs:
+            continue
+        scores = [doc.metadata.get("score") or 0.0 for doc in docs]
+        low, high = min(scores), max(scores)
+        for doc, score in zip(docs, scores):
+            normalised = (score - low) / (high - low) if high > low else 1.0
+            key = _doc_key(doc)
+            first, total = fused.get(key, (doc, 0.0))
+            fused[key] = (first, total + weight * normalised)
+    return fused
+
+
+def fused_search(
+    store: Any,
+    user_id: int,
+    upload_ids: list[int],
+    query: str,
+    top_k: int = 5,
+    score_threshold: float = 0.5,
+    vector_weight: float | None = None,
+    fulltext_weight: float | None = None,
+    fusion: FusionMethod | None = None,
+) -> list[Document]:
+    """
+    Run the vector and fulltext legs of `store` concurrently and fuse them.
+
+    Chunks found by both legs are returned once. The fused score replaces
+    metadata["score"].
+    """
+    vector_future = _search_executor.submit(
+        store.vector_search, user_id, upload_ids, query, top_k, score_threshold
+    )
+    fulltext_future = _search_executor.submit(
+        store.fulltext_search, user_id, upload_ids, query, top_k, score_threshold
+    )
+    result_lists = [vector_future.result(), fulltext_future.result()]
+    weights = [
+        settings.HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight,
+        settings.HYBRID_FULLTEXT_WEIGHT if fulltext_weight is None else fulltext_weight,
+    ]
+
+    fusion = fusion or settings.HYBRID_FUSION
+    if fusion == "rrf":
+        fused = reciprocal_rank_fusion(result_lists, weights, settings.HYBRID_RRF_K)
+    elif fusion == "weighted":
+        fused = weighted_score_fusion(result_lists, weights)
+    else:
+        raise ValueError(f"Unsupported fusion method: {fusion}")
+
+    documents = []
+    for doc, score in sorted(fused.values(), key=lambda item: item[1], reverse=True)[
+        :top_k
+    ]:
+        doc.metadata["score"] = score
+        documents.append(doc)
+    return documents
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever over `fused_search`, for knowledge-base tools and retrieval nodes."""
+
+    store: Any
+    user_id: int
+    upload_ids: list[int]
+    top_k: int = 5
+    score_threshold: float = 0.0
+    vector_weight: float | None = None
+    fulltext_weight: float | None = None
+    fusion: FusionMethod | None = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return fused_search(
+            self.store,
+            self.user_id,
+            self.upload_ids,
+            query,
+            self.top_k,
+            self.score_threshold,
+            self.vector_weight,
+            self.fulltext_weight,
+            self.fusion,
+        )
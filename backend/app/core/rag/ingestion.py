@@ -0,0 +1,94 @@
+import logging
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from tenacity import (
+    before_sleep_log,
+    retry,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from app.core.config import settings
+from app.core.rag.embedding_cache import embed_with_cache
+
+logger = logging.getLogger(__name__)
+
+# (已完成的 chunk 数, chunk 总数), 总数未知时为 None
+ProgressCallback = Callable[[int, int | None], None]
+WriteBatch = Callable[[list[Document], list[list[float]]], None]
+
+batch_retry = retry(
+    stop=stop_after_attempt(settings.EMBEDDING_MAX_RETRIES),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True,
+)
+
+
+def iter_batches(docs: Iterable[Document], batch_size: int) -> Iterator[list[Document]]:
+    iterator = iter(docs)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+@batch_retry
+def embed_batch(embedding_model: Embeddings, docs: list[Document]) -> list[list[float]]:
+    return embed_with_cache(embedding_model, [doc.page_content for doc in docs])
+
+
+def ingest_documents(
+    docs: Iterable[Document],
+    embedding_model: Embeddings,
+    write_batch: WriteBatch,
+    progress_callback: ProgressCallback | None = None,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+) -> int:
+    """
+    Embed documents in batches on a bounded thread pool and write each batch as
+    soon as it is embedded.
+
+    At most `concurrency` batches are in flight, so memory stays proportional to
+    the batch size rather than the document size. Batches are written in input
+    order from the calling thread; a failing batch is retried with backoff
+    before the whole ingestion fails.
+
+    Returns:
+        int: The number of chunks written.
+    """
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    concurrency = concurrency or settings.EMBEDDING_CONCURRENCY
+    total = len(docs) if isinstance(docs, list | tuple) else None
+    written = 0
+
+    def _write(batch: list[Document], future: Future) -> None:
+        nonlocal written
+        batch_retry(write_batch)(batch, future.result())
+        written += len(batch)
+        if progress_callback:
+            progress_callback(written, total)
+
+    with ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="embedding"
+    ) as executor:
+        in_flight: deque[tuple[list[Document], Future]] = deque()
+        try:
+            for batch in iter_batches(docs, batch_size):
+                in_flight.append(
+                    (batch, executor.submit(embed_batch, embedding_model, batch))
+                )
+                if len(in_flight) >= concurrency:
+                    _write(*in_flight.popleft())
+            while in_flight:
+                _write(*in_flight.popleft())
+        except BaseException:
+            for _, future in in_flight:
+                future.cancel()
+            raise
+
+    return written
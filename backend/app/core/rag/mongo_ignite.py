@@ -1,10 +1,13 @@
 import logging
 import math
-import re
-from collections import Counter, namedtuple
+from collections import defaultdict, namedtuple
+from collections.abc import Iterable, Iterator
 from typing import Callable, List
 
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
 from pymongo.results import DeleteResult
 
 from pymongo.synchronous.collection import Collection
@@ -15,16 +18,23 @@ from pymongo import MongoClient
 from langchain_community.vectorstores import MongoDBAtlasVectorSearch
 
 from app.core.config import settings
-from app.core.rag.document_processor import load_and_split_document
+from app.core.rag.bm25 import bm25_index_manager
+from app.core.rag.document_processor import iter_split_document
 from app.core.rag.embeddings import get_embedding_model
+from app.core.rag.hybrid import FusionMethod, HybridRetriever, fused_search
+from app.core.rag.ingestion import ProgressCallback, ingest_documents, iter_batches
 
 logger = logging.getLogger(__name__)
 
 class IgniteStore:
-    def __init__(self) -> None:
-        self.collection_name = settings.QDRANT_COLLECTION
+    def __init__(
+        self,
+        collection_name: str | None = None,
+        embedding_model: Embeddings | None = None,
+    ) -> None:
+        self.collection_name = collection_name or settings.QDRANT_COLLECTION
         self.url = settings.MONGODB_URL
-        self.embedding_model = get_embedding_model('raw_text')
+        self.embedding_model = embedding_model or get_embedding_model('raw_text')
 
         logger.debug(f"Initializing QdrantStore with URL: {self.url}")
 
@@ -70,6 +80,27 @@ class IgniteStore:
             return r['count']
         return 0
 
+    def _write_batch(self, docs: List[Document], embeddings: List[List[float]]) -> None:
+        # _id 在重试之间保持不变, 部分写入后重试不会产生重复
+        for doc in docs:
+            doc.metadata.setdefault("_id", ObjectId())
+        try:
+            self.collection.insert_many(
+                [
+                    {"text": doc.page_content, "embedding": embedding, **doc.metadata}
+                    for doc, embedding in zip(docs, embeddings)
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+        bm25_index_manager.add(
+            docs[0].metadata["upload_id"],
+            [(str(doc.metadata["_id"]), doc.page_content) for doc in docs],
+        )
+
     def add(
         self,
         file_path_or_url: str,
@@ -78,26 +109,16 @@ class IgniteStore:
         chunk_size: int = 500,
         chunk_overlap: int = 50,
         callback: Callable[[], None] | None = None,
+        progress_callback: ProgressCallback | None = None,
     ) -> None:
         try:
-            docs = load_and_split_document(
+            # 逐页加载切分, 内存占用只与批大小相关, 与文件大小无关
+            docs = iter_split_document(
                 file_path_or_url, user_id, upload_id, chunk_size, chunk_overlap
             )
-            # Ensure metadata is correctly set
-            for doc in docs:
-                doc.metadata["user_id"] = user_id
-                doc.metadata["upload_id"] = upload_id
-
-            initial_count = self.count(
-                count_filter={"user_id":user_id, "upload_id":upload_id}
+            added_count = ingest_documents(
+                docs, self.embedding_model, self._write_batch, progress_callback
             )
-
-            self.vector_store.add_documents(docs)
-            final_count = self.count(
-                count_filter={"user_id":user_id, "upload_id":upload_id}
-            )
-
-            added_count = final_count - initial_count
             logger.info(
                 f"Added {added_count} documents for upload_id: {upload_id}, user_id: {user_id}"
             )
@@ -126,6 +147,8 @@ class IgniteStore:
             )
             logger.debug(f"Delete operation result: {result}")
 
+            bm25_index_manager.delete_upload(upload_id)
+
             if isinstance(result, DeleteResult) and result.deleted_count>0:
                 final_count = self.count(
                     count_filter=filter_condition,
@@ -158,6 +181,28 @@ class IgniteStore:
             logger.error(f"Error deleting documents: {str(e)}", exc_info=True)
             return False
 
+    def _stored_chunk_ids(self, upload_id: int, user_id: int) -> dict[str | None, list]:
+        """Ids of an upload's stored chunks grouped by content hash."""
+        chunk_ids: dict[str | None, list] = defaultdict(list)
+        for result in self.collection.find(
+            {"user_id": user_id, "upload_id": upload_id},
+            projection={"_id": 1, "content_hash": 1},
+        ):
+            chunk_ids[result.get("content_hash")].append(result["_id"])
+        return chunk_ids
+
+    def _stored_chunks(self, upload_id: int) -> Iterator[tuple[str, str]]:
+        """`(chunk_id, text)` of every stored chunk of an upload, for BM25 backfill."""
+        for result in self.collection.find(
+            {"upload_id": upload_id}, projection={"_id": 1, "text": 1}
+        ):
+            yield str(result["_id"]), result.get("text", "")
+
+    def _delete_ids(self, upload_id: int, ids: list) -> None:
+        for batch in iter_batches(ids, settings.EMBEDDING_BATCH_SIZE):
+            self.collection.delete_many({"_id": {"$in": batch}})
+            bm25_index_manager.delete(upload_id, [str(chunk_id) for chunk_id in batch])
+
     def update(
         self,
         file_path_or_url: str,
@@ -166,13 +211,42 @@ class IgniteStore:
         chunk_size: int = 500,
         chunk_overlap: int = 50,
         callback: Callable[[], None] | None = None,
+        progress_callback: ProgressCallback | None = None,
     ) -> None:
-        deletion_successful = self.delete(upload_id, user_id)
-        if not deletion_successful:
-            logger.warning(
-                f"Failed to delete existing documents for upload_id: {upload_id}, user_id: {user_id}. Proceeding with add operation."
+        try:
+            # 只 embed 新增或变化的 chunk, 只删除已不存在的 chunk
+            stale = self._stored_chunk_ids(upload_id, user_id)
+            unchanged_count = 0
+
+            def _changed(docs: Iterable[Document]) -> Iterator[Document]:
+                nonlocal unchanged_count
+                for doc in docs:
+                    ids = stale.get(doc.metadata["content_hash"])
+                    if ids:
+                        ids.pop()
+                        unchanged_count += 1
+                    else:
+                        yield doc
+
+            added_count = ingest_documents(
+                _changed(
+                    iter_split_document(
+                        file_path_or_url, user_id, upload_id, chunk_size, chunk_overlap
+                    )
+                ),
+                self.embedding_model,
+                self._write_batch,
+                progress_callback,
             )
-        self.add(file_path_or_url, upload_id, user_id, chunk_size, chunk_overlap)
+            removed_ids = [chunk_id for ids in stale.values() for chunk_id in ids]
+            self._delete_ids(upload_id, removed_ids)
+            logger.info(
+                f"Re-indexed upload_id: {upload_id}, user_id: {user_id}: "
+                f"{added_count} added, {unchanged_count} unchanged, {len(removed_ids)} removed"
+            )
+        except Exception as e:
+            logger.error(f"Error updating document: {str(e)}", exc_info=True)
+            raise
         if callback:
             callback()
 
@@ -194,13 +268,26 @@ class IgniteStore:
 
         return documents
 
-    def retriever(self, user_id: int, upload_id: int):
+    def retriever(
+        self,
+        user_id: int,
+        upload_id: int,
+        search_type: str = "similarity",
+        **search_options,
+    ):
         logger.debug(
-            f"Creating retriever for user_id: {user_id}, upload_id: {upload_id}"
+            f"Creating {search_type} retriever for user_id: {user_id}, upload_id: {upload_id}"
         )
+        if search_type == "hybrid":
+            return HybridRetriever(
+                store=self, user_id=user_id, upload_ids=[upload_id], **search_options
+            )
         filter_condition = {"user_id":user_id, "upload_id":upload_id}
         retriever = self.vector_store.as_retriever(
-            search_kwargs={"filter": filter_condition, "k": 5},
+            search_kwargs={
+                "filter": filter_condition,
+                "k": search_options.get("top_k", 5),
+            },
             search_type="similarity",
         )
         logger.debug(f"Retriever created: {retriever}")
@@ -258,55 +345,35 @@ class IgniteStore:
         top_k: int = 5,
         score_threshold: float = 0.05,
     ):
-        filter_condition = {"user_id":user_id, "upload_id":upload_ids}
-        # 为全文搜索生成一个空的查询向量
-        search_results = self.collection.find(filter={
-                '$text':{'$search':query, '$limit':top_k, '$score_threshold': score_threshold},
-                "user_id":user_id,
-                "upload_id":upload_ids,
-            },
-            limit = top_k
+        hits = bm25_index_manager.search(
+            upload_ids,
+            query,
+            top_k,
+            owner_id=user_id,
+            stored_chunks=self._stored_chunks,
         )
-
-        # 改进的相关性评分
-        query_terms = Counter(re.findall(r"\w+", query.lower()))
-        filtered_results = []
-        for result in search_results:
-            content = result.get("text", "").lower()
-            content_terms = Counter(re.findall(r"\w+", content))
-
-            # 计算改进的 TF-IDF 相似度分数
-            score = result.get("_meta", {}).get('searchScore',0)
-            for term, query_count in query_terms.items():
-                if term in content_terms:
-                    tf = content_terms[term] / len(content_terms)
-                    idf = 10.0
-                    score += (tf * idf) * query_count
-
-            if score > 0:
-                filtered_results.append((result, score))
-
-        # 归一化分数
-        if filtered_results:
-            max_score = max(score for _, score in filtered_results)
-            filtered_results = [
-                (result, score / max_score) for result, score in filtered_results
-            ]
-
-        # 应用 score threshold
-        filtered_results = [
-            (result, score)
-            for result, score in filtered_results
-            if score >= score_threshold
-        ]
-
-        # 按分数排序并选择前 top_k 个结果
-        filtered_results.sort(key=lambda x: x[1], reverse=True)
-        top_results = filtered_results[:top_k]
-
-        return [
-            self._convert_to_document(result, score) for result, score in top_results
+        if not hits:
+            return []
+
+        # 归一化分数并应用 score threshold
+        max_score = hits[0][1]
+        scores = {
+            chunk_id: score / max_score
+            for chunk_id, score in hits
+            if score / max_score >= score_threshold
+        }
+        search_results = self.collection.find(
+            filter={
+                "_id": {"$in": [ObjectId(chunk_id) for chunk_id in scores]},
+                "user_id": user_id,
+            }
+        )
+        documents = [
+            self._convert_to_document(result, scores[str(result["_id"])])
+            for result in search_results
         ]
+        documents.sort(key=lambda doc: doc.metadata["score"], reverse=True)
+        return documents
 
     def _convert_to_document(self, result, score=None):
         if score is None:
@@ -315,6 +382,7 @@ class IgniteStore:
                 score = result.get("_meta", {}).get('searchScore')
         result['score'] = score
         return Document(
+            id=str(result.get("_id")),
             page_content=result.pop("text", ""),
             metadata=result,
         )
@@ -326,15 +394,19 @@ class IgniteStore:
         query: str,
         top_k: int = 5,
         score_threshold: float = 0.5,
+        vector_weight: float | None = None,
+        fulltext_weight: float | None = None,
+        fusion: FusionMethod | None = None,
     ):
-        vector_results = self.vector_search(
-            user_id, upload_ids, query, top_k, score_threshold
-        )
-        fulltext_results = self.fulltext_search(
-            user_id, upload_ids, query, top_k, score_threshold
+        # 两路并发检索, 按 chunk 去重后融合排序
+        return fused_search(
+            self,
+            user_id,
+            upload_ids,
+            query,
+            top_k,
+            score_threshold,
+            vector_weight,
+            fulltext_weight,
+            fusion,
         )
-
-        # 合并结果并按分数排序
-        combined_results = vector_results + fulltext_results
-        combined_results.sort(key=lambda x: x.metadata["score"], reverse=True)
-        return combined_results[:top_k]
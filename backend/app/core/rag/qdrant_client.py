@@ -1,29 +1,44 @@
 import logging
-import math
-import re
-from collections import Counter
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
 from typing import Callable, List
 
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as rest
-from qdrant_client.http.models import PayloadSelectorExclude, UpdateResult
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.http.models import UpdateResult
+from qdrant_client.models import Distance, PointStruct, VectorParams
 
 from app.core.config import settings
-from app.core.rag.document_processor import load_and_split_document
+from app.core.rag.bm25 import bm25_index_manager
+from app.core.rag.document_processor import iter_split_document
 from app.core.rag.embeddings import get_embedding_model
+from app.core.rag.hybrid import FusionMethod, HybridRetriever, fused_search
+from app.core.rag.ingestion import ProgressCallback, ingest_documents, iter_batches
 
 logger = logging.getLogger(__name__)
 
 
+def _point_id(point_id) -> str:
+    """Qdrant 以带连字符的形式返回 UUID id, BM25 索引统一使用这种形式"""
+    return str(uuid.UUID(str(point_id)))
+
+
 class QdrantStore:
-    def __init__(self) -> None:
-        self.collection_name = settings.QDRANT_COLLECTION
+    def __init__(
+        self,
+        collection_name: str | None = None,
+        embedding_model: Embeddings | None = None,
+    ) -> None:
+        self.collection_name = collection_name or settings.QDRANT_COLLECTION
         # self.url = "http://localhost:6333"
         self.url = settings.QDRANT_URL
-        self.embedding_model = get_embedding_model(settings.EMBEDDING_PROVIDER)
+        self.embedding_model = embedding_model or get_embedding_model(
+            settings.EMBEDDING_PROVIDER
+        )
 
         logger.debug(f"Initializing QdrantStore with URL: {self.url}")
 
@@ -74,6 +89,31 @@ class QdrantStore:
             logger.error(f"Error initializing vector store: {str(e)}", exc_info=True)
             raise
 
+    def _write_batch(self, docs: List[Document], embeddings: List[List[float]]) -> None:
+        # point id 在重试之间保持不变, upsert 是幂等的
+        for doc in docs:
+            doc.metadata.setdefault("point_id", str(uuid.uuid4()))
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                PointStruct(
+                    id=doc.metadata["point_id"],
+                    vector=embedding,
+                    payload={
+                        "page_content": doc.page_content,
+                        "metadata": {
+                            k: v for k, v in doc.metadata.items() if k != "point_id"
+                        },
+                    },
+                )
+                for doc, embedding in zip(docs, embeddings)
+            ],
+        )
+        bm25_index_manager.add(
+            docs[0].metadata["upload_id"],
+            [(doc.metadata["point_id"], doc.page_content) for doc in docs],
+        )
+
     def add(
         self,
         file_path_or_url: str,
@@ -82,48 +122,16 @@ class QdrantStore:
         chunk_size: int = 500,
         chunk_overlap: int = 50,
         callback: Callable[[], None] | None = None,
+        progress_callback: ProgressCallback | None = None,
     ) -> None:
         try:
-            docs = load_and_split_document(
+            # 逐页加载切分, 内存占用只与批大小相关, 与文件大小无关
+            docs = iter_split_document(
                 file_path_or_url, user_id, upload_id, chunk_size, chunk_overlap
             )
-            # Ensure metadata is correctly set
-            for doc in docs:
-                doc.metadata["user_id"] = user_id
-                doc.metadata["upload_id"] = upload_id
-
-            initial_count = self.client.count(
-                collection_name=self.collection_name,
-                count_filter=rest.Filter(
-                    must=[
-                        rest.FieldCondition(
-                            key="metadata.user_id", match=rest.MatchValue(value=user_id)
-                        ),
-                        rest.FieldCondition(
-                            key="metadata.upload_id",
-                            match=rest.MatchValue(value=upload_id),
-                        ),
-                    ]
-                ),
-            ).count
-
-            self.vector_store.add_documents(docs)
-            final_count = self.client.count(
-                collection_name=self.collection_name,
-                count_filter=rest.Filter(
-                    must=[
-                        rest.FieldCondition(
-                            key="metadata.user_id", match=rest.MatchValue(value=user_id)
-                        ),
-                        rest.FieldCondition(
-                            key="metadata.upload_id",
-                            match=rest.MatchValue(value=upload_id),
-                        ),
-                    ]
-                ),
-            ).count
-
-            added_count = final_count - initial_count
+            added_count = ingest_documents(
+                docs, self.embedding_model, self._write_batch, progress_callback
+            )
             logger.info(
                 f"Added {added_count} documents for upload_id: {upload_id}, user_id: {user_id}"
             )
@@ -159,6 +167,8 @@ class QdrantStore:
             )
             logger.debug(f"Delete operation result: {result}")
 
+            bm25_index_manager.delete_upload(upload_id)
+
             if isinstance(result, UpdateResult) and result.status == "completed":
                 final_count = self.client.count(
                     collection_name=self.collection_name,
@@ -192,6 +202,69 @@ class QdrantStore:
             logger.error(f"Error deleting documents: {str(e)}", exc_info=True)
             return False
 
+    def _stored_chunk_ids(self, upload_id: int, user_id: int) -> dict[str | None, list]:
+        """Ids of an upload's stored chunks grouped by content hash."""
+        chunk_ids: dict[str | None, list] = defaultdict(list)
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=rest.Filter(
+                    must=[
+                        rest.FieldCondition(
+                            key="metadata.user_id", match=rest.MatchValue(value=user_id)
+                        ),
+                        rest.FieldCondition(
+                            key="metadata.upload_id",
+                            match=rest.MatchValue(value=upload_id),
+                        ),
+                    ]
+                ),
+                with_payload=["metadata.content_hash"],
+                with_vectors=False,
+                limit=1000,
+                offset=offset,
+            )
+            for point in points:
+                content_hash = point.payload.get("metadata", {}).get("content_hash")
+                chunk_ids[content_hash].append(point.id)
+            if offset is None:
+                return chunk_ids
+
+    def _stored_chunks(self, upload_id: int) -> Iterator[tuple[str, str]]:
+        """`(chunk_id, text)` of every stored chunk of an upload, for BM25 backfill."""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=rest.Filter(
+                    must=[
+                        rest.FieldCondition(
+                            key="metadata.upload_id",
+                            match=rest.MatchValue(value=upload_id),
+                        ),
+                    ]
+                ),
+                with_payload=["page_content"],
+                with_vectors=False,
+                limit=1000,
+                offset=offset,
+            )
+            for point in points:
+                yield _point_id(point.id), point.payload.get("page_content", "")
+            if offset is None:
+                return
+
+    def _delete_ids(self, upload_id: int, ids: list) -> None:
+        for batch in iter_batches(ids, settings.EMBEDDING_BATCH_SIZE):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=rest.PointIdsList(points=batch),
+            )
+            bm25_index_manager.delete(
+                upload_id, [_point_id(chunk_id) for chunk_id in batch]
+            )
+
     def update(
         self,
         file_path_or_url: str,
@@ -200,13 +273,42 @@ class QdrantStore:
         chunk_size: int = 500,
         chunk_overlap: int = 50,
         callback: Callable[[], None] | None = None,
+        progress_callback: ProgressCallback | None = None,
     ) -> None:
-        deletion_successful = self.delete(upload_id, user_id)
-        if not deletion_successful:
-            logger.warning(
-                f"Failed to delete existing documents for upload_id: {upload_id}, user_id: {user_id}. Proceeding with add operation."
+        try:
+            # 只 embed 新增或变化的 chunk, 只删除已不存在的 chunk
+            stale = self._stored_chunk_ids(upload_id, user_id)
+            unchanged_count = 0
+
+            def _changed(docs: Iterable[Document]) -> Iterator[Document]:
+                nonlocal unchanged_count
+                for doc in docs:
+                    ids = stale.get(doc.metadata["content_hash"])
+                    if ids:
+                        ids.pop()
+                        unchanged_count += 1
+                    else:
+                        yield doc
+
+            added_count = ingest_documents(
+                _changed(
+                    iter_split_document(
+                        file_path_or_url, user_id, upload_id, chunk_size, chunk_overlap
+                    )
+                ),
+                self.embedding_model,
+                self._write_batch,
+                progress_callback,
+            )
+            removed_ids = [chunk_id for ids in stale.values() for chunk_id in ids]
+            self._delete_ids(upload_id, removed_ids)
+            logger.info(
+                f"Re-indexed upload_id: {upload_id}, user_id: {user_id}: "
+                f"{added_count} added, {unchanged_count} unchanged, {len(removed_ids)} removed"
             )
-        self.add(file_path_or_url, upload_id, user_id, chunk_size, chunk_overlap)
+        except Exception as e:
+            logger.error(f"Error updating document: {str(e)}", exc_info=True)
+            raise
         if callback:
             callback()
 
@@ -239,10 +341,20 @@ class QdrantStore:
 
         return documents
 
-    def retriever(self, user_id: int, upload_id: int):
+    def retriever(
+        self,
+        user_id: int,
+        upload_id: int,
+        search_type: str = "similarity",
+        **search_options,
+    ):
         logger.debug(
-            f"Creating retriever for user_id: {user_id}, upload_id: {upload_id}"
+            f"Creating {search_type} retriever for user_id: {user_id}, upload_id: {upload_id}"
         )
+        if search_type == "hybrid":
+            return HybridRetriever(
+                store=self, user_id=user_id, upload_ids=[upload_id], **search_options
+            )
         filter_condition = {
             "must": [
                 {"key": "metadata.user_id", "match": {"value": user_id}},
@@ -250,7 +362,10 @@ class QdrantStore:
             ]
         }
         retriever = self.vector_store.as_retriever(
-            search_kwargs={"filter": filter_condition, "k": 5},
+            search_kwargs={
+                "filter": filter_condition,
+                "k": search_options.get("top_k", 5),
+            },
             search_type="similarity",
         )
         logger.debug(f"Retriever created: {retriever}")
@@ -314,75 +429,40 @@ class QdrantStore:
         top_k: int = 5,
         score_threshold: float = 0.5,
     ):
-        filter_condition = {
-            "must": [
-                {"key": "metadata.user_id", "match": {"value": user_id}},
-                {"key": "metadata.upload_id", "match": {"any": upload_ids}},
-            ]
+        hits = bm25_index_manager.search(
+            upload_ids,
+            query,
+            top_k,
+            owner_id=user_id,
+            stored_chunks=self._stored_chunks,
+        )
+        if not hits:
+            return []
+
+        # 归一化分数并应用 score threshold
+        max_score = hits[0][1]
+        scores = {
+            _point_id(chunk_id): score / max_score
+            for chunk_id, score in hits
+            if score / max_score >= score_threshold
         }
-        # 为全文搜索生成一个空的查询向量
-        empty_vector = [0.0] * self.embedding_model.dimension
-        search_results = self.client.search(
+        search_results = self.client.retrieve(
             collection_name=self.collection_name,
-            query_vector=empty_vector,  # 添加空的查询向量
-            query_filter=rest.Filter(**filter_condition),
-            limit=1000,  # 增加限制以获取更多潜在匹配
-            with_payload=PayloadSelectorExclude(exclude=["metadata"]),  # 只获取文本内容
+            ids=list(scores),
+            with_payload=True,
             with_vectors=False,
         )
-
-        # 改进的相关性评分
-        query_terms = Counter(re.findall(r"\w+", query.lower()))
-        filtered_results = []
-        for result in search_results:
-            content = result.payload.get("page_content", "").lower()
-            content_terms = Counter(re.findall(r"\w+", content))
-
-            # 计算改进的 TF-IDF 相似度分数
-            score = 0
-            for term, query_count in query_terms.items():
-                if term in content_terms:
-                    tf = content_terms[term] / len(content_terms)
-                    idf = math.log(
-                        len(search_results)
-                        / (
-                            sum(
-                                1
-                                for r in search_results
-                                if term in r.payload.get("page_content", "").lower()
-                            )
-                            + 1
-                        )
-                    )
-                    score += (tf * idf) * query_count
-
-            if score > 0:
-                filtered_results.append((result, score))
-
-        # 归一化分数
-        if filtered_results:
-            max_score = max(score for _, score in filtered_results)
-            filtered_results = [
-                (result, score / max_score) for result, score in filtered_results
-            ]
-
-        # 应用 score threshold
-        filtered_results = [
-            (result, score)
-            for result, score in filtered_results
-            if score >= score_threshold
-        ]
-
-        # 按分数排序并选择前 top_k 个结果
-        filtered_results.sort(key=lambda x: x[1], reverse=True)
-        top_results = filtered_results[:top_k]
-
-        return [
-            self._convert_to_document(result, score) for result, score in top_results
+        documents = [
+            self._convert_to_document(result, scores[str(result.id)])
+            for result in search_results
+            if result.payload.get("metadata", {}).get("user_id") == user_id
         ]
+        documents.sort(key=lambda doc: doc.metadata["score"], reverse=True)
+        return documents
 
     def _convert_to_document(self, result, score=None):
         return Document(
+            id=str(result.id),
             page_content=result.payload.get("page_content", ""),
             metadata={
                 "score": score if score is not None else result.score,
@@ -397,15 +477,19 @@ class QdrantStore:
         query: str,
         top_k: int = 5,
         score_threshold: float = 0.5,
+        vector_weight: float | None = None,
+        fulltext_weight: float | None = None,
+        fusion: FusionMethod | None = None,
     ):
-        vector_results = self.vector_search(
-            user_id, upload_ids, query, top_k, score_threshold
-        )
-        fulltext_results = self.fulltext_search(
-            user_id, upload_ids, query, top_k, score_threshold
+        # 两路并发检索, 按 chunk 去重后融合排序
+        return fused_search(
+            self,
+            user_id,
+            upload_ids,
+            query,
+            top_k,
+            score_threshold,
+            vector_weight,
+            fulltext_weight,
+            fusion,
         )
-
-        # 合并结果并按分数排序
-        combined_results = vector_results + fulltext_results
-        combined_results.sort(key=lambda x: x.metadata["score"], reverse=True)
-        return combined_results[:top_k]
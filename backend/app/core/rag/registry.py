@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.rag.embeddings import get_api_key, get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+StoreKey = tuple[str, str, str]
+
+# 不需要 API key 的 embedding provider
+_KEYLESS_PROVIDERS = {"local", "raw_text"}
+
+
+def _default_provider(backend: str) -> str:
+    # Ignite 在服务端计算向量, 只需要原始文本
+    if backend == "ignite":
+        return "raw_text"
+    return settings.EMBEDDING_PROVIDER
+
+
+def _credentials_fingerprint(provider: str) -> str | None:
+    if provider in _KEYLESS_PROVIDERS:
+        return None
+    api_key = get_api_key(provider) or ""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class VectorStoreRegistry:
+    """
+    Process-wide registry of vector stores and embedding models.
+
+    Stores (and the client and embedding model they hold) are built once per
+    (backend, collection, provider) and reused by every request and celery
+    task of the process. Provider credentials are re-read at most every
+    VECTOR_STORE_CREDENTIALS_TTL seconds; entries built with stale
+    credentials are rebuilt.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._stores: dict[StoreKey, Any] = {}
+        self._embeddings: dict[str, Embeddings] = {}
+        self._fingerprints: dict[str, str | None] = {}
+        self._checked_at: dict[str, float] = {}
+
+    def _reset_after_fork(self) -> None:
+        # Clients must not be shared with a forked (celery prefork) child
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._stores.clear()
+            self._embeddings.clear()
+            self._fingerprints.clear()
+            self._checked_at.clear()
+
+    def _check_credentials(self, provider: str) -> None:
+        now = time.monotonic()
+        checked_at = self._checked_at.get(provider)
+        if (
+            checked_at is not None
+            and now - checked_at < settings.VECTOR_STORE_CREDENTIALS_TTL
+        ):
+            return
+        fingerprint = _credentials_fingerprint(provider)
+        if (
+            provider in self._fingerprints
+            and self._fingerprints[provider] != fingerprint
+        ):
+            logger.info(f"Credentials of {provider} changed, rebuilding vector stores")
+            self._drop_provider(provider)
+        self._fingerprints[provider] = fingerprint
+        self._checked_at[provider] = now
+
+    def _drop_provider(self, provider: str) -> None:
+        self._embeddings.pop(provider, None)
+        for key in [k for k in self._stores if k[2] == provider]:
+            del self._stores[key]
+
+    def get_embedding_model(self, provider: str) -> Embeddings:
+        with self._lock:
+            self._reset_after_fork()
+            self._check_credentials(provider)
+            embedding_model = self._embeddings.get(provider)
+            if embedding_model is None:
+                embedding_model = get_embedding_model(provider)
+                self._embeddings[provider] = embedding_model
+            return embedding_model
+
+    def get_store(
+        self,
+        backend: str | None = None,
+        collection_name: str | None = None,
+        provider: str | None = None,
+    ):
+        backend = backend or settings.VECTOR_STORE_BACKEND
+        collection_name = collection_name or settings.QDRANT_COLLECTION
+        provider = provider or _default_provider(backend)
+        key = (backend, collection_name, provider)
+        with self._lock:
+            embedding_model = self.get_embedding_model(provider)
+            store = self._stores.get(key)
+            if store is None:
+                logger.info(f"Initializing vector store {key}")
+                if backend == "ignite":
+                    from app.core.rag.mongo_ignite import IgniteStore
+
+                    store = IgniteStore(collection_name, embedding_model)
+                elif backend == "qdrant":
+                    from app.core.rag.qdrant_client import QdrantStore
+
+                    store = QdrantStore(collection_name, embedding_model)
+                else:
+                    raise ValueError(f"Unsupported vector store backend: {backend}")
+                self._stores[key] = store
+            return store
+
+    def invalidate(self, provider: str | None = None) -> None:
+        """Drop cached stores and models, e.g. after provider credentials changed."""
+        with self._lock:
+            if provider is None:
+                self._stores.clear()
+                self._embeddings.clear()
+                self._fingerprints.clear()
+                self._checked_at.clear()
+            else:
+                self._drop_provider(provider)
+                self._fingerprints.pop(provider, None)
+                self._checked_at.pop(provider, None)
+
+
+vector_store_registry = VectorStoreRegistry()
+
+
+def get_vector_store(backend: str | None = None):
+    return vector_store_registry.get_store(backend)
@@ -0,0 +1,37 @@
+from typing import Any
+
+from app.core.rag.registry import get_vector_store
+
+SEARCH_TYPES = ("vector", "fulltext", "hybrid")
+
+
+def search_upload_chunks(
+    user_id: int,
+    upload_id: int,
+    query: str,
+    search_type: str,
+    top_k: int,
+    score_threshold: float,
+    backend: str | None = None,
+) -> list[dict[str, Any]]:
+    """Search one upload with the process' warm vector store."""
+    store = get_vector_store(backend)
+    if search_type == "vector":
+        results = store.vector_search(
+            user_id, [upload_id], query, top_k, score_threshold
+        )
+    elif search_type == "fulltext":
+        results = store.fulltext_search(
+            user_id, [upload_id], query, top_k, score_threshold
+        )
+    elif search_type == "hybrid":
+        results = store.hybrid_search(
+            user_id, [upload_id], query, top_k, score_threshold
+        )
+    else:
+        raise ValueError(f"Invalid search type: {search_type}")
+
+    return [
+        {"content": doc.page_content, "score": doc.metadata.get("score", 0)}
+        for doc in results
+    ]
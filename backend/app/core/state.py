@@ -1,16 +1,21 @@
-import re
+import logging
 from typing import Annotated, Any
 
-from langchain_core.messages import AIMessage, AnyMessage, ToolMessage
+from langchain_core.messages import AnyMessage
 from langchain_core.tools import BaseTool
 from langgraph.graph import add_messages
 from pydantic import BaseModel, Field
 from typing_extensions import NotRequired, TypedDict
 
-from app.core.rag.qdrant import QdrantStore
+from app.core.config import settings
+from app.core.history import HistoryConfig, format_message
+from app.core.rag.registry import get_vector_store
 from app.core.tools import managed_tools
 from app.core.tools.api_tool import dynamic_api_tool
 from app.core.tools.retriever_tool import create_retriever_tool_custom_modified
+from app.core.variable_template import compile_template
+
+logger = logging.getLogger(__name__)
 
 
 class GraphSkill(BaseModel):
@@ -38,7 +43,7 @@ class GraphUpload(BaseModel):
 
     @property
     def tool(self) -> BaseTool:
-        retriever = QdrantStore().retriever(self.owner_id, self.upload_id)
+        retriever = get_vector_store().retriever(self.owner_id, self.upload_id)
         return create_retriever_tool_custom_modified(retriever)
 
 
@@ -88,6 +93,10 @@ class GraphTeam(BaseModel):
     temperature: float = Field(
         description="The temperature of the team leader's llm model"
     )
+    history: HistoryConfig = Field(
+        default_factory=HistoryConfig,
+        description="How much of the conversation history members see",
+    )
 
     @property
     def persona(self) -> str:
@@ -106,35 +115,59 @@ def add_or_replace_messages(
 
 def format_messages(messages: list[AnyMessage]) -> str:
     """Format list of messages to string"""
-    message_str: str = ""
-    for message in messages:
-        # 确定消息名称
-        name = (
-            message.name
-            if message.name
-            else (
-                "AI"
-                if isinstance(message, AIMessage)
-                else "Tool" if isinstance(message, ToolMessage) else "User"
-            )
-        )
-
-        # 处理消息内容为列表的情况（包含图片的消息）
-        if isinstance(message.content, list):
-            # 提取所有文本内容
-            text_contents = []
-            for item in message.content:
-                if isinstance(item, dict):
-                    if item.get("type") == "text":
-                        text_contents.append(item.get("text", ""))
-                    elif item.get("type") == "image_url":
-                        text_contents.append("[图片]")
-            content = " ".join(text_contents)
-        else:
-            content = message.content
+    return "".join(format_message(message) for message in messages)
+
+
+def _state_delta_violation(channel: str, resent: int) -> None:
+    """Flag a node that re-sends existing state instead of returning a delta."""
+    message = (
+        f"Workflow node re-sent {resent} existing item(s) of '{channel}'; "
+        "nodes should return only new messages and their own node_outputs key"
+    )
+    if settings.WORKFLOW_STRICT_STATE_DELTAS:
+        raise ValueError(message)
+    if channel not in _reported_delta_violations:
+        _reported_delta_violations.add(channel)
+        logger.warning(message)
+
+
+_reported_delta_violations: set[str] = set()
+
 
-        message_str += f"{name}: {content}\n\n"
-    return message_str
+def add_message_deltas(
+    messages: list[AnyMessage], new_messages: list[AnyMessage]
+) -> list[AnyMessage]:
+    """add_messages for workflow channels, guarding against full-list updates.
+
+    Nodes written against the old contract return `history + [result]`; the
+    re-sent prefix is dropped before merging so the result is unchanged.
+    """
+    if messages and len(new_messages) > len(messages):
+        if all(
+            old.id is not None and old.id == new.id
+            for old, new in zip(messages, new_messages)
+        ):
+            _state_delta_violation("history/all_messages", len(messages))
+            new_messages = new_messages[len(messages) :]
+    return add_messages(messages, new_messages)  # type: ignore[return-value, arg-type]
+
+
+def unseen_messages(
+    messages: list[AnyMessage], candidates: list[AnyMessage]
+) -> list[AnyMessage]:
+    """The messages of `candidates` not yet in `messages`, matched by id.
+
+    Lets nodes that forward tool-loop messages into all_messages return only
+    the ones they add.
+    """
+    seen = {message.id for message in messages if message.id is not None}
+    unseen = []
+    for message in candidates:
+        if message.id is None or message.id not in seen:
+            unseen.append(message)
+            if message.id is not None:
+                seen.add(message.id)
+    return unseen
 
 
 def update_node_outputs(
@@ -143,14 +176,22 @@ def update_node_outputs(
     """Update node_outputs with new outputs. If new_outputs is empty, return the original node_outputs."""
     if not new_outputs:
         return node_outputs
-    else:
-        return {**node_outputs, **new_outputs}
-
-
+    resent = [
+        key
+        for key, value in new_outputs.items()
+        if key in node_outputs and node_outputs[key] is value
+    ]
+    if resent:
+        _state_delta_violation("node_outputs", len(resent))
+        new_outputs = {k: v for k, v in new_outputs.items() if k not in resent}
+    return {**node_outputs, **new_outputs}
+
+
+# 工作流节点只返回增量: 新增的消息, 以及自己的 node_outputs 键
 class WorkflowTeamState(TypedDict):
-    all_messages: Annotated[list[AnyMessage], add_messages]
+    all_messages: Annotated[list[AnyMessage], add_message_deltas]
     messages: Annotated[list[AnyMessage], add_or_replace_messages]
-    history: Annotated[list[AnyMessage], add_messages]
+    history: Annotated[list[AnyMessage], add_message_deltas]
     team: GraphTeam
     next: str
     main_task: list[AnyMessage]
@@ -170,37 +211,5 @@ class ReturnWorkflowTeamState(TypedDict):
 
 
 def parse_variables(text: str, node_outputs: dict, is_code: bool = False) -> str:
-    def replace_variable(match):
-        var_path = match.group(1).split(".")
-        value = node_outputs
-        for key in var_path:
-            if key in value:
-                value = value[key]
-            else:
-                return match.group(0)  # 如果找不到变量，保持原样
-
-        # 转换全角字符为半角字符
-        def convert_fullwidth_to_halfwidth(s: str) -> str:
-            # 全角字符范围是 0xFF01 到 0xFF5E
-            # 半角字符范围是 0x0021 到 0x007E
-            result = []
-            for char in str(s):
-                code = ord(char)
-                if 0xFF01 <= code <= 0xFF5E:
-                    # 转换全角字符到半角字符
-                    result.append(chr(code - 0xFEE0))
-                else:
-                    result.append(char)
-            return "".join(result)
-
-        str_value = str(value)
-        if is_code:
-            # 对于代码中的字符串，需要转换全角字符并正确转义
-            converted_value = convert_fullwidth_to_halfwidth(str_value)
-            # 转义引号和反斜杠
-            escaped_value = converted_value.replace('"', '\\"').replace("\\", "\\\\")
-            return f'"{escaped_value}"'
-        else:
-            return str_value
-
-    return re.sub(r"\{([^}]+)\}", replace_variable, text)
+    """Replace `{node_id.key}` variables in `text` with values from node_outputs."""
+    return compile_template(text).render(node_outputs, is_code)
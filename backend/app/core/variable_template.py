@@ -0,0 +1,89 @@
+import functools
+import re
+from collections.abc import Iterable
+from typing import Any
+
+VARIABLE_PATTERN = re.compile(r"\{([^}]+)\}")
+
+# 全角字符 (0xFF01-0xFF5E) 转半角 (0x0021-0x007E)
+FULLWIDTH_TO_HALFWIDTH = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+# 代码中的字符串: 转半角的同时转义引号和反斜杠, 一次 translate 完成
+CODE_STRING_TABLE: dict[int, str] = {
+    code: chr(halfwidth) for code, halfwidth in FULLWIDTH_TO_HALFWIDTH.items()
+}
+for _char, _escaped in (('"', '\\"'), ("\\", "\\\\")):
+    CODE_STRING_TABLE[ord(_char)] = _escaped
+    CODE_STRING_TABLE[ord(_char) + 0xFEE0] = _escaped
+
+
+class _Variable:
+    __slots__ = ("path", "source")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.path = tuple(source[1:-1].split("."))
+
+    def resolve(self, node_outputs: dict) -> tuple[bool, Any]:
+        value = node_outputs
+        for key in self.path:
+            if key in value:
+                value = value[key]
+            else:
+                return False, None
+        return True, value
+
+
+class VariableTemplate:
+    """
+    A `{node_id.key}` template split once into literal segments and variable
+    accessors, so rendering is a single pass and a join.
+
+    Unresolved variables are kept as written.
+    """
+
+    __slots__ = ("text", "segments", "variables")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.segments: list[str | _Variable] = []
+        position = 0
+        for match in VARIABLE_PATTERN.finditer(text):
+            if match.start() > position:
+                self.segments.append(text[position : match.start()])
+            self.segments.append(_Variable(match.group(0)))
+            position = match.end()
+        if position < len(text):
+            self.segments.append(text[position:])
+        self.variables = [s for s in self.segments if isinstance(s, _Variable)]
+
+    def render(self, node_outputs: dict, is_code: bool = False) -> str:
+        if not self.variables:
+            return self.text
+        parts = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+                continue
+            found, value = segment.resolve(node_outputs)
+            if not found:
+                parts.append(segment.source)  # 如果找不到变量，保持原样
+            elif is_code:
+                # 对于代码中的字符串，需要转换全角字符并正确转义
+                parts.append(f'"{str(value).translate(CODE_STRING_TABLE)}"')
+            else:
+                parts.append(str(value))
+        return "".join(parts)
+
+    def unresolved(self, node_ids: Iterable[str]) -> list[str]:
+        """Variables of the form `{node_id.key}` whose node is not in `node_ids`."""
+        node_ids = set(node_ids)
+        return [
+            variable.source
+            for variable in self.variables
+            if len(variable.path) >= 2 and variable.path[0] not in node_ids
+        ]
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_template(text: str) -> VariableTemplate:
+    return VariableTemplate(text)
@@ -1,4 +1,7 @@
+import logging
 import time
+from collections.abc import Callable, Mapping
+from types import MappingProxyType
 from typing import Any
 
 from langchain_core.messages import AIMessage, AnyMessage
@@ -10,10 +13,18 @@ from langgraph.prebuilt import ToolNode
 
 from app.core.workflow.node.parameter_extractor_node import ParameterExtractorNode
 from app.core.workflow.node.plugin_node import PluginNode
-from app.core.workflow.utils.tools_utils import get_retrieval_tool, get_tool
+from app.core.workflow.utils.tools_utils import (
+    get_retrieval_options,
+    get_retrieval_tool,
+    get_tool,
+)
 from app.models import InterruptType
 
+from ..history import HistoryConfig
 from ..state import WorkflowTeamState
+from ..variable_template import compile_template
+from .graph_config import GraphConfigIndex
+from .subgraph_cache import subgraph_cache
 from .node.answer_node import AnswerNode
 from .node.classifier_node import ClassifierNode
 from .node.code.code_node import CodeNode
@@ -27,25 +38,28 @@ from .node.retrieval_node import RetrievalNode
 from .node.subgraph_node import SubgraphNode
 from .node.agent_node import AgentNode
 
+logger = logging.getLogger(__name__)
+
 def validate_config(config: dict[str, Any]) -> bool:
     required_keys = ["id", "name", "nodes", "edges", "metadata"]
     return all(key in config for key in required_keys)
 
 
-# 添加一个全局变量来存储工具名称到节点ID的映射
-tool_name_to_node_id: dict[str, str] = {}
-
+def create_tools_router(
+    tool_routing_index: Mapping[str, str],
+) -> Callable[[WorkflowTeamState], str]:
+    """Route the last AI message's tool calls with a graph's own routing index."""
 
-def should_continue_tools(state: WorkflowTeamState) -> str:
-    messages: list[AnyMessage] = state["messages"]
-    if messages and isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
-        for tool_call in messages[-1].tool_calls:
-
-            tool_name = tool_call["name"].lower()
-            for node_id, tools in tool_name_to_node_id.items():
-                if tool_name in tools:
+    def should_continue_tools(state: WorkflowTeamState) -> str:
+        messages: list[AnyMessage] = state["messages"]
+        if messages and isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
+            for tool_call in messages[-1].tool_calls:
+                node_id = tool_routing_index.get(tool_call["name"].lower())
+                if node_id is not None:
                     return node_id
-    return "default"
+        return "default"
+
+    return should_continue_tools
 
 
 def should_continue_classifier(state: WorkflowTeamState) -> str:
@@ -66,8 +80,9 @@ def should_continue_ifelse(state: WorkflowTeamState) -> str:
     return "false_else"  # 默认返回 ELSE 分支
 
 
-def _add_tools_conditional_edges(graph_builder, conditional_edges, nodes):
+def _add_tools_conditional_edges(graph_builder, conditional_edges, tool_routing_index):
     """Add conditional edges to graph"""
+    should_continue_tools = create_tools_router(tool_routing_index)
     for node_id, conditions in conditional_edges.items():
         edges_dict = {
             "default": next(iter(conditions["default"].values()), END),
@@ -78,38 +93,28 @@ def _add_tools_conditional_edges(graph_builder, conditional_edges, nodes):
             edges_dict["ask-human"] = next(iter(conditions["ask-human"].values()))
 
         if edges_dict != {"default": END}:
+            # 路由索引随图一起编译, 缓存共享的图之间互不影响
             graph_builder.add_conditional_edges(
                 node_id, should_continue_tools, edges_dict
             )
 
 
 def _add_classifier_conditional_edges(
-    graph_builder, classifier_node_id: str, nodes: list, edges: list
+    graph_builder, classifier_node_id: str, index: GraphConfigIndex
 ):
     """专门处理分类器节点的条件边"""
-    # 获取分类器节点的配置
-    classifier_node = next(
-        (node for node in nodes if node["id"] == classifier_node_id), None
-    )
-    if not classifier_node:
-        return
-
     # 构建分类器的条件边字典
     edges_dict = {}
 
     # 获取所有从分类器出发的边
-    classifier_edges = [edge for edge in edges if edge["source"] == classifier_node_id]
+    classifier_edges = index.edges_from(classifier_node_id)
 
     # 为每个分类类别创建条件边
     for edge in classifier_edges:
-        target_node = next(
-            (node for node in nodes if node["id"] == edge["target"]), None
-        )
-        if target_node:
-            # 检查边的sourceHandle是否匹配任何category_id
-            source_handle = edge.get("sourceHandle")
-            if source_handle:  # 如果有sourceHandle，使用它作为路由键
-                edges_dict[source_handle] = edge["target"]
+        # 检查边的sourceHandle是否匹配任何category_id
+        source_handle = edge.get("sourceHandle")
+        if source_handle:  # 如果有sourceHandle，使用它作为路由键
+            edges_dict[source_handle] = edge["target"]
 
     # 添加默认路径
     default_edge = next(
@@ -125,29 +130,20 @@ def _add_classifier_conditional_edges(
 
 
 def _add_ifelse_conditional_edges(
-    graph_builder, ifelse_node_id: str, nodes: list, edges: list
+    graph_builder, ifelse_node_id: str, index: GraphConfigIndex
 ):
     """处理 if-else 节点的条件边"""
-    # 获取 if-else 节点的配置
-    ifelse_node = next((node for node in nodes if node["id"] == ifelse_node_id), None)
-    if not ifelse_node:
-        return
-
     # 构建条件边字典
     edges_dict = {}
 
     # 获取所有从 if-else 出发的边
-    ifelse_edges = [edge for edge in edges if edge["source"] == ifelse_node_id]
+    ifelse_edges = index.edges_from(ifelse_node_id)
 
     # 为每个 case 创建条件边
     for edge in ifelse_edges:
-        target_node = next(
-            (node for node in nodes if node["id"] == edge["target"]), None
-        )
-        if target_node:
-            source_handle = edge.get("sourceHandle")
-            if source_handle:  # 如果有 sourceHandle，使用它作为路由键
-                edges_dict[source_handle] = edge["target"]
+        source_handle = edge.get("sourceHandle")
+        if source_handle:  # 如果有 sourceHandle，使用它作为路由键
+            edges_dict[source_handle] = edge["target"]
 
     # 添加默认路径
     default_edge = next(
@@ -162,35 +158,68 @@ def _add_ifelse_conditional_edges(
         )
 
 
+def _template_strings(value: Any):
+    if isinstance(value, str):
+        if "{" in value:
+            yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _template_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _template_strings(item)
+
+
+def _compile_templates(index: GraphConfigIndex) -> None:
+    """Compile every variable template in the node configs ahead of execution
+    and report variables that reference nodes missing from the graph."""
+    node_ids = set(index.nodes_by_id) | {"start"}
+    for node in index.nodes:
+        for text in _template_strings(node["data"]):
+            template = compile_template(text)
+            # 代码节点中的花括号多为代码本身, 不做检查
+            if node["type"] == "code":
+                continue
+            unresolved = template.unresolved(node_ids)
+            if unresolved:
+                logger.warning(
+                    f"Node {node['id']} references variables of unknown nodes: "
+                    f"{', '.join(unresolved)}"
+                )
+
+
 def initialize_graph(
     build_config: dict[str, Any],
-    checkpointer: BaseCheckpointSaver,
+    checkpointer: BaseCheckpointSaver | None = None,
     save_graph_img=False,
 ) -> CompiledGraph:
-    global tool_name_to_node_id
-
     if not validate_config(build_config):
         raise ValueError("Invalid configuration structure")
 
+    # 一次性建立节点/边索引并校验配置, 后续查找均为 O(1)
+    index = GraphConfigIndex.from_config(build_config)
+    if index.of_type("subgraph"):
+        # 子图延迟编译, 但嵌套引用的环需要在编译主图时就发现
+        subgraph_cache.check_cycles(build_config)
+    _compile_templates(index)
+
     try:
         graph_builder = StateGraph(WorkflowTeamState)
-        nodes = build_config["nodes"]
-        edges = build_config["edges"]
 
         graph_builder.add_node("InputNode", InputNode)
 
-        # 创建工具名称到节点ID的映射
-        tool_name_to_node_id = _create_tool_name_mapping(nodes)
+        # 创建工具名称到节点ID的路由索引
+        tool_routing_index = _create_tool_routing_index(index.nodes)
 
         # Determine graph type
-        is_sequential, is_hierarchical = _determine_graph_type(nodes, edges)
+        is_sequential, is_hierarchical = _determine_graph_type(index)
 
         # Create dictionaries for LLM children and conditional edges
-        llm_children = _create_llm_children_dict(nodes, edges)
-        conditional_edges = _create_conditional_edges_dict(nodes)
+        llm_children = _create_llm_children_dict(index)
+        conditional_edges = _create_conditional_edges_dict(index)
 
         # Add nodes
-        for node in nodes:
+        for node in index.nodes:
             node_id = node["id"]
             node_type = node["type"]
             node_data = node["data"]
@@ -208,8 +237,7 @@ def initialize_graph(
                     graph_builder,
                     node_id,
                     node_data,
-                    nodes,
-                    edges,
+                    index,
                     is_sequential,
                     is_hierarchical,
                     llm_children,
@@ -234,25 +262,22 @@ def initialize_graph(
                 _add_agent_node(graph_builder, node_id, node_data)
 
         # Add edges
-        for edge in edges:
-            _add_edge(graph_builder, edge, nodes, conditional_edges)
+        for edge in index.edges:
+            _add_edge(graph_builder, edge, index, conditional_edges)
 
         # Add conditional edges
-        _add_tools_conditional_edges(graph_builder, conditional_edges, nodes)
+        _add_tools_conditional_edges(
+            graph_builder, conditional_edges, tool_routing_index
+        )
 
         # 添加分类器节点的条件边
-        classifier_nodes = [
-            node["id"] for node in nodes if node["type"] == "classifier"
-        ]
-
-        for classifier_node_id in classifier_nodes:
+        for classifier_node in index.of_type("classifier"):
             _add_classifier_conditional_edges(
-                graph_builder, classifier_node_id, nodes, edges
+                graph_builder, classifier_node["id"], index
             )
 
-        if_else_nodes = [node["id"] for node in nodes if node["type"] == "ifelse"]
-        for if_else_node_id in if_else_nodes:
-            _add_ifelse_conditional_edges(graph_builder, if_else_node_id, nodes, edges)
+        for if_else_node in index.of_type("ifelse"):
+            _add_ifelse_conditional_edges(graph_builder, if_else_node["id"], index)
 
         # Set entry point and compile graph
         graph_builder.set_entry_point("InputNode")
@@ -287,49 +312,46 @@ def initialize_graph(
 
 
 # 辅助函数
-def _create_tool_name_mapping(nodes):
-    tool_name_to_node_id = {}
+def _create_tool_routing_index(nodes) -> Mapping[str, str]:
+    """Map each lower-cased tool name to its tool node; the first node wins."""
+    tool_routing_index: dict[str, str] = {}
     for node in nodes:
         if node["type"] == "tool":
-            tool_name_to_node_id[node["id"]] = [
-                tool.lower() for tool in node["data"]["tools"]
-            ]
-        if node["type"] == "toolretrieval":
-            tool_name_to_node_id[node["id"]] = [
-                tool["name"].lower() for tool in node["data"]["tools"]
-            ]
-    return tool_name_to_node_id
-
-
-def _determine_graph_type(nodes, edges):
-    llm_nodes = [node for node in nodes if node["type"] == "llm"]
+            tool_names = [tool.lower() for tool in node["data"]["tools"]]
+        elif node["type"] == "toolretrieval":
+            tool_names = [tool["name"].lower() for tool in node["data"]["tools"]]
+        else:
+            continue
+        for tool_name in tool_names:
+            tool_routing_index.setdefault(tool_name, node["id"])
+    return MappingProxyType(tool_routing_index)
+
+
+def _determine_graph_type(index: GraphConfigIndex):
+    llm_nodes = index.of_type("llm")
     is_sequential = len(llm_nodes) > 1 and all(
-        any(
-            edge["source"] == node["id"] and edge["target"] == next_node["id"]
-            for edge in edges
-        )
+        (node["id"], next_node["id"]) in index.edge_pairs
         for node, next_node in zip(llm_nodes[:-1], llm_nodes[1:], strict=False)
     )
     is_hierarchical = len(llm_nodes) > 1 and not is_sequential
     return is_sequential, is_hierarchical
 
 
-def _create_llm_children_dict(nodes, edges):
-    llm_children = {node["id"]: set() for node in nodes if node["type"] == "llm"}
-    for edge in edges:
-        source, target = edge["source"], edge["target"]
-        if source in llm_children:
-            target_node = next((node for node in nodes if node["id"] == target), None)
-            if target_node and target_node["type"] == "llm":
-                llm_children[source].add(target)
-    return llm_children
+def _create_llm_children_dict(index: GraphConfigIndex):
+    return {
+        node["id"]: {
+            edge["target"]
+            for edge in index.edges_from(node["id"])
+            if index.nodes_by_id[edge["target"]]["type"] == "llm"
+        }
+        for node in index.of_type("llm")
+    }
 
 
-def _create_conditional_edges_dict(nodes):
+def _create_conditional_edges_dict(index: GraphConfigIndex):
     return {
         node["id"]: {"default": {}, "call_tools": {}, "ask-human": {}}
-        for node in nodes
-        if node["type"] == "llm"
+        for node in index.of_type("llm")
     }
 
 
@@ -354,6 +376,7 @@ def _add_retrieval_node(graph_builder, node_id, node_data):
                 query=node_data["query"],
                 user_id=node_data["usr_id"],
                 kb_id=node_data["kb_id"],
+                search_options=get_retrieval_options(node_data),
             ).work
         ),
     )
@@ -363,8 +386,7 @@ def _add_llm_node(
     graph_builder,
     node_id,
     node_data,
-    nodes,
-    edges,
+    index: GraphConfigIndex,
     is_sequential,
     is_hierarchical,
     llm_children,
@@ -381,7 +403,7 @@ def _add_llm_node(
     else:
         node_class = LLMNode
 
-    tools_to_bind = _get_tools_to_bind(node_id, edges, nodes)
+    tools_to_bind = _get_tools_to_bind(node_id, index)
 
     if node_data.get("type") == "subgraph":
         pass
@@ -396,12 +418,13 @@ def _add_llm_node(
                     temperature=node_data["temperature"],
                     system_prompt=node_data.get("systemMessage", None),
                     agent_name=node_data.get("label", node_id),
+                    history=HistoryConfig.from_dict(node_data.get("history")),
                 ).work
             ),
         )
 
 
-def _get_tools_to_bind(node_id, edges, nodes):
+def _get_tools_to_bind(node_id, index: GraphConfigIndex):
     tools_to_bind = []
     # 存储已处理过的节点，避免循环
     processed_nodes = set()
@@ -411,35 +434,29 @@ def _get_tools_to_bind(node_id, edges, nodes):
             return
         processed.add(current_node_id)
 
-        for edge in edges:
-            if edge["source"] == current_node_id:
-                target_node = next(
-                    (n for n in nodes if n["id"] == edge["target"]), None
+        for edge in index.edges_from(current_node_id):
+            target_node = index.nodes_by_id[edge["target"]]
+            # 如果是工具节点，添加工具
+            if target_node["type"] == "tool":
+                tools_to_bind.extend(
+                    [get_tool(tool_name) for tool_name in target_node["data"]["tools"]]
                 )
-                if target_node:
-                    # 如果是工具节点，添加工具
-                    if target_node["type"] == "tool":
-                        tools_to_bind.extend(
-                            [
-                                get_tool(tool_name)
-                                for tool_name in target_node["data"]["tools"]
-                            ]
-                        )
-                    elif target_node["type"] == "toolretrieval":
-                        tools_to_bind.extend(
-                            [
-                                get_retrieval_tool(
-                                    tool["name"],
-                                    tool["description"],
-                                    tool["usr_id"],
-                                    tool["kb_id"],
-                                )
-                                for tool in target_node["data"]["tools"]
-                            ]
+            elif target_node["type"] == "toolretrieval":
+                tools_to_bind.extend(
+                    [
+                        get_retrieval_tool(
+                            tool["name"],
+                            tool["description"],
+                            tool["usr_id"],
+                            tool["kb_id"],
+                            **get_retrieval_options(tool),
                         )
-                    # 如果是human节点，继续遍历其后续节点
-                    elif target_node["type"] == "human":
-                        get_connected_tools(target_node["id"], processed)
+                        for tool in target_node["data"]["tools"]
+                    ]
+                )
+            # 如果是human节点，继续遍历其后续节点
+            elif target_node["type"] == "human":
+                get_connected_tools(target_node["id"], processed)
 
     # 从起始节点开始遍历
     get_connected_tools(node_id, processed_nodes)
@@ -456,15 +473,16 @@ def _add_tool_node(graph_builder, node_id, node_type, node_data):
                 tool["description"],
                 tool["usr_id"],
                 tool["kb_id"],
+                **get_retrieval_options(tool),
             )
             for tool in node_data["tools"]
         ]
     graph_builder.add_node(node_id, ToolNode(tools))
 
 
-def _add_edge(graph_builder, edge, nodes, conditional_edges):
-    source_node = next(node for node in nodes if node["id"] == edge["source"])
-    target_node = next(node for node in nodes if node["id"] == edge["target"])
+def _add_edge(graph_builder, edge, index: GraphConfigIndex, conditional_edges):
+    source_node = index.nodes_by_id[edge["source"]]
+    target_node = index.nodes_by_id[edge["target"]]
 
     if source_node["type"] == "start":
         if edge["type"] == "default":
@@ -708,6 +726,7 @@ def _add_agent_node(graph_builder, node_id, node_data):
             tools=node_data["tools"],
             retrieval_tools=node_data["retrievalTools"],
             agent_name=node_data["label"],
+            history=HistoryConfig.from_dict(node_data.get("history")),
         ).work,
     )
 
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any
+
+NodeConfig = dict[str, Any]
+EdgeConfig = dict[str, Any]
+
+
+@dataclass(frozen=True)
+class GraphConfigIndex:
+    """
+    Lookup tables over a workflow graph config, built once per compilation.
+
+    Node and edge relationships are resolved through these indexes instead
+    of scanning `nodes` and `edges`, so compiling is linear in the size of
+    the config. Lists keep the config order.
+    """
+
+    nodes: list[NodeConfig]
+    edges: list[EdgeConfig]
+    nodes_by_id: dict[str, NodeConfig]
+    nodes_by_type: dict[str, list[NodeConfig]]
+    outgoing: dict[str, list[EdgeConfig]]
+    edge_pairs: frozenset[tuple[str, str]]
+
+    @classmethod
+    def from_config(cls, build_config: dict[str, Any]) -> "GraphConfigIndex":
+        """Index and validate the nodes and edges of a graph config.
+
+        Raises:
+            ValueError: If a node or edge misses a required key, node ids are
+                duplicated or an edge references an unknown node.
+        """
+        nodes = build_config["nodes"]
+        edges = build_config["edges"]
+        nodes_by_id: dict[str, NodeConfig] = {}
+        nodes_by_type: dict[str, list[NodeConfig]] = defaultdict(list)
+        outgoing: dict[str, list[EdgeConfig]] = defaultdict(list)
+
+        for node in nodes:
+            if "id" not in node or "type" not in node or "data" not in node:
+                raise ValueError(f"Invalid node config: {node}")
+            if node["id"] in nodes_by_id:
+                raise ValueError(f"Duplicate node id: {node['id']}")
+            nodes_by_id[node["id"]] = node
+            nodes_by_type[node["type"]].append(node)
+
+        for edge in edges:
+            if "source" not in edge or "target" not in edge:
+                raise ValueError(f"Invalid edge config: {edge}")
+            for end in (edge["source"], edge["target"]):
+                if end not in nodes_by_id:
+                    raise ValueError(
+                        f"Edge {edge.get('id', '')} references unknown node: {end}"
+                    )
+            outgoing[edge["source"]].append(edge)
+
+        return cls(
+            nodes=nodes,
+            edges=edges,
+            nodes_by_id=nodes_by_id,
+            nodes_by_type=dict(nodes_by_type),
+            outgoing=dict(outgoing),
+            edge_pairs=frozenset((edge["source"], edge["target"]) for edge in edges),
+        )
+
+    def of_type(self, node_type: str) -> list[NodeConfig]:
+        return self.nodes_by_type.get(node_type, [])
+
+    def edges_from(self, node_id: str) -> list[EdgeConfig]:
+        return self.outgoing.get(node_id, [])
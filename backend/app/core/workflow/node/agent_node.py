@@ -3,13 +3,13 @@ from typing import Any, Dict, List
 from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import create_react_agent
 
+from app.core.history import HistoryConfig, aformat_history
 from app.core.model_providers.model_provider_manager import model_provider_manager
 from app.core.state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
-    format_messages,
     parse_variables,
-    update_node_outputs,
+    unseen_messages,
 )
 from app.core.workflow.utils.db_utils import get_model_info
 from app.core.workflow.utils.tools_utils import get_retrieval_tool, get_tool
@@ -34,8 +34,10 @@ class AgentNode:
         tools: List[str] = None,
         retrieval_tools: List[Dict[str, Any]] = None,
         agent_name: str = None,
+        history: HistoryConfig | None = None,
     ):
         self.node_id = node_id
+        self.history = history or HistoryConfig()
         self.system_message = system_message 
         self.user_message = user_message
         self.agent_name = agent_name or node_id
@@ -104,7 +106,6 @@ class AgentNode:
             state["node_outputs"] = {}
         
         history = state.get("history", [])
-        messages = state.get("messages", [])
         all_messages = state.get("all_messages", [])
         
         if self.system_prompt:
@@ -157,10 +158,9 @@ class AgentNode:
                 ]
             )
 
-        history = state.get("history", [])
-        messages = state.get("messages", [])
-        all_messages = state.get("all_messages", [])
-        prompt = llm_node_prompts.partial(history_string=format_messages(history))
+        prompt = llm_node_prompts.partial(
+            history_string=await aformat_history(history, self.history, self.llm)
+        )
        
         
         # 准备Agent的输入状态
@@ -186,25 +186,25 @@ class AgentNode:
         agent_result = await self.agent.ainvoke(agent_input)
         
         # 获取最终回复
-        messages = agent_result["messages"]
+        agent_messages = agent_result["messages"]
         # 从后往前找第一个不带工具调用的AI消息
-        for msg in reversed(messages):
+        for msg in reversed(agent_messages):
             if msg.type == "ai" and not hasattr(msg, "tool_calls"):
                 result = msg
                 break
         else:
             # 如果没有找到合适的AIMessage，使用最后一个消息
-            result = messages[-1]
+            result = agent_messages[-1]
         
         # 更新 node_outputs
         new_output = {self.node_id: {"response": result.content}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
         
         return_state: ReturnWorkflowTeamState = {
-            "history": history + [result],
+            "history": [result],
             "messages": [result] if hasattr(result, "tool_calls") and result.tool_calls else [],
-            "all_messages": messages + [result],
-            "node_outputs": state["node_outputs"],
+            # 只追加 Agent 本次运行产生的消息
+            "all_messages": unseen_messages(all_messages, agent_messages + [result]),
+            "node_outputs": new_output,
         }
         
         return return_state 
\ No newline at end of file
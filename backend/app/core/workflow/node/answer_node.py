@@ -5,7 +5,6 @@ from app.core.state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 
 
@@ -33,11 +32,10 @@ class AnswerNode:
 
         # 更新 node_outputs
         new_output = {self.node_id: {"response": result.content}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
         return_state: ReturnWorkflowTeamState = {
-            "history": state.get("history", []) + [result],
+            "history": [result],
             "messages": [result],
-            "all_messages": state.get("all_messages", []) + [result],
-            "node_outputs": state["node_outputs"],
+            "all_messages": [result],
+            "node_outputs": new_output,
         }
         return return_state
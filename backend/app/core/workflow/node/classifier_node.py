@@ -11,7 +11,6 @@ from ...state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 
 CLASSIFIER_SYSTEM_PROMPT = """
@@ -62,6 +61,14 @@ class ClassifierNode:
         self.categories = categories
         self.input = input
         self.model_info = get_model_info(model_name)
+        # Initialize LLM with provider info
+        self.llm = model_provider_manager.init_model(
+            provider_name=self.model_info["provider_name"],
+            model=self.model_info["ai_model_name"],
+            temperature=0.1,
+            api_key=self.model_info["api_key"],
+            base_url=self.model_info["base_url"],
+        )
 
     async def work(
         self, state: WorkflowTeamState, config: RunnableConfig
@@ -77,15 +84,6 @@ class ClassifierNode:
         if not input_text and state.get("all_messages"):
             input_text = state["all_messages"][-1].content
 
-        # Initialize LLM with provider info
-        llm = model_provider_manager.init_model(
-            provider_name=self.model_info["provider_name"],
-            model=self.model_info["ai_model_name"],
-            temperature=0.1,
-            api_key=self.model_info["api_key"],
-            base_url=self.model_info["base_url"],
-        )
-
         # Prepare categories list and input in JSON format
         categories_list = [cat["category_name"] for cat in self.categories]
         input_json = {"input_text": [input_text], "categories": categories_list}
@@ -98,7 +96,7 @@ class ClassifierNode:
             ]
         )
         outputparser = JsonOutputParser()
-        chain = prompt | llm | outputparser
+        chain = prompt | self.llm | outputparser
 
         # Add helper function to normalize result
         def normalize_category_result(result: Any) -> str:
@@ -124,7 +122,7 @@ class ClassifierNode:
         # Ensure categories is not empty and has valid format
         if not self.categories or not isinstance(self.categories, list):
             print("Invalid categories format")
-            return {"node_outputs": state.get("node_outputs", {})}
+            return {"node_outputs": {}}
 
         # Get normalized category name
         category_name = normalize_category_result(result)
@@ -171,10 +169,9 @@ class ClassifierNode:
                 "category_name": matched_category["category_name"],
             }
         }
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
 
         return_state: ReturnWorkflowTeamState = {
-            "node_outputs": state["node_outputs"],
+            "node_outputs": new_output,
         }
 
         return return_state
@@ -1,12 +1,17 @@
 import base64
+import contextlib
 import json
 import logging
 import queue
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
 import threading
 import time
 import uuid
 import os
-import ast
 from textwrap import dedent
 from typing import List
 
@@ -15,11 +20,13 @@ from langchain_core.runnables import RunnableConfig
 
 import docker
 
+from app.core.config import settings
+from app.core.workflow.utils.offload import node_offloader
+
 from ....state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -65,7 +72,6 @@ class CodeExecutor:
             timeout: int = 30,
             memory_limit: str = "256m",
             image_tag: str = "code-interpreter:latest",
-            pool_size: int = 3,
     ):
         if not hasattr(self, "initialized"):
             self.timeout = timeout
@@ -73,63 +79,40 @@ class CodeExecutor:
             self.image_tag = image_tag
             self.initialized = True
 
-    def _install_libraries(
-            self, container, libraries: List[str]
-    ) -> None:
-        """Install required libraries in container"""
+    def _libraries_to_install(self, libraries: List[str]) -> List[str]:
         # 过滤掉内置库和预装库
-        libraries_to_install = [
+        return [
             lib
             for lib in libraries
             if lib.lower() not in self.PREINSTALLED_LIBRARIES
                and lib.lower() not in self.BUILTIN_LIBRARIES
         ]
 
-        if libraries_to_install:
-            print(f"Installing libraries: {', '.join(libraries_to_install)}")
-            for library in libraries_to_install:
-                os.system(f"pip install --user {library}")
-        else:
-            print("All required libraries are pre-installed or built-in")
-
     def execute(self, code: str, libraries: List[str]) -> str:
-        """Execute code in Docker container with safety measures"""
-        print(f"\nStarting code execution with {len(libraries)} libraries")
-        if libraries:
-            print(f"Required libraries: {', '.join(libraries)}")
-
-        print(f"Using container: python")
+        """Execute code in a pre-warmed sandbox worker process"""
+        logger.info(f"Starting code execution with {len(libraries)} libraries")
+        pool = get_sandbox_pool()
 
         try:
-            # Install required libraries
-            self._install_libraries(None, libraries)
-            print("Libraries installed successfully")
+            # Install required libraries, once per pool
+            pool.install(self._libraries_to_install(libraries))
 
             # 使用模板创建执行脚本
             runner_script = CodeTemplate.create_execution_script(code)
-            # 执行代码
-            global_vars = {}
-            local_vars = {}
-
-            exec(runner_script,None,local_vars)
-
-            result = local_vars.get("result")
-            if not result:
-                result_json = local_vars.get('output_json')
-                try:
-                    result = json.loads(result_json.strip())
-                    return result
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
-                    return result_json.strip()
-
-            print("\nCode execution result:")
-            print(result)
-            return result
+            result_json = pool.execute(
+                runner_script,
+                timeout=self.timeout,
+                memory_limit=_parse_memory_limit(self.memory_limit),
+            )
+            try:
+                return json.loads(result_json.strip())
+            except json.JSONDecodeError as e:
+                logger.warning(f"JSON decode error: {e}")
+                return result_json.strip()
 
         except Exception as e:
             error_msg = f"Execution error: {str(e)}"
-            print(f"\nError: {error_msg}")
+            logger.error(error_msg)
             return error_msg
 
     def cleanup(self):
@@ -141,38 +124,270 @@ class CodeExecutor:
         self.cleanup()
 
 
+def _parse_memory_limit(memory_limit: str) -> int:
+    """Convert a docker style memory limit ("256m", "1g") to bytes."""
+    units = {"k": 1024, "m": 1024**2, "g": 1024**3}
+    memory_limit = memory_limit.strip().lower()
+    if memory_limit and memory_limit[-1] in units:
+        return int(float(memory_limit[:-1]) * units[memory_limit[-1]])
+    return int(memory_limit)
+
+
+class SandboxWorker:
+    """A long-lived python process executing scripts sent over a private pipe"""
+
+    def __init__(self, site_dir: str, max_memory: int):
+        self.work_dir = tempfile.mkdtemp(prefix="code-sandbox-")
+        self.runs = 0
+        self._buffer = b""
+        # 协议走独立管道: 脚本可以写 worker 的 stdout, 但拿不到这两个 fd
+        request_r, request_w = os.pipe()
+        response_r, response_w = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                [
+                    sys.executable,
+                    os.path.join(os.path.dirname(__file__), "sandbox_worker.py"),
+                    site_dir,
+                    str(max_memory),
+                    str(request_r),
+                    str(response_w),
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(request_r, response_w),
+                cwd=self.work_dir,
+                env={
+                    "PATH": os.environ.get("PATH", ""),
+                    "OPENBLAS_NUM_THREADS": "1",
+                },
+            )
+        except Exception:
+            os.close(request_w)
+            os.close(response_r)
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            raise
+        finally:
+            os.close(request_r)
+            os.close(response_w)
+        self.requests = os.fdopen(request_w, "w", encoding="utf-8")
+        self.responses = response_r
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_line(self, timeout: int) -> bytes:
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            ready, _, _ = select.select([self.responses], [], [], max(remaining, 0))
+            if not ready:
+                raise TimeoutError(f"Code execution timed out after {timeout}s")
+            data = os.read(self.responses, 65536)
+            if not data:
+                raise RuntimeError(
+                    "Sandbox worker exited (CPU or memory limit exceeded)"
+                )
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line
+
+    def run(self, script: str, timeout: int, cpu_limit: int, memory_limit: int) -> str:
+        self.runs += 1
+        nonce = uuid.uuid4().hex
+        request = json.dumps(
+            {
+                "nonce": nonce,
+                "script": script,
+                "cpu_limit": cpu_limit,
+                "memory_limit": memory_limit,
+            }
+        )
+        try:
+            self.requests.write(request + "\n")
+            self.requests.flush()
+            response = json.loads(self._read_line(timeout))
+            if response.get("nonce") != nonce:
+                raise RuntimeError("Sandbox worker replied to another request")
+        except Exception:
+            # 超时, 退出或协议错乱的 worker 都不能再交给下一次执行
+            self.kill()
+            raise
+
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        if response["output"] is None:
+            return response["stdout"]
+        return response["output"]
+
+    def kill(self) -> None:
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+        # worker 已退出, 未写完的请求无处可去
+        with contextlib.suppress(OSError):
+            self.requests.close()
+        if self.responses >= 0:
+            os.close(self.responses)
+            self.responses = -1
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class SandboxPool:
+    """Pre-warmed pool of sandbox worker processes"""
+
+    def __init__(self, min_size: int, max_size: int, site_dir: str):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
+        self.site_dir = site_dir
+        self._idle: queue.Queue[SandboxWorker] = queue.Queue()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._installed: set[str] = set()
+        self._install_locks: dict[str, threading.Lock] = {}
+        self.max_memory = _parse_memory_limit(settings.CODE_SANDBOX_MAX_MEMORY)
+        os.makedirs(site_dir, exist_ok=True)
+        self._warm()
+
+    def _spawn(self) -> SandboxWorker:
+        worker = SandboxWorker(self.site_dir, self.max_memory)
+        logger.debug(f"Started sandbox worker {worker.process.pid}")
+        return worker
+
+    def _warm(self) -> None:
+        with self._lock:
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        for _ in range(missing):
+            self._idle.put(self._spawn())
+
+    def _acquire(self, timeout: float) -> SandboxWorker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_spawn = self._size < self.max_size
+                    if can_spawn:
+                        self._size += 1
+                if can_spawn:
+                    return self._spawn()
+                # 池已满, 在锁外等待其他执行归还
+                worker = self._idle.get(timeout=timeout)
+            if worker.alive:
+                return worker
+            worker.kill()
+            with self._lock:
+                self._size -= 1
+
+    def _release(self, worker: SandboxWorker) -> None:
+        if worker.alive and worker.runs < settings.CODE_SANDBOX_MAX_RUNS:
+            self._idle.put(worker)
+            return
+        worker.kill()
+        with self._lock:
+            self._size -= 1
+        self._warm()
+
+    def install(self, libraries: List[str]) -> None:
+        """Install libraries into the pool's shared site dir, once per library"""
+        for library in libraries:
+            if library in self._installed:
+                continue
+            with self._lock:
+                install_lock = self._install_locks.setdefault(library, threading.Lock())
+            with install_lock:
+                if library in self._installed:
+                    continue
+                logger.info(f"Installing library: {library}")
+                subprocess.run(
+                    [
+                        sys.executable,
+                        "-m",
+                        "pip",
+                        "install",
+                        "--quiet",
+                        "--target",
+                        self.site_dir,
+                        library,
+                    ],
+                    check=True,
+                    timeout=settings.CODE_SANDBOX_INSTALL_TIMEOUT,
+                )
+                self._installed.add(library)
+
+    def execute(self, script: str, timeout: int, memory_limit: int) -> str:
+        worker = self._acquire(settings.CODE_SANDBOX_ACQUIRE_TIMEOUT)
+        try:
+            return worker.run(
+                script,
+                timeout=timeout,
+                cpu_limit=settings.CODE_SANDBOX_CPU_LIMIT,
+                memory_limit=memory_limit,
+            )
+        finally:
+            self._release(worker)
+
+    def cleanup(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+_sandbox_pool: SandboxPool | None = None
+_sandbox_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    global _sandbox_pool
+    with _sandbox_pool_lock:
+        if _sandbox_pool is None:
+            _sandbox_pool = SandboxPool(
+                min_size=settings.CODE_SANDBOX_MIN_SIZE,
+                max_size=settings.CODE_SANDBOX_MAX_SIZE,
+                site_dir=settings.CODE_SANDBOX_SITE_DIR,
+            )
+        return _sandbox_pool
+
+
 class ContainerPool:
     """管理Docker容器池"""
 
-    def __init__(self, image_tag: str, pool_size: int = 3, memory_limit: str = "256m"):
+    def __init__(
+        self,
+        image_tag: str,
+        min_size: int = 1,
+        max_size: int = 3,
+        memory_limit: str = "256m",
+        cpus: float = 1.0,
+    ):
         self.image_tag = image_tag
-        self.pool_size = pool_size
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
         self.memory_limit = memory_limit
+        self.cpus = cpus
         self.available_containers = queue.Queue()
         self.active_containers = {}  # 改用字典来跟踪容器
+        # 每个容器已安装的库, 同一个库在一个容器内只安装一次
+        self.installed_libraries: dict[str, set[str]] = {}
         self.client = docker.from_env()
         self.lock = threading.Lock()
         self._initialize_pool()
 
     def _initialize_pool(self):
-        """初始化容器池"""
-        container = self._create_container()
-        self.available_containers.put(container)
+        """初始化容器池, 预热 min_size 个容器"""
+        for _ in range(self.min_size):
+            self.available_containers.put(self._create_container())
 
     def _create_container(self):
         """创建新的容器"""
-        container_name = f"code-interpreter-worker-{len(self.active_containers)}"
+        container_name = f"code-interpreter-worker-{uuid.uuid4().hex[:8]}"
         try:
             logger.info(f"Creating container: {container_name}")
-            # 先尝试删除同名容器
-            try:
-                old_container = self.client.containers.get(container_name)
-                old_container.remove(force=True)
-                logger.info(f"Removed old container: {container_name}")
-            except docker.errors.NotFound:
-                pass
-
-            # 创建新容器
             container = self.client.containers.run(
                 self.image_tag,
                 detach=True,
@@ -183,6 +398,8 @@ class ContainerPool:
                 network="docker_default",
                 volumes={"app-code-workspace": {"bind": "/workspace", "mode": "rw"}},
                 mem_limit=self.memory_limit,
+                nano_cpus=int(self.cpus * 1e9),
+                pids_limit=128,
                 security_opt=["no-new-privileges:true"],
                 cap_drop=["ALL"],
                 name=container_name,
@@ -191,12 +408,11 @@ class ContainerPool:
                     "/opt/code-interpreter/scripts/entrypoint.sh",
                 ],  # 显式指定启动命令
             )
-
-            # 等待容器完全启动
-            time.sleep(0.5)
             container.reload()
 
-            self.active_containers[container.id] = container
+            with self.lock:
+                self.active_containers[container.id] = container
+                self.installed_libraries[container.id] = set()
             logger.info(f"Created container: {container_name}")
             return container
 
@@ -204,67 +420,73 @@ class ContainerPool:
             logger.error(f"Error creating container: {e}")
             raise
 
-    def get_container(self):
-        """获取一个可用的容器"""
+    def _discard(self, container):
         with self.lock:
+            self.active_containers.pop(container.id, None)
+            self.installed_libraries.pop(container.id, None)
+        try:
+            container.remove(force=True)
+        except Exception:
+            pass
+
+    def get_container(self, timeout: float = 30):
+        """获取一个可用的容器, 池满时在锁外等待归还"""
+        while True:
             try:
                 container = self.available_containers.get_nowait()
-                # 检查容器是否还在运行
-                try:
-                    container.reload()
-                    return container
-                except:
-                    # 使用 pop 而不是 discard，因为是字典
-                    self.active_containers.pop(container.id, None)
-                    return self._create_container()
             except queue.Empty:
-                if len(self.active_containers) < self.pool_size:
+                with self.lock:
+                    can_create = len(self.active_containers) < self.max_size
+                if can_create:
                     return self._create_container()
-                else:
-                    # 等待可用容器
-                    return self.available_containers.get(timeout=5)
+                container = self.available_containers.get(timeout=timeout)
+            # 检查容器是否还在运行
+            try:
+                container.reload()
+                if container.status == "running":
+                    return container
+            except Exception:
+                pass
+            self._discard(container)
 
     def return_container(self, container):
         """归还容器到池中"""
-        with self.lock:
-            try:
-                container.reload()  # 检查容器状态
-                container.exec_run("rm -rf /workspace/*")  # 清理工作目录
-                self.available_containers.put(container)
-            except:
-                # 使用 pop 而不是 discard
-                self.active_containers.pop(container.id, None)
-                try:
-                    container.remove(force=True)
-                except:
-                    pass
+        try:
+            container.reload()  # 检查容器状态
+            container.exec_run("sh -c 'rm -rf /workspace/*'")  # 清理工作目录
+            self.available_containers.put(container)
+        except Exception:
+            self._discard(container)
 
     def cleanup(self):
         """清理所有容器"""
         with self.lock:
-            # 清理活动容器
-            for container_id, container in list(self.active_containers.items()):
+            containers = list(self.active_containers.items())
+        # 清理活动容器
+        for container_id, container in containers:
+            try:
+                logger.info(f"Removing container: {container.name}")
+                container.remove(force=True)
+            except Exception as e:
+                logger.error(f"Error removing container: {e}")
+            finally:
+                with self.lock:
+                    self.active_containers.pop(container_id, None)
+                    self.installed_libraries.pop(container_id, None)
+
+        # 清理所有 code-interpreter-worker 容器
+        try:
+            containers = self.client.containers.list(
+                all=True, filters={"name": "code-interpreter-worker"}
+            )
+            for container in containers:
                 try:
-                    logger.info(f"Removing container: {container.name}")
                     container.remove(force=True)
+                    logger.info(f"Removed worker container: {container.name}")
                 except Exception as e:
-                    logger.error(f"Error removing container: {e}")
-                finally:
-                    self.active_containers.pop(container_id, None)
-
-            # 清理所有 code-interpreter-worker 容器
-            try:
-                containers = self.client.containers.list(
-                    all=True, filters={"name": "code-interpreter-worker"}
-                )
-                for container in containers:
-                    try:
-                        container.remove(force=True)
-                        logger.info(f"Removed worker container: {container.name}")
-                    except Exception as e:
-                        logger.error(f"Error removing worker container: {e}")
-            except Exception as e:
-                logger.error(f"Error listing containers: {e}")
+                    logger.error(f"Error removing worker container: {e}")
+        except Exception as e:
+            logger.error(f"Error listing containers: {e}")
 
     def __del__(self):
         """确保在对象被销毁时清理所有容器"""
@@ -342,7 +564,6 @@ class CodeDockerExecutor(CodeExecutor):
         timeout: int = 30,
         memory_limit: str = "256m",
         image_tag: str = "flock-code-interpreter:latest",
-        pool_size: int = 3,
     ):
         if not hasattr(self, "initialized"):
             self.timeout = timeout
@@ -351,7 +572,11 @@ class CodeDockerExecutor(CodeExecutor):
             self.client = docker.from_env()
             # self._verify_docker_image()
             self._pool = ContainerPool(
-                image_tag=image_tag, pool_size=pool_size, memory_limit=memory_limit
+                image_tag=image_tag,
+                min_size=settings.CODE_SANDBOX_MIN_SIZE,
+                max_size=settings.CODE_SANDBOX_MAX_SIZE,
+                memory_limit=memory_limit,
+                cpus=settings.CODE_SANDBOX_CONTAINER_CPUS,
             )
             self.initialized = True
 
@@ -367,19 +592,21 @@ class CodeDockerExecutor(CodeExecutor):
     def _install_libraries(
         self, container: docker.models.containers.Container, libraries: list[str]
     ) -> None:
-        """Install required libraries in container"""
-        # 过滤掉内置库和预装库
+        """Install required libraries in container, once per container"""
+        installed = self._pool.installed_libraries.setdefault(container.id, set())
         libraries_to_install = [
-            lib
-            for lib in libraries
-            if lib.lower() not in self.PREINSTALLED_LIBRARIES
-            and lib.lower() not in self.BUILTIN_LIBRARIES
+            lib for lib in self._libraries_to_install(libraries) if lib not in installed
         ]
 
         if libraries_to_install:
             print(f"Installing libraries: {', '.join(libraries_to_install)}")
             for library in libraries_to_install:
-                container.exec_run(f"pip install --user {library}")
+                exec_result = container.exec_run(["pip", "install", "--user", library])
+                if exec_result.exit_code != 0:
+                    raise RuntimeError(
+                        f"Failed to install {library}: {exec_result.output.decode('utf-8')}"
+                    )
+                installed.add(library)
         else:
             print("All required libraries are pre-installed or built-in")
 
@@ -389,7 +616,9 @@ class CodeDockerExecutor(CodeExecutor):
         if libraries:
             print(f"Required libraries: {', '.join(libraries)}")
 
-        container = self._pool.get_container()
+        container = self._pool.get_container(
+            timeout=settings.CODE_SANDBOX_ACQUIRE_TIMEOUT
+        )
         print(f"Using container: {container.name}")
 
         try:
@@ -404,13 +633,25 @@ class CodeDockerExecutor(CodeExecutor):
             code_base64 = base64.b64encode(runner_script.encode("utf-8")).decode(
                 "utf-8"
             )
-            decode_and_exec = f'''python3 -c "import base64; exec(base64.b64decode('{code_base64}').decode('utf-8'))"'''
-
-            # 执行代码
+            decode_and_exec = [
+                "timeout",
+                "-s",
+                "KILL",
+                f"{self.timeout}s",
+                "python3",
+                "-c",
+                f"import base64; exec(base64.b64decode('{code_base64}').decode('utf-8'))",
+            ]
+
+            # 执行代码, 超时由容器内的 timeout 命令强制结束
             exec_result = container.exec_run(
                 decode_and_exec, tty=True, environment={"PYTHONUNBUFFERED": "1"}
             )
 
+            if exec_result.exit_code == 137:
+                error_msg = f"Code execution timed out after {self.timeout} seconds"
+                print(f"\nError: {error_msg}")
+                return error_msg
             if exec_result.exit_code != 0:
                 error_msg = (
                     f"Error executing code: {exec_result.output.decode('utf-8')}"
@@ -489,7 +730,10 @@ class CodeNode:
             )
 
             # Execute code
-            code_execution_result = self.executor.execute(parsed_code, self.libraries)
+            # 在线程池中执行, 避免阻塞事件循环
+            code_execution_result = await node_offloader.run(
+                "code", self.executor.execute, parsed_code, self.libraries
+            )
 
             if isinstance(code_execution_result, str):
                 # If code_result is a string, return it as it is
@@ -511,15 +755,12 @@ class CodeNode:
 
             # Update node outputs
             new_output = {self.node_id: {"response": result.content}}
-            state["node_outputs"] = update_node_outputs(
-                state["node_outputs"], new_output
-            )
 
             return_state: ReturnWorkflowTeamState = {
-                "history": state.get("history", []) + [result],
+                "history": [result],
                 "messages": [result],
-                "all_messages": state.get("all_messages", []) + [result],
-                "node_outputs": state["node_outputs"],
+                "all_messages": [result],
+                "node_outputs": new_output,
             }
             return return_state
 
@@ -533,13 +774,10 @@ class CodeNode:
             )
 
             new_output = {self.node_id: {"response": result.content}}
-            state["node_outputs"] = update_node_outputs(
-                state["node_outputs"], new_output
-            )
             return_state: ReturnWorkflowTeamState = {
-                "history": state.get("history", []) + [result],
+                "history": [result],
                 "messages": [result],
-                "all_messages": state.get("all_messages", []) + [result],
-                "node_outputs": state["node_outputs"],
+                "all_messages": [result],
+                "node_outputs": new_output,
             }
             return return_state
@@ -0,0 +1,83 @@
+"""
+Long-lived worker process of the code node sandbox pool.
+
+Started as `python sandbox_worker.py <site_dir> <max_memory_bytes> <request_fd>
+<response_fd>`. Reads one JSON request per line from `request_fd`
+({"nonce": ..., "script": ..., "cpu_limit": seconds, "memory_limit": bytes}),
+executes the script in a fresh namespace and writes one JSON response per line,
+tagged with the request's nonce, to `response_fd`. Standard input and output
+are /dev/null, so whatever the script writes to them cannot reach the host.
+Only the standard library may be imported here.
+"""
+
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+
+
+def _limit_memory(memory_limit: int, max_memory: int) -> None:
+    # hard limit 是整个 worker 的上限, 每次执行只调整 soft limit
+    resource.setrlimit(
+        resource.RLIMIT_DATA, (min(memory_limit, max_memory), max_memory)
+    )
+
+
+def _limit_cpu(cpu_limit: int) -> None:
+    # RLIMIT_CPU 按进程累计, 每次执行前在已用时间基础上放宽
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_limit
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _run(script: str) -> dict:
+    namespace: dict = {"__name__": "__sandbox__"}
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        exec(script, namespace)
+    return {"ok": True, "output": namespace.get("output_json"), "stdout": stdout.getvalue()}
+
+
+def _isolate_stdio() -> None:
+    # os.system, 子进程和 C 扩展会直接写 fd 1/2, 绕过 redirect_stdout
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+
+
+def main() -> None:
+    site_dir, max_memory = sys.argv[1], int(sys.argv[2])
+    request_fd, response_fd = int(sys.argv[3]), int(sys.argv[4])
+    # 协议管道不传给脚本启动的子进程
+    os.set_inheritable(request_fd, False)
+    os.set_inheritable(response_fd, False)
+    requests = os.fdopen(request_fd, "r", encoding="utf-8")
+    protocol = os.fdopen(response_fd, "w", encoding="utf-8")
+    _isolate_stdio()
+    sys.path.insert(0, site_dir)
+    _limit_memory(max_memory, max_memory)
+
+    for line in requests:
+        request = json.loads(line)
+        _limit_cpu(request["cpu_limit"])
+        _limit_memory(request["memory_limit"], max_memory)
+        try:
+            response = _run(request["script"])
+        except MemoryError:
+            response = {"ok": False, "error": "Memory limit exceeded"}
+        except BaseException as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        response["nonce"] = request["nonce"]
+        protocol.write(json.dumps(response) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,12 @@ from langchain_core.runnables import RunnableConfig
 from app.core.model_providers.model_provider_manager import model_provider_manager
 from app.core.tools.tool_manager import managed_tools
 from app.core.workflow.utils.db_utils import get_model_info
+from app.core.workflow.utils.offload import node_offloader
 
 from ...state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 
 
@@ -183,20 +183,19 @@ Even though you don't perform tasks by yourself, you have a lot of experience in
         )
 
         # Run the crew
-        result = crew.kickoff()
+        result = await node_offloader.run("crewai", crew.kickoff)
         raw_result_str = result.raw
 
         # Update node_outputs
         new_output = {self.node_id: {"response": raw_result_str}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
 
         # Create AI message from result
         crewai_res_message = AIMessage(content=str(raw_result_str))
 
         return_state: ReturnWorkflowTeamState = {
-            "history": state.get("history", []) + [crewai_res_message],
+            "history": [crewai_res_message],
             "messages": [crewai_res_message],
-            "all_messages": state.get("all_messages", []) + [crewai_res_message],
-            "node_outputs": state["node_outputs"],
+            "all_messages": [crewai_res_message],
+            "node_outputs": new_output,
         }
         return return_state
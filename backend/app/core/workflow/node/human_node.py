@@ -24,17 +24,13 @@ class HumanNode:
         self.routes = routes
         self.title = title
         self.interaction_type = interaction_type
-        self.history = None
         self.messages = None
-        self.all_messages = None
         self.last_message = None
 
     async def work(
         self, state: WorkflowTeamState, config: RunnableConfig
     ) -> ReturnWorkflowTeamState | Command[str]:
-        self.history = state.get("history", [])
         self.messages = state.get("messages", [])
-        self.all_messages = state.get("all_messages", [])
 
         # 获取最后一条消息
         self.last_message = state["all_messages"][-1]
@@ -50,7 +46,8 @@ class HumanNode:
                 not hasattr(self.last_message, "tool_calls")
                 or not self.last_message.tool_calls
             ):
-                return state
+                # 没有待审查的工具调用, 不更新状态
+                return {}
             tool_call = self.last_message.tool_calls
             interrupt_data.update(
                 {
@@ -117,9 +114,9 @@ class HumanNode:
                 )
 
                 return_state: ReturnWorkflowTeamState = {
-                    "history": self.history + result,
+                    "history": result,
                     "messages": result,
-                    "all_messages": self.all_messages + result,
+                    "all_messages": result,
                 }
                 next_node = self.routes.get("rejected", "call_llm")
                 return Command(goto=next_node, update=return_state)
@@ -147,9 +144,9 @@ class HumanNode:
                 )
 
                 return_state: ReturnWorkflowTeamState = {
-                    "history": self.history + [updated_message],
+                    "history": [updated_message],
                     "messages": [updated_message],
-                    "all_messages": self.all_messages + [updated_message],
+                    "all_messages": [updated_message],
                 }
                 next_node = self.routes.get("update", "run_tool")
                 return Command(goto=next_node, update=return_state)
@@ -168,9 +165,9 @@ class HumanNode:
                 result = HumanMessage(content=review_data, name="user", id=str(uuid4()))
                 next_node = self.routes.get("review", "call_llm")
                 return_state: ReturnWorkflowTeamState = {
-                    "history": self.history + [result],
+                    "history": [result],
                     "messages": [result],
-                    "all_messages": self.all_messages + [result],
+                    "all_messages": [result],
                 }
                 return Command(goto=next_node, update=return_state)
 
@@ -182,9 +179,9 @@ class HumanNode:
             result = HumanMessage(content=review_data, name="user", id=str(uuid4()))
             next_node = self.routes.get("continue", "call_llm")
             return_state: ReturnWorkflowTeamState = {
-                "history": self.history + [result],
+                "history": [result],
                 "messages": [result],
-                "all_messages": self.all_messages + [result],
+                "all_messages": [result],
             }
             return Command(goto=next_node, update=return_state)
         else:
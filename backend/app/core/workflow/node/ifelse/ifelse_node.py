@@ -6,7 +6,6 @@ from ....state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 
 
@@ -95,9 +94,8 @@ class IfElseNode:
         # 更新节点输出
 
         new_output = {self.node_id: {"result": result_case_id}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
 
         return_state: ReturnWorkflowTeamState = {
-            "node_outputs": state["node_outputs"],
+            "node_outputs": new_output,
         }
         return return_state
@@ -6,13 +6,13 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableConfig, RunnableSerializable
 from langchain_core.tools import BaseTool
 
+from app.core.history import HistoryConfig, aformat_history
 from app.core.model_providers.model_provider_manager import model_provider_manager
 from app.core.state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
-    format_messages,
     parse_variables,
-    update_node_outputs,
+    unseen_messages,
 )
 from app.core.workflow.utils.db_utils import get_model_info
 
@@ -26,10 +26,12 @@ class LLMBaseNode:
         temperature: float,
         system_prompt: str,
         agent_name: str,
+        history: HistoryConfig | None = None,
     ):
         self.node_id = node_id
         self.system_prompt = system_prompt
         self.agent_name = agent_name
+        self.history = history or HistoryConfig()
         self.model_info = get_model_info(model_name)
         try:
             self.model = model_provider_manager.init_model(
@@ -39,6 +41,8 @@ class LLMBaseNode:
                 api_key=self.model_info["api_key"],
                 base_url=self.model_info["base_url"],
             )
+            # 绑定工具前的模型, 用于生成历史摘要
+            self.history_model = self.model
 
             if len(tools) >= 1 and hasattr(self.model, "bind_tools"):
                 self.model = self.model.bind_tools(tools)
@@ -109,7 +113,11 @@ class LLMNode(LLMBaseNode):
         history = state.get("history", [])
         messages = state.get("messages", [])
         all_messages = state.get("all_messages", [])
-        prompt = llm_node_prompts.partial(history_string=format_messages(history))
+        prompt = llm_node_prompts.partial(
+            history_string=await aformat_history(
+                history, self.history, self.history_model
+            )
+        )
         chain: RunnableSerializable[dict[str, Any], AnyMessage] = prompt | self.model
 
         # 检查消息是否包含图片
@@ -136,12 +144,12 @@ class LLMNode(LLMBaseNode):
 
         # 更新 node_outputs
         new_output = {self.node_id: {"response": result.content}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
 
         return_state: ReturnWorkflowTeamState = {
-            "history": history + [result],
+            "history": [result],
             "messages": [result] if result.tool_calls else [],
-            "all_messages": messages + [result],
-            "node_outputs": state["node_outputs"],
+            # 只追加工具循环中新产生的消息和本次回复
+            "all_messages": unseen_messages(all_messages, messages + [result]),
+            "node_outputs": new_output,
         }
         return return_state
\ No newline at end of file
@@ -2,7 +2,6 @@ from pathlib import Path
 from typing import Any, Dict, Optional
 
 from langchain_core.runnables import RunnableConfig
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
 
 from app.core.model_providers.model_provider_manager import model_provider_manager
@@ -10,10 +9,11 @@ from app.core.state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 from app.core.workflow.utils.db_utils import get_model_info
 
+from .session_pool import get_mcp_session_pool
+
 
 class MCPConfigValidator:
     """MCP配置验证器"""
@@ -125,6 +125,18 @@ class MCPBaseNode:
         except ValueError:
             raise ValueError(f"Model {model_name} is not supported as a chat model.")
 
+        self._agent = None
+        self._agent_tools: list = []
+
+    def _get_agent(self, tools: list):
+        # 连接未重建时工具对象不变, 复用已创建的 agent
+        if self._agent is None or len(tools) != len(self._agent_tools) or any(
+            a is not b for a, b in zip(tools, self._agent_tools)
+        ):
+            self._agent = create_react_agent(self.model, tools)
+            self._agent_tools = tools
+        return self._agent
+
 
 class MCPNode(MCPBaseNode):
     """Perform MCP Node actions with multiple servers"""
@@ -135,17 +147,14 @@ class MCPNode(MCPBaseNode):
         if "node_outputs" not in state:
             state["node_outputs"] = {}
 
-        history = state.get("history", [])
         messages = state.get("messages", [])
-        state.get("all_messages", [])
 
         input_text = (
             parse_variables(self.input, state["node_outputs"]) if self.input else None
         )
-        # 使用MultiServerMCPClient处理多个MCP服务
-        async with MultiServerMCPClient(self.mcp_config) as client:
-            # 创建agent并获取工具
-            agent = create_react_agent(self.model, client.get_tools())
+        # 复用连接池中的 MCP 连接及其工具列表
+        async with get_mcp_session_pool().tools(self.mcp_config) as tools:
+            agent = self._get_agent(tools)
 
             # 处理用户输入
 
@@ -153,15 +162,12 @@ class MCPNode(MCPBaseNode):
 
             # 更新node_outputs
             new_output = {self.node_id: {"response": result["messages"][-1].content}}
-            state["node_outputs"] = update_node_outputs(
-                state["node_outputs"], new_output
-            )
 
             return_state: ReturnWorkflowTeamState = {
-                "history": history + result["messages"],
+                "history": result["messages"],
                 "messages": result["messages"],
                 "all_messages": messages + result["messages"],
-                "node_outputs": state["node_outputs"],
+                "node_outputs": new_output,
             }
 
             return return_state
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import time
+import weakref
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from typing import Any
+
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from tenacity import (
+    before_sleep_log,
+    retry,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def server_key(server_name: str, server_config: dict[str, Any]) -> str:
+    return json.dumps([server_name, server_config], sort_keys=True, default=str)
+
+
+class MCPConnection:
+    """
+    A long-lived connection to one MCP server and the tools it exposes.
+
+    The stdio/sse transports are anyio task groups that must be entered and
+    exited by the same task, so each connection is owned by a background task
+    that keeps the client open until `close()`. Other tasks only call tools
+    through its session.
+    """
+
+    def __init__(self, server_name: str, server_config: dict[str, Any]) -> None:
+        self.server_name = server_name
+        self.server_config = server_config
+        self.client: MultiServerMCPClient | None = None
+        self.tools: list[BaseTool] = []
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.checked_at = time.monotonic()
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self) -> None:
+        try:
+            async with MultiServerMCPClient(
+                {self.server_name: self.server_config}
+            ) as client:
+                self.client = client
+                # 工具列表只在建立连接时获取一次
+                self.tools = client.get_tools()
+                self._ready.set()
+                await self._stop.wait()
+        except BaseException as e:
+            self._error = e
+            if not self._ready.is_set():
+                return
+            logger.warning(f"MCP server {self.server_name} disconnected: {e}")
+        finally:
+            self._ready.set()
+
+    async def open(self) -> None:
+        self._task = asyncio.create_task(
+            self._run(), name=f"mcp-connection-{self.server_name}"
+        )
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        logger.info(
+            f"Connected to MCP server {self.server_name} with {len(self.tools)} tools"
+        )
+
+    async def ping(self) -> bool:
+        if not self.alive or self.client is None:
+            return False
+        try:
+            for session in self.client.sessions.values():
+                await asyncio.wait_for(
+                    session.send_ping(), timeout=settings.MCP_HEALTH_CHECK_TIMEOUT
+                )
+        except Exception as e:
+            logger.warning(f"Health check of MCP server {self.server_name} failed: {e}")
+            return False
+        self.checked_at = time.monotonic()
+        return True
+
+    async def close(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            with suppress(BaseException):
+                await self._task
+
+
+connect_retry = retry(
+    stop=stop_after_attempt(settings.MCP_CONNECT_RETRIES),
+    wait=wait_random_exponential(multiplier=0.5, max=10),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True,
+)
+
+
+class MCPSessionPool:
+    """
+    Connections to MCP servers shared by every mcpTool node and the tools route.
+
+    Connections are keyed by server name and config. They are health-checked
+    with a ping at most every MCP_HEALTH_CHECK_INTERVAL seconds before reuse,
+    reconnected with exponential backoff, and closed after MCP_IDLE_TIMEOUT
+    seconds without use.
+    """
+
+    def __init__(self) -> None:
+        self._connections: dict[str, MCPConnection] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._reaper: asyncio.Task | None = None
+
+    @connect_retry
+    async def _connect(
+        self, server_name: str, server_config: dict[str, Any]
+    ) -> MCPConnection:
+        connection = MCPConnection(server_name, server_config)
+        await connection.open()
+        return connection
+
+    async def _get_connection(
+        self, server_name: str, server_config: dict[str, Any]
+    ) -> MCPConnection:
+        key = server_key(server_name, server_config)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            connection = self._connections.get(key)
+            if connection is not None:
+                stale = (
+                    time.monotonic() - connection.checked_at
+                    >= settings.MCP_HEALTH_CHECK_INTERVAL
+                )
+                if connection.alive and (not stale or await connection.ping()):
+                    return connection
+                logger.info(f"Reconnecting to MCP server {server_name}")
+                self._connections.pop(key, None)
+                await connection.close()
+            connection = await self._connect(server_name, server_config)
+            self._connections[key] = connection
+            self._ensure_reaper()
+            return connection
+
+    @asynccontextmanager
+    async def tools(self, mcp_config: dict[str, Any]) -> AsyncIterator[list[BaseTool]]:
+        """Yield the tools of every server in `mcp_config`, connecting if needed."""
+        connections = [
+            await self._get_connection(server_name, server_config)
+            for server_name, server_config in mcp_config.items()
+        ]
+        for connection in connections:
+            connection.in_use += 1
+        try:
+            yield [tool for connection in connections for tool in connection.tools]
+        finally:
+            now = time.monotonic()
+            for connection in connections:
+                connection.in_use -= 1
+                connection.last_used = now
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap(), name="mcp-session-reaper")
+
+    async def _reap(self) -> None:
+        while self._connections:
+            await asyncio.sleep(max(settings.MCP_IDLE_TIMEOUT / 2, 1))
+            now = time.monotonic()
+            for key, connection in list(self._connections.items()):
+                idle = now - connection.last_used >= settings.MCP_IDLE_TIMEOUT
+                if connection.in_use == 0 and (idle or not connection.alive):
+                    logger.info(f"Closing idle MCP server {connection.server_name}")
+                    self._connections.pop(key, None)
+                    await connection.close()
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+        connections = list(self._connections.values())
+        self._connections.clear()
+        self._locks.clear()
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+
+# MCP 连接和 asyncio 原语绑定事件循环, 每个循环一个连接池
+_pools: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MCPSessionPool] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_mcp_session_pool() -> MCPSessionPool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = MCPSessionPool()
+    return pool
@@ -9,7 +9,6 @@ from ...state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 
 PARAMETER_EXTRACTOR_SYSTEM_PROMPT = """You are a helpful assistant tasked with extracting structured information based on specific criteria provided. Follow the guidelines below to ensure consistency and accuracy.
@@ -93,6 +92,14 @@ class ParameterExtractorNode:
         self.parameter_schema = self._convert_schema_format(parameter_schema)
         self.input = input
         self.model_info = get_model_info(model_name)
+        # Initialize LLM with provider info
+        self.llm = model_provider_manager.init_model(
+            provider_name=self.model_info["provider_name"],
+            model=self.model_info["ai_model_name"],
+            temperature=0.1,
+            api_key=self.model_info["api_key"],
+            base_url=self.model_info["base_url"],
+        )
         self.instruction = instruction
 
     def _convert_schema_format(self, schema_list: list[dict]) -> dict:
@@ -137,15 +144,6 @@ class ParameterExtractorNode:
         if not input_text and state.get("all_messages"):
             input_text = state["all_messages"][-1].content
 
-        # Initialize LLM with provider info
-        llm = model_provider_manager.init_model(
-            provider_name=self.model_info["provider_name"],
-            model=self.model_info["ai_model_name"],
-            temperature=0.1,
-            api_key=self.model_info["api_key"],
-            base_url=self.model_info["base_url"],
-        )
-
         # Prepare input in JSON format
         input_json = {
             "input_text": input_text,
@@ -162,16 +160,15 @@ class ParameterExtractorNode:
             ]
         )
         outputparser = JsonOutputParser()
-        chain = prompt | llm | outputparser
+        chain = prompt | self.llm | outputparser
 
         result = await chain.ainvoke(input_json)
 
         # Update node outputs
         new_output = {self.node_id: {"parameters": result}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
 
         return_state: ReturnWorkflowTeamState = {
-            "node_outputs": state["node_outputs"],
+            "node_outputs": new_output,
         }
 
         return return_state
@@ -7,9 +7,9 @@ from app.core.state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
 from app.core.tools.tool_invoker import ToolInvokeResponse, ToolMessages, invoke_tool
+from app.core.workflow.utils.offload import node_offloader
 
 
 def convert_str_to_dict(s: str) -> dict:
@@ -40,7 +40,9 @@ class PluginNode:
         if self.args:
             parsed_tool_args = parse_variables(self.args, state["node_outputs"])
             parsed_tool_args_dict = convert_str_to_dict(parsed_tool_args)
-            tool_result = invoke_tool(self.tool_name, parsed_tool_args_dict)
+            tool_result = await node_offloader.run(
+                "plugin", invoke_tool, self.tool_name, parsed_tool_args_dict
+            )
         else:
             tool_result = ToolInvokeResponse(
                 messages=[
@@ -52,10 +54,9 @@ class PluginNode:
             )
 
         new_output = {self.node_id: {"response": tool_result.messages[0].content}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
 
         return_state: ReturnWorkflowTeamState = {
-            "node_outputs": state["node_outputs"],
+            "node_outputs": new_output,
         }
 
         return return_state
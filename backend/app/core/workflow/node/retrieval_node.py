@@ -1,7 +1,7 @@
 import logging
 import uuid
 
-from app.core.rag.qdrant import QdrantStore
+from app.core.rag.registry import get_vector_store
 from app.core.tools.retriever_tool import create_retriever_tool_custom_modified
 
 logging.basicConfig(level=logging.INFO)
@@ -15,17 +15,25 @@ from app.core.state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
+from app.core.workflow.utils.offload import node_offloader
 
 
 class RetrievalNode:
-    def __init__(self, node_id: str, query: str, user_id: int, kb_id: int):
+    def __init__(
+        self,
+        node_id: str,
+        query: str,
+        user_id: int,
+        kb_id: int,
+        search_options: dict | None = None,
+    ):
         self.node_id = node_id
         self.query = query
-        self.qdrant_store = QdrantStore()
+        self.qdrant_store = get_vector_store()
         self.user_id = user_id
         self.kb_id = kb_id
+        self.search_options = search_options or {}
 
     async def work(
         self, state: WorkflowTeamState, config: RunnableConfig
@@ -36,7 +44,9 @@ class RetrievalNode:
 
         if self.query:
             parsed_input_schema = parse_variables(self.query, state["node_outputs"])
-            retrieval_result = self._retrieval_work(parsed_input_schema)
+            retrieval_result = await node_offloader.run(
+                "retrieval", self._retrieval_work, parsed_input_schema
+            )
             result = ToolMessage(
                 content=retrieval_result,
                 # name="KnowledgeBase",
@@ -51,18 +61,19 @@ class RetrievalNode:
 
         # 更新 node_outputs
         new_output = {self.node_id: {"response": result.content}}
-        state["node_outputs"] = update_node_outputs(state["node_outputs"], new_output)
         return_state: ReturnWorkflowTeamState = {
-            "history": state.get("history", []) + [result],
+            "history": [result],
             "messages": [result],
-            "all_messages": state.get("all_messages", []) + [result],
-            "node_outputs": state["node_outputs"],
+            "all_messages": [result],
+            "node_outputs": new_output,
         }
         return return_state
 
     def _retrieval_work(self, qry):
 
-        retriever = self.qdrant_store.retriever(self.user_id, self.kb_id)
+        retriever = self.qdrant_store.retriever(
+            self.user_id, self.kb_id, **self.search_options
+        )
 
         retriever_tool = create_retriever_tool_custom_modified(retriever)
 
@@ -7,9 +7,8 @@ from app.core.state import (
     ReturnWorkflowTeamState,
     WorkflowTeamState,
     parse_variables,
-    update_node_outputs,
 )
-from app.core.workflow.utils.db_utils import get_subgraph_by_id
+from app.core.workflow.subgraph_cache import subgraph_cache
 
 
 class SubgraphNode:
@@ -23,20 +22,8 @@ class SubgraphNode:
     ):
         self.node_id = node_id
         self.input = input
-        # 初始化时编译子图
-        self.subgraph_config, self.subgraph_name = get_subgraph_by_id(subgraph_id)
-        self.subgraph = self._build_subgraph()
-
-    def _build_subgraph(self):
-        """Build and compile subgraph"""
-        from app.core.workflow.build_workflow import initialize_graph
-
-        # 使用主图的初始化函数来构建子图
-        return initialize_graph(
-            self.subgraph_config,
-            checkpointer=None,  # 子图不需要checkpointer
-            save_graph_img=False,
-        )
+        # 子图在首次执行时才加载并编译, 编译结果跨请求共享
+        self.subgraph_id = subgraph_id
 
     async def work(
         self, state: WorkflowTeamState, config: RunnableConfig
@@ -55,6 +42,8 @@ class SubgraphNode:
         if input_text:
 
             try:
+                subgraph, subgraph_name = await subgraph_cache.aget(self.subgraph_id)
+
                 # 执行子图
                 input_state = {
                     "all_messages": [HumanMessage(content=input_text, name="user")],
@@ -62,20 +51,17 @@ class SubgraphNode:
                     "history": [HumanMessage(content=input_text, name="user")],
                     "node_outputs": state["node_outputs"],
                 }
-                result = await self.subgraph.ainvoke(input_state)
+                result = await subgraph.ainvoke(input_state)
                 subgraph_output = result["all_messages"][-1]
                 subgraph_result = ToolMessage(
                     content=subgraph_output.content,
-                    name=self.subgraph_name,
+                    name=subgraph_name,
                     tool_call_id=str(uuid.uuid4()),
                 )
                 new_output = {self.node_id: {"response": subgraph_result.content}}
-                state["node_outputs"] = update_node_outputs(
-                    state["node_outputs"], new_output
-                )
 
                 return_state: ReturnWorkflowTeamState = {
-                    "node_outputs": state["node_outputs"],
+                    "node_outputs": new_output,
                 }
                 return return_state
 
@@ -83,11 +69,6 @@ class SubgraphNode:
                 # 处理子图执行错误
                 error_message = f"Subgraph execution failed: {str(e)}"
                 print(f"Error in subgraph {self.node_id}: {error_message}")
-
-                new_output = {self.node_id: {"response": error_message}}
-                state["node_outputs"] = update_node_outputs(
-                    state["node_outputs"], new_output
-                )
                 raise
         else:
             raise ValueError("No input provided for subgraph node")
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from langgraph.graph.graph import CompiledGraph
+
+from app.core.config import settings
+from app.core.workflow.utils.db_utils import get_subgraph_by_id
+
+logger = logging.getLogger(__name__)
+
+SubgraphKey = tuple[int, str]
+
+
+@dataclass
+class _SubgraphConfig:
+    config: dict[str, Any]
+    name: str
+    version: str
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+def config_version(config: dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def referenced_subgraph_ids(config: dict[str, Any]) -> list[int]:
+    return [
+        node["data"]["subgraphId"]
+        for node in config.get("nodes", [])
+        if node.get("type") == "subgraph"
+    ]
+
+
+class SubgraphCache:
+    """
+    Process-wide cache of subgraph configs and their compiled graphs.
+
+    Subgraph nodes compile their subgraph on first execution only, and every
+    node and request using the same (subgraph id, config version) shares one
+    compiled graph. Configs are re-read after SUBGRAPH_CACHE_TTL seconds, or
+    right away after `invalidate()` from the subgraphs routes.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._configs: dict[int, _SubgraphConfig] = {}
+        self._compiled: OrderedDict[SubgraphKey, CompiledGraph] = OrderedDict()
+        self._build_locks: dict[SubgraphKey, threading.Lock] = {}
+
+    def _fresh_config(self, subgraph_id: int) -> _SubgraphConfig | None:
+        entry = self._configs.get(subgraph_id)
+        if (
+            entry is not None
+            and time.monotonic() - entry.checked_at < settings.SUBGRAPH_CACHE_TTL
+        ):
+            return entry
+        return None
+
+    def get_config(self, subgraph_id: int) -> _SubgraphConfig:
+        with self._lock:
+            entry = self._fresh_config(subgraph_id)
+        if entry is not None:
+            return entry
+        config, name = get_subgraph_by_id(subgraph_id)
+        entry = _SubgraphConfig(config, name, config_version(config))
+        with self._lock:
+            self._configs[subgraph_id] = entry
+        return entry
+
+    def check_cycles(self, config: dict[str, Any]) -> None:
+        """Raise ValueError if `config` (transitively) embeds a subgraph in itself."""
+        acyclic: set[int] = set()
+
+        def visit(subgraph_id: int, path: list[int]) -> None:
+            if subgraph_id in path:
+                cycle = " -> ".join(map(str, path[path.index(subgraph_id) :]))
+                raise ValueError(f"Subgraph cycle detected: {cycle} -> {subgraph_id}")
+            if subgraph_id in acyclic:
+                return
+            path.append(subgraph_id)
+            for child_id in referenced_subgraph_ids(self.get_config(subgraph_id).config):
+                visit(child_id, path)
+            path.pop()
+            acyclic.add(subgraph_id)
+
+        for subgraph_id in referenced_subgraph_ids(config):
+            visit(subgraph_id, [])
+
+    def nodes(self, config: dict[str, Any]) -> list[dict[str, Any]]:
+        """The nodes of `config` and of every subgraph it (transitively) embeds."""
+        nodes = list(config.get("nodes", []))
+        seen: set[int] = set()
+        pending = referenced_subgraph_ids(config)
+        while pending:
+            subgraph_id = pending.pop()
+            if subgraph_id in seen:
+                continue
+            seen.add(subgraph_id)
+            subgraph_config = self.get_config(subgraph_id).config
+            nodes.extend(subgraph_config.get("nodes", []))
+            pending.extend(referenced_subgraph_ids(subgraph_config))
+        return nodes
+
+    async def anodes(self, config: dict[str, Any]) -> list[dict[str, Any]]:
+        """Like `nodes`, but loads subgraph configs off the event loop."""
+        if not referenced_subgraph_ids(config):
+            return list(config.get("nodes", []))
+        return await asyncio.to_thread(self.nodes, config)
+
+    def _lookup(self, subgraph_id: int) -> tuple[CompiledGraph, str] | None:
+        with self._lock:
+            entry = self._fresh_config(subgraph_id)
+            if entry is None:
+                return None
+            key = (subgraph_id, entry.version)
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                return None
+            self._compiled.move_to_end(key)
+            return compiled, entry.name
+
+    def get(self, subgraph_id: int) -> tuple[CompiledGraph, str]:
+        """Return the compiled subgraph and its name, compiling it if needed."""
+        cached = self._lookup(subgraph_id)
+        if cached is not None:
+            return cached
+
+        from app.core.workflow.build_workflow import initialize_graph
+
+        entry = self.get_config(subgraph_id)
+        key = (subgraph_id, entry.version)
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                compiled = self._compiled.get(key)
+            if compiled is None:
+                logger.debug(f"Compiling subgraph {subgraph_id} ({entry.name})")
+                compiled = initialize_graph(entry.config, save_graph_img=False)
+                with self._lock:
+                    # 同一子图只保留最新版本
+                    for stale_key in [k for k in self._compiled if k[0] == subgraph_id]:
+                        del self._compiled[stale_key]
+                    self._compiled[key] = compiled
+                    while len(self._compiled) > self.maxsize:
+                        self._compiled.popitem(last=False)
+                    self._build_locks.pop(key, None)
+        return compiled, entry.name
+
+    async def aget(self, subgraph_id: int) -> tuple[CompiledGraph, str]:
+        """Like `get`, but loads and compiles off the event loop."""
+        cached = self._lookup(subgraph_id)
+        if cached is not None:
+            return cached
+        return await asyncio.to_thread(self.get, subgraph_id)
+
+    def invalidate(self, subgraph_id: int | None = None) -> None:
+        """Drop one subgraph, or every subgraph when no id is given."""
+        with self._lock:
+            if subgraph_id is None:
+                self._configs.clear()
+                self._compiled.clear()
+                return
+            self._configs.pop(subgraph_id, None)
+            for key in [k for k in self._compiled if k[0] == subgraph_id]:
+                del self._compiled[key]
+
+
+subgraph_cache = SubgraphCache(maxsize=settings.GRAPH_CACHE_SIZE)
@@ -2,10 +2,10 @@ from collections.abc import Callable
 from contextlib import contextmanager
 from typing import Any, TypeVar
 
-from sqlmodel import Session, select
+from sqlmodel import Session
 
 from app.core.database import get_session
-from app.models import ModelProvider, Models, Subgraph
+from app.models import Subgraph
 
 T = TypeVar("T")
 
@@ -46,21 +46,9 @@ def get_model_info(model_name: str) -> dict[str, str]:
     """
     Get model information from all available models.
     """
-    with get_db_session() as session:
-        # 直接从数据库查询 Models 和关联的 ModelProvider
-        model = session.exec(
-            select(Models).join(ModelProvider).where(Models.ai_model_name == model_name)
-        ).first()
-
-        if not model:
-            raise ValueError(f"Model {model_name} not supported now.")
-
-        return {
-            "ai_model_name": model.ai_model_name,
-            "provider_name": model.provider.provider_name,
-            "base_url": model.provider.base_url,
-            "api_key": model.provider.decrypted_api_key,  # 现在可以使用decrypted_api_key
-        }
+    from app.core.workflow.utils.model_registry import model_registry
+
+    return model_registry.get(model_name)
 
 
 def get_subgraph_by_id(subgraph_id: int) -> dict[str, Any]:
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Iterable
+
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+
+from app.core.config import settings
+from app.core.workflow.utils.db_utils import db_operation
+from app.models import Models
+
+logger = logging.getLogger(__name__)
+
+ModelInfo = dict[str, str]
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of model credentials, keyed by ai_model_name.
+
+    All models are loaded with their providers in one query and every API key is
+    decrypted once. The cache is reloaded after MODEL_REGISTRY_TTL seconds, on a
+    miss, and after `invalidate()` (called by the provider and model routes of
+    this process; other processes pick changes up through the TTL).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: dict[str, ModelInfo] = {}
+        self._loaded_at: float | None = None
+        self._generation = 0
+
+    def _expired(self) -> bool:
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at >= settings.MODEL_REGISTRY_TTL
+        )
+
+    @staticmethod
+    def _load_all() -> dict[str, ModelInfo]:
+        def _get(session):
+            models = session.exec(
+                select(Models).options(selectinload(Models.provider))
+            ).all()
+            api_keys: dict[int, str | None] = {}
+            infos = {}
+            for model in models:
+                provider = model.provider
+                if provider is None:
+                    continue
+                if provider.id not in api_keys:
+                    api_keys[provider.id] = provider.decrypted_api_key
+                infos[model.ai_model_name] = {
+                    "ai_model_name": model.ai_model_name,
+                    "provider_name": provider.provider_name,
+                    "base_url": provider.base_url,
+                    "api_key": api_keys[provider.id],
+                }
+            return infos
+
+        return db_operation(_get)
+
+    def _reload(self) -> dict[str, ModelInfo]:
+        with self._lock:
+            generation = self._generation
+        models = self._load_all()
+        with self._lock:
+            # 加载期间发生了 invalidate(), 数据可能已过期, 不写入缓存
+            if generation == self._generation:
+                self._models = models
+                self._loaded_at = time.monotonic()
+        logger.debug(f"Loaded {len(models)} models into the model registry")
+        return models
+
+    def _lookup(self, model_names: Iterable[str]) -> dict[str, ModelInfo] | None:
+        with self._lock:
+            if self._expired():
+                return None
+            try:
+                return {name: self._models[name] for name in model_names}
+            except KeyError:
+                return None
+
+    def resolve(self, model_names: Iterable[str]) -> dict[str, ModelInfo]:
+        """Resolve several models at once, with at most one database round-trip."""
+        model_names = set(model_names)
+        resolved = self._lookup(model_names)
+        if resolved is not None:
+            return resolved
+
+        models = self._reload()
+        missing = model_names - models.keys()
+        if missing:
+            raise ValueError(f"Model {', '.join(sorted(missing))} not supported now.")
+        return {name: models[name] for name in model_names}
+
+    async def aresolve(self, model_names: Iterable[str]) -> dict[str, ModelInfo]:
+        """Like `resolve`, but loads from the database off the event loop."""
+        model_names = set(model_names)
+        resolved = self._lookup(model_names)
+        if resolved is not None:
+            return resolved
+        return await asyncio.to_thread(self.resolve, model_names)
+
+    def get(self, model_name: str) -> ModelInfo:
+        return self.resolve([model_name])[model_name]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._models = {}
+            self._loaded_at = None
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _NodeTypeStats:
+    def __init__(self) -> None:
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+
+class NodeOffloader:
+    """
+    Runs blocking node work (crews, plugins, retrieval, code) on a bounded thread
+    pool instead of the event loop.
+
+    Each node type may only occupy OFFLOAD_NODE_LIMITS[type] threads at once
+    (OFFLOAD_DEFAULT_LIMIT otherwise); further calls wait on the event loop
+    without holding a thread, so a heavy workflow cannot take every worker
+    away from interactive chats.
+    """
+
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.OFFLOAD_MAX_WORKERS, thread_name_prefix="node-offload"
+        )
+        self._lock = threading.Lock()
+        self._stats: dict[str, _NodeTypeStats] = {}
+        # asyncio.Semaphore 绑定事件循环, 每个循环各自一组
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]
+        ] = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def limit(node_type: str) -> int:
+        return settings.OFFLOAD_NODE_LIMITS.get(
+            node_type, settings.OFFLOAD_DEFAULT_LIMIT
+        )
+
+    def _semaphore(self, node_type: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            if node_type not in semaphores:
+                semaphores[node_type] = asyncio.Semaphore(self.limit(node_type))
+            return semaphores[node_type]
+
+    def _node_stats(self, node_type: str) -> _NodeTypeStats:
+        with self._lock:
+            return self._stats.setdefault(node_type, _NodeTypeStats())
+
+    async def run(
+        self, node_type: str, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run `func(*args, **kwargs)` in the pool under the limit of `node_type`."""
+        loop = asyncio.get_running_loop()
+        stats = self._node_stats(node_type)
+        semaphore = self._semaphore(node_type)
+        queued_at = time.perf_counter()
+        stats.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.waiting -= 1
+        started_at = time.perf_counter()
+        stats.wait_seconds += started_at - queued_at
+        stats.running += 1
+
+        def _finish(failed: bool, run_seconds: float) -> None:
+            stats.running -= 1
+            stats.run_seconds += run_seconds
+            if failed:
+                stats.failed += 1
+            else:
+                stats.completed += 1
+            semaphore.release()
+
+        def _done(future) -> None:
+            # 线程真正结束后才归还名额, 调用方被取消时也不会超出并发上限
+            failed = future.cancelled() or future.exception() is not None
+            run_seconds = time.perf_counter() - started_at
+            try:
+                loop.call_soon_threadsafe(_finish, failed, run_seconds)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+        # 保留 contextvars (如 langchain 回调配置) 到工作线程
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, func, *args, **kwargs)
+        future.add_done_callback(_done)
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Queue depth and throughput per node type since the process started."""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            "max_workers": settings.OFFLOAD_MAX_WORKERS,
+            "running": sum(s.running for s in stats.values()),
+            "waiting": sum(s.waiting for s in stats.values()),
+            "node_types": {
+                node_type: {
+                    "limit": self.limit(node_type),
+                    "running": s.running,
+                    "waiting": s.waiting,
+                    "completed": s.completed,
+                    "failed": s.failed,
+                    "avg_wait_ms": (
+                        s.wait_seconds * 1000 / (s.completed + s.failed)
+                        if s.completed + s.failed
+                        else 0.0
+                    ),
+                    "avg_run_ms": (
+                        s.run_seconds * 1000 / (s.completed + s.failed)
+                        if s.completed + s.failed
+                        else 0.0
+                    ),
+                }
+                for node_type, s in stats.items()
+            },
+        }
+
+
+node_offloader = NodeOffloader()
@@ -3,7 +3,7 @@ from functools import cache
 from langchain.tools import BaseTool
 from langchain.tools.retriever import create_retriever_tool
 
-from app.core.rag.qdrant import QdrantStore
+from app.core.rag.registry import get_vector_store
 from app.core.tools import managed_tools
 
 
@@ -15,7 +15,24 @@ def get_tool(tool_name: str) -> BaseTool:
     raise ValueError(f"Unknown tool: {tool_name}")
 
 
+def get_retrieval_options(data: dict) -> dict:
+    """Search options of a retrieval node or knowledge base tool config.
+
+    `search_type` is "similarity" (default) or "hybrid"; hybrid search also reads
+    `top_k`, `vector_weight`, `fulltext_weight` and `fusion` ("rrf" or "weighted").
+    """
+    options = {
+        key: data[key]
+        for key in ("top_k", "vector_weight", "fulltext_weight", "fusion")
+        if data.get(key) is not None
+    }
+    options["search_type"] = data.get("search_type") or "similarity"
+    return options
+
+
 @cache
-def get_retrieval_tool(tool_name: str, description: str, owner_id: int, kb_id: int):
-    retriever = QdrantStore().retriever(owner_id, kb_id)
+def get_retrieval_tool(
+    tool_name: str, description: str, owner_id: int, kb_id: int, **search_options
+):
+    retriever = get_vector_store().retriever(owner_id, kb_id, **search_options)
     return create_retriever_tool(retriever, name=tool_name, description=description)
@@ -9,6 +9,8 @@ from starlette.middleware.cors import CORSMiddleware
 from app.api.main import api_router
 from app.core.config import settings
 from app.core.db import engine, init_db, init_modelprovider_model_db
+from app.core.graph.checkpoint.pool import checkpoint_pool
+from app.core.workflow.node.mcp.session_pool import get_mcp_session_pool
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -25,8 +27,11 @@ async def lifespan(app: FastAPI):
     with Session(engine) as session:
         init_db(session)
         init_modelprovider_model_db(session)
+    await checkpoint_pool.open()
     yield
     # Shutdown
+    await checkpoint_pool.close()
+    await get_mcp_session_pool().close()
 
 
 app = FastAPI(
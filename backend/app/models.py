@@ -13,7 +13,9 @@ from sqlalchemy import PrimaryKeyConstraint, String, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, Relationship, SQLModel
 
+from app.core.config import settings
 from app.core.graph.messages import ChatResponse
+from app.core.history import HistoryConfig
 from app.core.security import security_manager
 
 
@@ -112,6 +114,14 @@ class TeamBase(SQLModel):
     description: str | None = None
     # 增加team的图标
     icon: str | None = None
+    # 对话历史窗口, 如 {"strategy": "token_budget", "max_tokens": 8000}, 为空时使用默认配置
+    history_config: dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+
+    @model_validator(mode="after")
+    def check_history_config(cls: Any, values: Any) -> Any:
+        if values.history_config:
+            HistoryConfig.from_dict(values.history_config)
+        return values
 
 
 class TeamCreate(TeamBase):
@@ -156,14 +166,28 @@ class Interrupt(BaseModel):
     tool_message: str | None = None
 
 
+class StreamOptions(BaseModel):
+    """SSE framing of a chat stream. Consecutive tokens of the same run are
+    merged into one frame for up to `coalesce_ms` or `coalesce_bytes`."""
+
+    coalesce_ms: int = PydanticField(
+        default_factory=lambda: settings.STREAM_COALESCE_MS, ge=0, le=1000
+    )
+    coalesce_bytes: int = PydanticField(
+        default_factory=lambda: settings.STREAM_COALESCE_BYTES, ge=0, le=65536
+    )
+
+
 class TeamChat(BaseModel):
     messages: list[ChatMessage]
     interrupt: Interrupt | None = None
+    stream: StreamOptions | None = None
 
 
 class TeamChatPublic(BaseModel):
     message: ChatMessage | None = None
     interrupt: Interrupt | None = None
+    stream: StreamOptions | None = None
 
     @model_validator(mode="after")
     def check_either_field(cls: Any, values: Any) -> Any:
@@ -536,6 +560,9 @@ class Upload(UploadBase, table=True):
     )
     chunk_size: int
     chunk_overlap: int
+    # 入库进度: 已写入的 chunk 数 / chunk 总数 (未知时为空)
+    processed_chunks: int = Field(default=0)
+    total_chunks: int | None = Field(default=None)
 
 
 class UploadOut(UploadBase):
@@ -548,6 +575,8 @@ class UploadOut(UploadBase):
     web_url: str | None
     chunk_size: int
     chunk_overlap: int
+    processed_chunks: int
+    total_chunks: int | None
 
 
 class UploadsOut(SQLModel):
@@ -555,6 +584,24 @@ class UploadsOut(SQLModel):
     count: int
 
 
+class EmbeddingCache(SQLModel, table=True):
+    """Embeddings shared across uploads, keyed by (embedding model, text hash)."""
+
+    model: str = Field(primary_key=True, max_length=255)
+    content_hash: str = Field(primary_key=True, max_length=64)
+    embedding: list[float] = Field(sa_column=Column(JSONB, nullable=False))
+
+
+class Bm25Chunk(SQLModel, table=True):
+    """Term frequencies of a stored chunk, the persisted form of the BM25 index."""
+
+    id: int | None = Field(default=None, primary_key=True)
+    upload_id: int = Field(index=True)
+    chunk_id: str = Field(index=True, max_length=64)
+    length: int
+    term_freqs: dict[str, int] = Field(sa_column=Column(JSONB, nullable=False))
+
+
 # ==============Models=====================
 
 
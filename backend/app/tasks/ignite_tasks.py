@@ -5,13 +5,26 @@ from sqlmodel import Session
 
 from app.core.celery_app import celery_app
 from app.core.db import engine
-from app.core.rag.mongo_ignite import IgniteStore
-
+from app.core.rag.registry import get_vector_store
+from app.core.rag.search import search_upload_chunks
 from app.models import Upload, UploadStatus
 
 logger = logging.getLogger(__name__)
 
 
+def _progress_recorder(session: Session, upload: Upload):
+    """Record ingestion progress on the upload row after every written batch."""
+
+    def _record(processed: int, total: int | None) -> None:
+        upload.processed_chunks = processed
+        upload.total_chunks = total
+        session.add(upload)
+        session.commit()
+
+    _record(0, None)
+    return _record
+
+
 @celery_app.task
 def add_upload(
     file_path: str, upload_id: int, user_id: int, chunk_size: int, chunk_overlap: int
@@ -21,7 +34,14 @@ def add_upload(
         if not upload:
             raise ValueError("Upload not found")
         try:
-            IgniteStore().add(file_path, upload_id, user_id, chunk_size, chunk_overlap)
+            get_vector_store("ignite").add(
+                file_path,
+                upload_id,
+                user_id,
+                chunk_size,
+                chunk_overlap,
+                progress_callback=_progress_recorder(session, upload),
+            )
             upload.status = UploadStatus.COMPLETED
             session.add(upload)
             session.commit()
@@ -45,10 +65,15 @@ def edit_upload(
         if not upload:
             raise ValueError("Upload not found")
         try:
-            qdrant_store = IgniteStore()
+            qdrant_store = get_vector_store("ignite")
             logger.info("QdrantStore initialized successfully")
             qdrant_store.update(
-                file_path, upload_id, user_id, chunk_size, chunk_overlap
+                file_path,
+                upload_id,
+                user_id,
+                chunk_size,
+                chunk_overlap,
+                progress_callback=_progress_recorder(session, upload),
             )
             upload.status = UploadStatus.COMPLETED
             session.add(upload)
@@ -75,7 +100,7 @@ def remove_upload(upload_id: int, user_id: int) -> None:
             return
 
         try:
-            qdrant_store = IgniteStore()
+            qdrant_store = get_vector_store("ignite")
             deletion_successful = qdrant_store.delete(upload_id, user_id)
 
             if deletion_successful:
@@ -110,23 +135,12 @@ def perform_search(
     top_k: int,
     score_threshold: float,
 ):
-    qdrant_store = IgniteStore()
-    if search_type == "vector":
-        results = qdrant_store.vector_search(
-            user_id, [upload_id], query, top_k, score_threshold
-        )
-    elif search_type == "fulltext":
-        results = qdrant_store.fulltext_search(
-            user_id, [upload_id], query, top_k, score_threshold
-        )
-    elif search_type == "hybrid":
-        results = qdrant_store.hybrid_search(
-            user_id, [upload_id], query, top_k, score_threshold
-        )
-    else:
-        raise ValueError(f"Invalid search type: {search_type}")
-
-    return [
-        {"content": doc.page_content, "score": doc.metadata.get("score", 0)}
-        for doc in results
-    ]
+    return search_upload_chunks(
+        user_id,
+        upload_id,
+        query,
+        search_type,
+        top_k,
+        score_threshold,
+        backend="ignite",
+    )
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from typing import Any
+from uuid import uuid4
+
+from sqlmodel import Session
+
+from app.core.celery_app import celery_app
+from app.core.db import engine
+from app.core.graph.build import generator
+from app.core.graph.messages import ChatResponse
+from app.core.graph.sse import encode_response
+from app.core.graph.stream_runs import stream_runs
+from app.models import ChatMessage, Interrupt, StreamOptions, Team
+
+logger = logging.getLogger(__name__)
+
+# 每个 runner 进程复用同一个事件循环, 检查点连接池和已编译的图随之复用
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+async def _run_team_stream(
+    run_id: str,
+    team_id: int,
+    thread_id: str,
+    messages: list[dict[str, Any]],
+    interrupt: dict[str, Any] | None,
+    stream_options: dict[str, Any] | None,
+) -> None:
+    try:
+        with Session(engine) as session:
+            team = session.get(Team, team_id)
+            if not team:
+                raise ValueError("Team not found")
+            # Populate the skills and accessible uploads for each member
+            members = team.members
+            for member in members:
+                member.skills = member.skills
+                member.uploads = member.uploads
+            graphs = team.graphs
+            for graph in graphs:
+                graph.config = graph.config
+
+        body = generator(
+            team,
+            members,
+            [ChatMessage(**message) for message in messages],
+            thread_id,
+            Interrupt(**interrupt) if interrupt else None,
+            StreamOptions(**stream_options) if stream_options else None,
+        )
+    except Exception as e:
+        logger.error(f"Failed to start stream {run_id} of thread {thread_id}: {e}")
+        # 客户端已在等待这个 run: 发送错误帧, 而不是等到缓冲过期
+        response = ChatResponse(
+            type="error", content=str(e), id=str(uuid4()), name="error"
+        )
+        await stream_runs.buffer.append(run_id, 1, encode_response(response))
+        raise
+    await stream_runs.execute(run_id, thread_id, body)
+
+
+@celery_app.task(ignore_result=True)
+def run_team_stream(
+    run_id: str,
+    team_id: int,
+    thread_id: str,
+    messages: list[dict[str, Any]],
+    interrupt: dict[str, Any] | None = None,
+    stream_options: dict[str, Any] | None = None,
+) -> None:
+    """Execute a chat stream enqueued by the API, publishing its frames to the
+    shared replay buffer the API relays to the client."""
+    logger.info(f"Running stream {run_id} of thread {thread_id}")
+    loop = _event_loop()
+    try:
+        loop.run_until_complete(
+            _run_team_stream(
+                run_id, team_id, thread_id, messages, interrupt, stream_options
+            )
+        )
+    finally:
+        # 无论是否启动成功都标记结束, 订阅者不必等到缓冲过期
+        loop.run_until_complete(stream_runs.buffer.finish(run_id))
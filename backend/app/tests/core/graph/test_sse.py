@@ -0,0 +1,76 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.graph import sse
+from app.core.graph.messages import ChatResponse
+from app.core.graph.sse import SSEEncoder, encode_response
+from app.models import StreamOptions
+
+
+def token(content: str, id: str = "run-1", name: str = "agent") -> ChatResponse:
+    return ChatResponse(type="ai", id=id, name=name, content=content)
+
+
+def payload(frame: bytes) -> dict:
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    return json.loads(frame[len(b"data: ") : -2])
+
+
+def test_encode_response_matches_model_dump() -> None:
+    response = token("hello")
+    assert payload(encode_response(response)) == json.loads(response.model_dump_json())
+
+
+def test_encoder_without_coalescing_sends_every_response() -> None:
+    encoder = SSEEncoder(StreamOptions(coalesce_ms=0, coalesce_bytes=0))
+    frames = encoder.push(token("a")) + encoder.push(token("b"))
+    assert [payload(frame)["content"] for frame in frames] == ["a", "b"]
+    assert encoder.flush() == []
+
+
+def test_encoder_merges_tokens_of_the_same_run() -> None:
+    encoder = SSEEncoder(StreamOptions(coalesce_ms=1000, coalesce_bytes=0))
+    assert encoder.push(token("Hel")) == []
+    assert encoder.push(token("lo")) == []
+    frames = encoder.flush()
+    assert len(frames) == 1
+    assert payload(frames[0]) == token("Hello").model_dump()
+
+
+def test_encoder_flushes_when_the_run_changes() -> None:
+    encoder = SSEEncoder(StreamOptions(coalesce_ms=1000, coalesce_bytes=0))
+    encoder.push(token("a"))
+    frames = encoder.push(token("b", id="run-2"))
+    assert [payload(frame)["content"] for frame in frames] == ["a"]
+    assert payload(encoder.flush()[0])["id"] == "run-2"
+
+
+def test_encoder_flushes_before_an_unmergeable_response() -> None:
+    encoder = SSEEncoder(StreamOptions(coalesce_ms=1000, coalesce_bytes=0))
+    encoder.push(token("a"))
+    tool = ChatResponse(type="tool", id="run-1", name="search", tool_output="done")
+    frames = encoder.push(tool)
+    assert [payload(frame)["type"] for frame in frames] == ["ai", "tool"]
+    assert encoder.flush() == []
+
+
+def test_encoder_flushes_at_the_byte_limit() -> None:
+    encoder = SSEEncoder(StreamOptions(coalesce_ms=0, coalesce_bytes=4))
+    assert encoder.push(token("ab")) == []
+    frames = encoder.push(token("cd"))
+    assert [payload(frame)["content"] for frame in frames] == ["abcd"]
+
+
+def test_encoder_tick_flushes_after_the_interval(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    now = 100.0
+    monkeypatch.setattr(sse, "time", SimpleNamespace(monotonic=lambda: now))
+    encoder = SSEEncoder(StreamOptions(coalesce_ms=50, coalesce_bytes=0))
+    encoder.push(token("a"))
+    assert encoder.tick() == []
+    now = 100.1
+    frames = encoder.push(None)
+    assert [payload(frame)["content"] for frame in frames] == ["a"]
@@ -0,0 +1,67 @@
+from collections import Counter
+
+from app.core.rag.bm25 import Bm25Index, search_indexes, tokenize
+
+
+def index_of(chunks: dict[str, str]) -> Bm25Index:
+    index = Bm25Index((0, 0))
+    for chunk_id, text in chunks.items():
+        terms = list(tokenize(text))
+        index.add(chunk_id, len(terms), dict(Counter(terms)))
+    return index
+
+
+def test_tokenize_words_and_chinese_bigrams() -> None:
+    tokens = list(tokenize("Hello, World 知识库"))
+    assert tokens == ["hello", "world", "知识", "识库"]
+    assert list(tokenize("中 x")) == ["中", "x"]
+
+
+def test_search_ranks_by_bm25() -> None:
+    index = index_of(
+        {
+            "a": "apple pie with apple",
+            "b": "banana split",
+            "c": "apple tart and a long list of other desserts",
+        }
+    )
+    hits = search_indexes([index], "apple", 10)
+    assert [chunk_id for chunk_id, _ in hits] == ["a", "c"]
+    assert hits[0][1] > hits[1][1] > 0
+
+
+def test_search_limits_to_top_k() -> None:
+    index = index_of({str(i): f"apple {i}" for i in range(5)})
+    assert len(search_indexes([index], "apple", 2)) == 2
+
+
+def test_search_without_matches_or_documents() -> None:
+    assert search_indexes([index_of({"a": "apple"})], "cherry", 5) == []
+    assert search_indexes([Bm25Index((0, 0))], "apple", 5) == []
+    assert search_indexes([], "apple", 5) == []
+
+
+def test_search_uses_combined_corpus_statistics() -> None:
+    first = index_of({"a": "apple", "b": "banana"})
+    second = index_of({"c": "cherry", "d": "apple apple"})
+    combined = index_of(
+        {"a": "apple", "b": "banana", "c": "cherry", "d": "apple apple"}
+    )
+    assert search_indexes([first, second], "apple", 5) == search_indexes(
+        [combined], "apple", 5
+    )
+
+
+def test_remove_drops_chunk_from_postings() -> None:
+    index = index_of({"a": "apple pie", "b": "apple"})
+    index.remove("a")
+    assert "pie" not in index.postings
+    assert index.total_length == 1
+    assert [chunk_id for chunk_id, _ in search_indexes([index], "apple", 5)] == ["b"]
+
+
+def test_add_replaces_existing_chunk() -> None:
+    index = index_of({"a": "apple"})
+    index.add("a", 1, {"banana": 1})
+    assert "apple" not in index.postings
+    assert search_indexes([index], "banana", 5)[0][0] == "a"
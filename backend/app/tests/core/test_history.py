@@ -0,0 +1,70 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core import history
+from app.core.history import HistoryConfig, split_history
+
+
+@pytest.fixture(autouse=True)
+def ten_tokens_per_message(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(history, "count_tokens", lambda text: 10)
+
+
+def conversation(count: int) -> list:
+    return [
+        HumanMessage(content=f"q{i}", id=str(i))
+        if i % 2 == 0
+        else AIMessage(content=f"a{i}", id=str(i))
+        for i in range(count)
+    ]
+
+
+def ids(messages: list) -> list[str]:
+    return [message.id for message in messages]
+
+
+def test_split_history_all_keeps_everything() -> None:
+    messages = conversation(5)
+    older, kept = split_history(messages, HistoryConfig(strategy="all"))
+    assert older == []
+    assert ids(kept) == ids(messages)
+
+
+def test_split_history_last_n() -> None:
+    config = HistoryConfig(strategy="last_n", last_n=2)
+    older, kept = split_history(conversation(5), config)
+    assert ids(older) == ["0", "1", "2"]
+    assert ids(kept) == ["3", "4"]
+
+
+def test_split_history_last_n_shorter_than_n() -> None:
+    config = HistoryConfig(strategy="last_n", last_n=5)
+    older, kept = split_history(conversation(2), config)
+    assert older == []
+    assert ids(kept) == ["0", "1"]
+
+
+def test_split_history_token_budget_keeps_newest_messages() -> None:
+    config = HistoryConfig(strategy="token_budget", max_tokens=25)
+    older, kept = split_history(conversation(5), config)
+    assert ids(older) == ["0", "1", "2"]
+    assert ids(kept) == ["3", "4"]
+
+
+def test_split_history_token_budget_keeps_latest_message_over_budget() -> None:
+    config = HistoryConfig(strategy="token_budget", max_tokens=5)
+    older, kept = split_history(conversation(3), config)
+    assert ids(older) == ["0", "1"]
+    assert ids(kept) == ["2"]
+
+
+def test_split_history_token_budget_without_messages() -> None:
+    config = HistoryConfig(strategy="token_budget", max_tokens=5)
+    assert split_history([], config) == ([], [])
+
+
+def test_history_config_from_dict() -> None:
+    config = HistoryConfig.from_dict({"strategy": "last_n", "lastN": 4})
+    assert config.strategy == "last_n"
+    assert config.last_n == 4
+    assert HistoryConfig.from_dict(None) == HistoryConfig()
@@ -0,0 +1,87 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.config import settings
+from app.core.state import add_message_deltas, unseen_messages, update_node_outputs
+
+
+@pytest.fixture
+def strict(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "WORKFLOW_STRICT_STATE_DELTAS", True)
+
+
+@pytest.fixture
+def lenient(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "WORKFLOW_STRICT_STATE_DELTAS", False)
+
+
+def history() -> list:
+    return [HumanMessage(content="hi", id="1"), AIMessage(content="hello", id="2")]
+
+
+def test_add_message_deltas_drops_resent_history(lenient: None) -> None:
+    messages = history()
+    merged = add_message_deltas(messages, messages + [AIMessage(content="bye", id="3")])
+    assert [message.id for message in merged] == ["1", "2", "3"]
+
+
+def test_add_message_deltas_rejects_resent_history_when_strict(strict: None) -> None:
+    messages = history()
+    with pytest.raises(ValueError):
+        add_message_deltas(messages, messages + [AIMessage(content="bye", id="3")])
+
+
+def test_add_message_deltas_appends_delta(strict: None) -> None:
+    delta = [
+        AIMessage(content="a", id="3"),
+        AIMessage(content="b", id="4"),
+        AIMessage(content="c", id="5"),
+    ]
+    merged = add_message_deltas(history(), delta)
+    assert [message.id for message in merged] == ["1", "2", "3", "4", "5"]
+
+
+def test_add_message_deltas_keeps_messages_without_id(strict: None) -> None:
+    delta = [AIMessage(content="a"), AIMessage(content="b"), AIMessage(content="c")]
+    merged = add_message_deltas(history(), delta)
+    assert [message.content for message in merged] == ["hi", "hello", "a", "b", "c"]
+    assert all(message.id is not None for message in merged)
+
+
+def test_add_message_deltas_replaces_message_with_same_id(strict: None) -> None:
+    merged = add_message_deltas(history(), [AIMessage(content="edited", id="2")])
+    assert [message.content for message in merged] == ["hi", "edited"]
+
+
+def test_unseen_messages_returns_only_new_messages() -> None:
+    messages = history()
+    result = AIMessage(content="done", id="3")
+    candidates = [messages[1], result, result, AIMessage(content="no id")]
+    unseen = unseen_messages(messages, candidates)
+    assert [message.content for message in unseen] == ["done", "no id"]
+
+
+def test_update_node_outputs_merges_new_keys(strict: None) -> None:
+    outputs = {"start": {"query": "q"}}
+    merged = update_node_outputs(outputs, {"llm": {"response": "r"}})
+    assert merged == {"start": {"query": "q"}, "llm": {"response": "r"}}
+    assert outputs == {"start": {"query": "q"}}
+
+
+def test_update_node_outputs_without_update(strict: None) -> None:
+    outputs = {"start": {"query": "q"}}
+    assert update_node_outputs(outputs, {}) is outputs
+
+
+def test_update_node_outputs_drops_resent_values(lenient: None) -> None:
+    outputs = {"start": {"query": "q"}, "llm": {"response": "old"}}
+    resent = {**outputs, "llm": {"response": "new"}}
+    merged = update_node_outputs(outputs, resent)
+    assert merged == {"start": {"query": "q"}, "llm": {"response": "new"}}
+    assert merged["start"] is outputs["start"]
+
+
+def test_update_node_outputs_rejects_resent_values_when_strict(strict: None) -> None:
+    outputs = {"start": {"query": "q"}}
+    with pytest.raises(ValueError):
+        update_node_outputs(outputs, {**outputs, "llm": {"response": "r"}})
@@ -0,0 +1,45 @@
+from app.core.variable_template import VariableTemplate, compile_template
+
+NODE_OUTPUTS = {
+    "start": {"query": "天气"},
+    "llm": {"response": 'say "hi" \\ ok', "meta": {"tokens": 3}},
+}
+
+
+def test_render_replaces_variables() -> None:
+    template = VariableTemplate("Q: {start.query}, A: {llm.response}")
+    assert template.render(NODE_OUTPUTS) == 'Q: 天气, A: say "hi" \\ ok'
+
+
+def test_render_nested_path() -> None:
+    assert VariableTemplate("{llm.meta.tokens}").render(NODE_OUTPUTS) == "3"
+
+
+def test_render_keeps_unresolved_variables() -> None:
+    template = VariableTemplate("{start.query} {missing.key} {start.nope}")
+    assert template.render(NODE_OUTPUTS) == "天气 {missing.key} {start.nope}"
+
+
+def test_render_without_variables_returns_text() -> None:
+    text = "no variables here"
+    assert VariableTemplate(text).render(NODE_OUTPUTS) is text
+
+
+def test_render_code_quotes_and_escapes() -> None:
+    template = VariableTemplate("x = {llm.response}")
+    assert template.render(NODE_OUTPUTS, is_code=True) == 'x = "say \\"hi\\" \\\\ ok"'
+
+
+def test_render_code_converts_fullwidth_characters() -> None:
+    template = VariableTemplate("x = {start.query}")
+    outputs = {"start": {"query": "ＡＢＣ（１）＂"}}
+    assert template.render(outputs, is_code=True) == 'x = "ABC(1)\\""'
+
+
+def test_unresolved_lists_variables_of_unknown_nodes() -> None:
+    template = VariableTemplate("{start.query} {gone.output} {plain}")
+    assert template.unresolved(["start"]) == ["{gone.output}"]
+
+
+def test_compile_template_is_cached() -> None:
+    assert compile_template("{start.query}") is compile_template("{start.query}")
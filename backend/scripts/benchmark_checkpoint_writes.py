@@ -0,0 +1,130 @@
+"""
+Measure checkpoint bytes written per workflow step.
+
+Run from the backend directory with the app's environment configured:
+
+    python scripts/benchmark_checkpoint_writes.py --turns 50 --nodes 3
+
+Each turn sends one user message through a chain of nodes that append an
+AI message and their node output, once with nodes returning the full
+`history`/`all_messages`/`node_outputs` (the old contract) and once with
+nodes returning only deltas. Bytes are counted the way the Postgres saver
+stores them: pending writes of every task, plus a blob for each channel
+whose version changed.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.graph import END, START, StateGraph  # noqa: E402
+
+from app.core.state import WorkflowTeamState  # noqa: E402
+from app.core.workflow.node.input_node import InputNode  # noqa: E402
+
+REPLY = "This is a reply of moderate length from a workflow node. " * 4
+
+
+class MeasuringSaver(MemorySaver):
+    def __init__(self) -> None:
+        super().__init__()
+        self.write_bytes = 0
+        self.blob_bytes = 0
+        self.steps = 0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        values = checkpoint["channel_values"]
+        self.blob_bytes += sum(
+            len(self.serde.dumps_typed(values[channel])[1])
+            for channel in new_versions
+            if channel in values
+        )
+        self.steps += 1
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id):
+        self.write_bytes += sum(len(self.serde.dumps_typed(v)[1]) for _, v in writes)
+        return super().put_writes(config, writes, task_id)
+
+
+def make_node(node_id: str, full_state: bool):
+    def work(state: WorkflowTeamState) -> dict[str, Any]:
+        result = AIMessage(content=REPLY, name=node_id, id=str(uuid.uuid4()))
+        new_output = {node_id: {"response": result.content}}
+        if full_state:
+            return {
+                "history": state.get("history", []) + [result],
+                "all_messages": state.get("all_messages", []) + [result],
+                "node_outputs": {**state.get("node_outputs", {}), **new_output},
+            }
+        return {"history": [result], "all_messages": [result], "node_outputs": new_output}
+
+    return work
+
+
+def build(nodes: int, full_state: bool, saver: MeasuringSaver):
+    builder = StateGraph(WorkflowTeamState)
+    builder.add_node("start", InputNode)
+    builder.add_edge(START, "start")
+    previous = "start"
+    for i in range(nodes):
+        node_id = f"llm-{i}"
+        builder.add_node(node_id, make_node(node_id, full_state))
+        builder.add_edge(previous, node_id)
+        previous = node_id
+    builder.add_edge(previous, END)
+    return builder.compile(checkpointer=saver)
+
+
+async def run(turns: int, nodes: int, full_state: bool) -> list[tuple[int, float, float]]:
+    saver = MeasuringSaver()
+    graph = build(nodes, full_state, saver)
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    rows = []
+    for turn in range(1, turns + 1):
+        write_bytes, blob_bytes, steps = saver.write_bytes, saver.blob_bytes, saver.steps
+        message = HumanMessage(content=f"question {turn}", name="user")
+        await graph.ainvoke(
+            {"history": [message], "all_messages": [message], "messages": [message]},
+            config,
+        )
+        step_count = saver.steps - steps
+        rows.append(
+            (
+                turn,
+                (saver.write_bytes - write_bytes) / step_count,
+                (saver.blob_bytes - blob_bytes) / step_count,
+            )
+        )
+    return rows
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--nodes", type=int, default=3)
+    args = parser.parse_args()
+
+    full = await run(args.turns, args.nodes, full_state=True)
+    delta = await run(args.turns, args.nodes, full_state=False)
+    print("bytes per step: pending writes / channel blobs")
+    print(f"{'turn':>6} {'full writes':>12} {'delta writes':>13} {'full blobs':>11} {'delta blobs':>12}")
+    shown = sorted({1, 10, 25, args.turns} & set(range(1, args.turns + 1)))
+    for turn in shown:
+        _, full_writes, full_blobs = full[turn - 1]
+        _, delta_writes, delta_blobs = delta[turn - 1]
+        print(
+            f"{turn:>6} {full_writes:>12.0f} {delta_writes:>13.0f} "
+            f"{full_blobs:>11.0f} {delta_blobs:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,226 @@
+"""
+Compare stream events and CPU per turn with and without event filtering.
+
+Run from the backend directory with the app's environment configured:
+
+    python scripts/benchmark_stream_events.py --turns 20
+
+A hierarchical team (leader, two workers, final answer) and a workflow
+team (start, llm, answer, end) are compiled with a local fake chat model
+that streams word by word, so no database or model provider is used.
+Each turn is streamed with `astream_events` as `generator` does, once
+receiving every event and once with `stream_event_filter`.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections.abc import Iterator
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import (  # noqa: E402
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+)
+from langchain_core.outputs import (  # noqa: E402
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+
+from app.core.graph.build import create_hierarchical_graph  # noqa: E402
+from app.core.graph.graph_cache import bind_checkpointer  # noqa: E402
+from app.core.graph.messages import (  # noqa: E402
+    event_to_response,
+    node_labels,
+    stream_event_filter,
+)
+from app.core.model_providers.model_provider_manager import (  # noqa: E402
+    model_provider_manager,
+)
+from app.core.state import GraphMember, GraphTeam  # noqa: E402
+from app.core.workflow.build_workflow import initialize_graph  # noqa: E402
+from app.core.workflow.utils.model_registry import model_registry  # noqa: E402
+
+REPLY = "Here is a streamed answer from the benchmark model " * 6
+
+
+class BenchChatModel(BaseChatModel):
+    """Streams REPLY word by word, or routes to the first worker once when
+    bound to the leader's route tool."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        return self.bind(tools=tools, **kwargs)
+
+    def _message(self, messages: list[BaseMessage], **kwargs: Any) -> AIMessage:
+        tools = kwargs.get("tools") or []
+        route = next(
+            (t for t in tools if isinstance(t, dict) and t["function"]["name"] == "route"),
+            None,
+        )
+        if route is None:
+            return AIMessage(content=REPLY)
+        options = route["function"]["parameters"]["properties"]["next"]["anyOf"][0]["enum"]
+        answered = any("benchmark model" in str(m.content) for m in messages)
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "route",
+                    "args": {
+                        "next": "FINISH" if answered else options[0],
+                        "task": "Answer the question",
+                    },
+                    "id": str(uuid.uuid4()),
+                }
+            ],
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, **kwargs))])
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._message(messages, **kwargs)
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": str(call["args"]).replace("'", '"'),
+                            "id": call["id"],
+                            "index": 0,
+                        }
+                        for call in message.tool_calls
+                    ],
+                )
+            )
+            return
+        for word in message.content.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+def use_bench_model() -> None:
+    model_info = {
+        "ai_model_name": "bench",
+        "provider_name": "bench",
+        "base_url": "",
+        "api_key": "",
+    }
+    model_registry.get = lambda model_name: model_info  # type: ignore[method-assign]
+    model_provider_manager.init_model = (  # type: ignore[method-assign]
+        lambda **kwargs: BenchChatModel()
+    )
+
+
+def hierarchical_team() -> tuple[Any, dict[str, Any], list[str], None]:
+    members = {
+        name: GraphMember(
+            name=name,
+            role="Researcher",
+            backstory="",
+            tools=[],
+            provider="bench",
+            model="bench",
+            temperature=0,
+        )
+        for name in ("Researcher", "Writer")
+    }
+    team = GraphTeam(
+        name="Leader",
+        role="Leader",
+        backstory="",
+        members=members,
+        provider="bench",
+        model="bench",
+        temperature=0,
+    )
+    graph = create_hierarchical_graph({"Leader": team}, leader_name="Leader")
+    question = [HumanMessage(content="What is a benchmark?", name="user")]
+    state = {
+        "history": question,
+        "messages": [],
+        "team": team,
+        "main_task": question,
+        "all_messages": question,
+    }
+    return graph, state, list(members), None
+
+
+def workflow_team() -> tuple[Any, dict[str, Any], list[str], dict[str, str]]:
+    nodes = [
+        {"id": "start", "type": "start", "data": {"label": "Start"}},
+        {
+            "id": "llm-1",
+            "type": "llm",
+            "data": {"label": "LLM", "model": "bench", "temperature": 0},
+        },
+        {
+            "id": "answer-1",
+            "type": "answer",
+            "data": {"label": "Answer", "answer": "{llm-1.response}"},
+        },
+        {"id": "end", "type": "end", "data": {"label": "End"}},
+    ]
+    edges = [
+        {"id": f"e{i}", "source": a["id"], "target": b["id"], "type": "default"}
+        for i, (a, b) in enumerate(zip(nodes[:-1], nodes[1:]))
+    ]
+    config = {"id": "bench", "name": "bench", "nodes": nodes, "edges": edges, "metadata": {}}
+    graph = initialize_graph(config)
+    question = [HumanMessage(content="What is a benchmark?", name="user")]
+    state = {"history": question, "messages": [], "all_messages": question}
+    return graph, state, [node["id"] for node in nodes], node_labels(nodes)
+
+
+async def stream_turn(graph, state, labels, event_filter) -> tuple[int, int, float]:
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": 25}
+    events = responses = 0
+    started = time.process_time()
+    async for event in graph.astream_events(
+        state, version="v2", config=config, **event_filter
+    ):
+        events += 1
+        if event_to_response(event, labels=labels):
+            responses += 1
+    return events, responses, (time.process_time() - started) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+    use_bench_model()
+
+    print(f"{'team':>13} {'mode':>9} {'events/turn':>12} {'responses':>10} {'cpu ms/turn':>12}")
+    for name, build in (("hierarchical", hierarchical_team), ("workflow", workflow_team)):
+        compiled, state, node_names, labels = build()
+        graph = bind_checkpointer(compiled, MemorySaver())
+        for mode, event_filter in (("all", {}), ("filtered", stream_event_filter(node_names))):
+            await stream_turn(graph, state, labels, event_filter)  # warm up
+            totals = [0, 0, 0.0]
+            for _ in range(args.turns):
+                for i, value in enumerate(await stream_turn(graph, state, labels, event_filter)):
+                    totals[i] += value
+            events, responses, cpu_ms = (total / args.turns for total in totals)
+            print(f"{name:>13} {mode:>9} {events:>12.0f} {responses:>10.0f} {cpu_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+Time workflow graph compilation on synthetic configs.
+
+Run from the backend directory with the app's environment configured:
+
+    python scripts/benchmark_workflow_compile.py --sizes 10 100 1000
+
+Each config is a start node, a chain of answer nodes and an end node, which
+compiles without database or model access.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.workflow.build_workflow import initialize_graph  # noqa: E402
+from app.core.workflow.graph_config import GraphConfigIndex  # noqa: E402
+
+
+def synthetic_config(size: int) -> dict[str, Any]:
+    nodes = [{"id": "start", "type": "start", "data": {}}]
+    nodes += [
+        {"id": f"answer-{i}", "type": "answer", "data": {"answer": f"step {i}"}}
+        for i in range(size)
+    ]
+    nodes.append({"id": "end", "type": "end", "data": {}})
+    edges = [
+        {
+            "id": f"edge-{i}",
+            "source": source["id"],
+            "target": target["id"],
+            "type": "default",
+        }
+        for i, (source, target) in enumerate(zip(nodes[:-1], nodes[1:]))
+    ]
+    return {
+        "id": f"benchmark-{size}",
+        "name": f"benchmark-{size}",
+        "nodes": nodes,
+        "edges": edges,
+        "metadata": {},
+    }
+
+
+def timed(func, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'index ms':>10} {'compile ms':>12}")
+    for size in args.sizes:
+        config = synthetic_config(size)
+        index_ms = timed(lambda: GraphConfigIndex.from_config(config), args.repeat)
+        compile_ms = timed(lambda: initialize_graph(config), args.repeat)
+        print(f"{size:>8} {index_ms:>10.2f} {compile_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
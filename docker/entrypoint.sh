@@ -25,7 +25,12 @@ if [[ "${MODE}" == "worker" ]]; then
         CONCURRENCY_OPTION="-c ${CELERY_WORKER_AMOUNT:-1}"
     fi
 
-    exec poetry run celery -A app.core.celery_app.celery_app worker $CONCURRENCY_OPTION --loglevel ${LOG_LEVEL:-INFO}
+    # e.g. CELERY_QUEUES=graph-runners for a dedicated graph runner
+    if [ -n "${CELERY_QUEUES}" ]; then
+        QUEUE_OPTION="-Q ${CELERY_QUEUES}"
+    fi
+
+    exec poetry run celery -A app.core.celery_app.celery_app worker $CONCURRENCY_OPTION $QUEUE_OPTION --loglevel ${LOG_LEVEL:-INFO}
 else
     if [[ "${DEBUG}" == "true" ]]; then
         poetry run alembic upgrade head
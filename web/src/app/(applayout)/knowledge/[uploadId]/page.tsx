@@ -65,6 +65,7 @@ function KnowledgeTest() {
   const [topK, setTopK] = useState(5);
   const [scoreThreshold, setScoreThreshold] = useState(0.5);
   const [searchTaskId, setSearchTaskId] = useState<string | null>(null);
+  const [directSearchResults, setDirectSearchResults] = useState<any>(null);
   const [isOptionsVisible, setIsOptionsVisible] = useState(false);
   const { t } = useTranslation();
 
@@ -103,7 +104,14 @@ function KnowledgeTest() {
       }),
     {
       onSuccess: (data) => {
-        setSearchTaskId(data.task_id);
+        // 检索默认同步返回结果, 只有后台任务才需要轮询
+        if (data.task_id) {
+          setDirectSearchResults(null);
+          setSearchTaskId(data.task_id);
+        } else {
+          setSearchTaskId(null);
+          setDirectSearchResults(data);
+        }
       },
       onError: (error: ApiError) => {
         showToast(
@@ -115,7 +123,7 @@ function KnowledgeTest() {
     }
   );
 
-  const { data: searchResults, refetch: refetchSearchResults } = useQuery(
+  const { data: taskSearchResults, refetch: refetchSearchResults } = useQuery(
     ["searchResults", searchTaskId],
     () =>
       UploadsService.getSearchResults({
@@ -128,10 +136,12 @@ function KnowledgeTest() {
   );
 
   useEffect(() => {
-    if (searchResults?.status === "completed") {
-      queryClient.setQueryData(["searchResults", searchTaskId], searchResults);
+    if (taskSearchResults?.status === "completed") {
+      queryClient.setQueryData(["searchResults", searchTaskId], taskSearchResults);
     }
-  }, [searchResults, searchTaskId, queryClient]);
+  }, [taskSearchResults, searchTaskId, queryClient]);
+
+  const searchResults = directSearchResults ?? taskSearchResults;
 
   const handleSearch = () => {
     if (!query.trim()) {